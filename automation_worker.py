@@ -0,0 +1,832 @@
+"""
+自动化工作进程 - 在独立子进程中运行 Playwright 检查/登录引擎
+GUI 进程只通过消息协议与其通信，浏览器相关的卡死和内存泄漏不会影响界面
+
+消息协议（均为 (kind, payload) 元组，payload 为 dict）：
+    GUI -> 子进程:
+        ('start_monitor', {'config': {...}})   开始监控
+        ('stop_monitor', {})                   停止监控
+        ('login', {'config': {...}, 'job': 'test_login'})  执行一次登录
+        ('shutdown', {})                       退出子进程
+    子进程 -> GUI:
+        ('log', {'message': str})              日志行
+        ('status', {'status': str})            状态文本
+        ('timing', {'phase': str, 'seconds': float})  阶段耗时
+        ('result', {'job': str, 'success': bool, 'detail': str})  登录任务结果
+        ('resources', {'sample': dict})        每次检查/登录前后的资源采样
+        ('bandwidth', {'phase': str, 'sent': int, 'received': int, 'summary': str})  流量统计
+        ('recovery', {'incident': dict, 'summary': str, 'alert': str | None})  一次掉线恢复的耗时
+        ('interface', {'name': str, 'text': str})  某个网卡的监控状态（配置了 INTERFACES 时）
+        ('heartbeat', {'pid': int})            心跳
+"""
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+import connectivity_probe
+import http_pool
+from connection_state import (
+    ConnectionStateMachine, STATE_LABELS, LOCKED_OUT,
+    PORTAL_LOGGED_IN, PORTAL_LOGGED_OUT, PORTAL_UNKNOWN,
+)
+from connectivity_probe import PROBE_ONLINE
+from execution_service import ExecutionService, CancellationToken
+from login_coordinator import LoginCoordinator, InterProcessLock
+from login_policy import LoginOutcome, LoginCircuitBreaker, TIMEOUT, classify_exception, classify_failure
+from cycle_watchdog import Watchdog, reap_orphans
+from resource_monitor import ResourceMonitor
+from browser_profile import BrowserProfile, PROFILE_DEFAULT
+from bandwidth import BandwidthLedger
+from recovery_slo import RecoveryTracker
+from event_log import EventLog
+from failure_capture import FailureCapture, link_text
+from cycle_profiler import CycleProfiler
+from check_scheduler import CheckScheduler, Wakeup, DUE, RESUMED
+from idle_meter import IdleMeter
+from session_keepalive import SessionKeepalive
+from expiry_predictor import ExpiryPredictor
+from portal_endpoints import EndpointSelector, PortalPrecheck
+from dns_cache import DnsCache
+from interface_monitor import InterfaceMonitors
+import history_store
+
+
+HEARTBEAT_INTERVAL = 30  # 心跳间隔（秒），期间发送过其他消息时不发送
+
+
+def guard_cycle(watchdog, phase, ctx):
+    """用看门狗保护一次检查或登录，超时时结束本工作线程的 Playwright 驱动进程树"""
+    if watchdog is None:
+        return nullcontext()
+    return watchdog.guard(phase, lambda: ctx.playwright_pid)
+
+
+def measure_cycle(resources, phase):
+    """在一次检查或登录前后采样工作进程树的资源占用"""
+    if resources is None:
+        return nullcontext()
+    return resources.around('worker', phase)
+
+
+def measure_bandwidth(bandwidth, phase):
+    """统计一次检查或登录的流量，没有流量账本时返回的 meter 为 None"""
+    if bandwidth is None:
+        return nullcontext()
+    return bandwidth.measure(phase)
+
+
+def open_portal(endpoints, page, login_url, **kwargs):
+    """打开门户页面，有门户地址选择时按健康分选择地址，打不开时切换到下一个"""
+    if endpoints is None:
+        page.goto(login_url, **kwargs)
+        return login_url
+    return endpoints.open(page, **kwargs)
+
+
+def profile_cycle(profiler, phase):
+    """剖析一次检查或登录，未启用或已剖析够次数时直接跳过"""
+    if profiler is None or not profiler.wants(phase):
+        return nullcontext()
+    return profiler.profile(phase)
+
+
+class LoginTask:
+    """登录任务，在执行服务的工作线程中运行"""
+
+    def __init__(self, username, password, login_url, on_log, on_status, on_timing=None, watchdog=None,
+                 resources=None, profile=None, bandwidth=None, history=None, job='test_login',
+                 events=None, parent=None, capture=None, profiler=None, endpoints=None):
+        self.username = username
+        self.password = password
+        self.login_url = login_url
+        self.endpoints = endpoints
+        self.on_log = on_log
+        self.on_status = on_status
+        self.on_timing = on_timing
+        self.watchdog = watchdog
+        self.resources = resources
+        self.profile = profile or BrowserProfile(PROFILE_DEFAULT)
+        self.bandwidth = bandwidth
+        self.history = history
+        self.job = job
+        self.events = events or EventLog()
+        self.parent = parent  # 触发本次登录的检查周期 ID
+        self.cycle_id = None
+        self.capture = capture or FailureCapture()
+        self.capture_path = None
+        self.profiler = profiler
+
+    def run(self, ctx):
+        """执行登录
+
+        Returns:
+            LoginOutcome: 登录结果（含失败分类）
+        """
+        started = time.monotonic()
+        outcome = LoginOutcome(False, message="登录未完成")
+        with profile_cycle(self.profiler, 'login'), \
+                self.events.cycle('login', parent=self.parent, job=self.job) as event_cycle:
+            self.cycle_id = event_cycle.id
+            try:
+                with measure_cycle(self.resources, 'login'), guard_cycle(self.watchdog, 'login', ctx) as cycle:
+                    outcome = self._run(ctx)
+                if cycle is not None and cycle.expired:
+                    ctx.reset_playwright()
+                    outcome = LoginOutcome(False, TIMEOUT, f"登录超过 {cycle.deadline} 秒未完成")
+                return outcome
+            finally:
+                elapsed = time.monotonic() - started
+                event_cycle.outcome = 'success' if outcome else 'failure'
+                event_cycle.error = outcome.failure_class
+                event_cycle.fields['message'] = outcome.message or None
+                if self.history:
+                    self.history.record_login(self.job, outcome, elapsed)
+                if self.on_timing:
+                    self.on_timing('login', elapsed)
+
+    def _run(self, ctx):
+        self.capture_path = None
+        try:
+            return self._login(ctx)
+        except PlaywrightTimeout as e:
+            self.on_log(f"❌ 发生错误: {str(e)}{link_text(self.capture_path)}")
+            return LoginOutcome(False, TIMEOUT, str(e))
+        except Exception as e:
+            self.on_log(f"❌ 发生错误: {str(e)}{link_text(self.capture_path)}")
+            ctx.reset_playwright()
+            return LoginOutcome(False, classify_exception(e), str(e))
+
+    def _login(self, ctx):
+        self.on_log("="*60)
+        self.on_log(f"[{datetime.now().strftime('%H:%M:%S')}] 开始登录流程...")
+        self.on_status("正在登录...")
+
+        with self.profile.browser(ctx.playwright, 'login', headless=False,
+                                  driver_pid=ctx.playwright_pid, slow_mo=500) as browser, \
+                measure_bandwidth(self.bandwidth, 'login') as meter:
+            context = self.profile.new_context(
+                browser,
+                meter=meter,
+                viewport={'width': 1280, 'height': 720},
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                ignore_https_errors=True
+            )
+            tracing = self.capture.start_trace(context)
+            page = context.new_page()
+
+            # 只在失败时保存诊断信息（需在浏览器关闭前），成功路径没有额外开销
+            try:
+                outcome = self._submit(ctx, page)
+            except Exception as e:
+                self.capture_path = self.capture.save(page, 'login', error=e, meter=meter,
+                                                      tracing=tracing, cycle=self.cycle_id)
+                raise
+            if outcome:
+                self.capture.discard_trace(context, tracing)
+            else:
+                self.capture_path = self.capture.save(page, 'login', outcome, meter=meter,
+                                                      tracing=tracing, cycle=self.cycle_id)
+                self.on_log(f"❌ 登录失败: {outcome.message}（{outcome.label}）{link_text(self.capture_path)}")
+            return outcome
+
+    def _submit(self, ctx, page):
+        """打开登录页面并提交账号密码"""
+        self.on_log(f"正在打开登录页面: {self.endpoints.ranked()[0] if self.endpoints else self.login_url}")
+        open_portal(self.endpoints, page, self.login_url, wait_until='networkidle')
+        time.sleep(0.3)
+
+        # 检查是否已登录
+        try:
+            logout_button = page.locator("button.loggoff")
+            if logout_button.is_visible(timeout=2000):
+                self.on_log("✓ 已处于登录状态")
+                return LoginOutcome(True)
+        except:
+            pass
+
+        # 填写用户名
+        self.on_log("正在填写用户名...")
+        username_input = page.locator('input#user')
+        username_input.clear()
+        username_input.fill(self.username, timeout=5000)
+        time.sleep(0.3)
+
+        # 填写密码
+        self.on_log("正在填写密码...")
+        password_input = page.locator('input#pass')
+        password_input.clear()
+        password_input.fill(self.password, timeout=5000)
+        time.sleep(0.3)
+
+        # 点击登录按钮
+        self.on_log("正在点击登录按钮...")
+        login_button = page.locator("div.tab-group.account button.btn")
+        login_button.click()
+        self.on_log("等待认证完成...")
+        ctx.token.wait(3)
+
+        # 验证登录结果
+        try:
+            logout_button = page.locator("button.loggoff")
+            if logout_button.is_visible(timeout=8000):
+                self.on_log("✅ 登录成功！")
+                time.sleep(0.3)
+                return LoginOutcome(True)
+            else:
+                msg_zone = page.locator("div.msg-zone")
+                error_msg = msg_zone.inner_text() if msg_zone.is_visible() else "未知错误"
+                return LoginOutcome(False, classify_failure(error_msg), error_msg)
+        except PlaywrightTimeout:
+            return LoginOutcome(False, TIMEOUT, "登录超时")
+
+
+class MonitorTask:
+    """监控任务，占用执行服务的一个工作线程直到被取消
+
+    每次检查的门户结果和连通性探测结果输入连接状态机，只有状态机确认掉线、且登录熔断器允许时才触发登录
+    """
+
+    def __init__(self, login_url, check_interval, on_log, on_status, on_need_login, on_timing=None,
+                 coordinator=None, instance_lock=None, state=None, breaker=None, watchdog=None,
+                 resources=None, profile=None, bandwidth=None, history=None, recovery=None, events=None,
+                 profiler=None, scheduler=None, idle_meter=None, keepalive=None, predictor=None,
+                 endpoints=None, interfaces=None, dns=None, precheck=None):
+        self.login_url = login_url
+        self.endpoints = endpoints
+        self.precheck = precheck
+        self.interfaces = interfaces
+        self.dns = dns
+        self.check_interval = check_interval
+        self.on_log = on_log
+        self.on_status = on_status
+        self.on_need_login = on_need_login
+        self.on_timing = on_timing
+        self.coordinator = coordinator
+        self.instance_lock = instance_lock
+        self.state = state or ConnectionStateMachine.from_env()
+        self.breaker = breaker
+        self.watchdog = watchdog
+        self.resources = resources
+        self.profile = profile or BrowserProfile(PROFILE_DEFAULT)
+        self.bandwidth = bandwidth
+        self.history = history
+        self.recovery = recovery
+        self.events = events or EventLog()
+        self.last_error = None  # 最近一次检查出错的异常类名
+        self.profiler = profiler
+        self.scheduler = scheduler or CheckScheduler(on_log=on_log)
+        self.idle_meter = idle_meter
+        self.keepalive = keepalive
+        self.predictor = predictor
+
+    def _wait_for_login(self, token):
+        """登录进行中时推迟检查，直到登录结束或监控停止"""
+        if not self.coordinator or not self.coordinator.is_busy():
+            return
+        self.on_log("登录进行中，推迟本次检查...")
+        while not token.cancelled and not self.coordinator.wait_idle(timeout=1):
+            pass
+
+    def run(self, ctx):
+        """持续监控，直到取消令牌被触发"""
+        token = ctx.token
+        # 两次检查之间阻塞在 Wakeup 上（Linux 上与定时器一起等待，没有任何唤醒），停止时由令牌唤醒
+        wakeup = Wakeup()
+        token.add_callback(wakeup.set)
+        standby = False
+        try:
+            while not token.cancelled:
+                # 同一时刻只允许一个实例监控，其余实例待机，持有者退出后自动接管
+                if self.instance_lock and not self.instance_lock.acquire():
+                    if not standby:
+                        self.on_log("⚠️ 另一个实例正在监控，本实例进入待机")
+                        self.on_status("待机 - 其他实例正在监控")
+                        standby = True
+                    if self.on_timing:
+                        self.on_timing('standby', 0.0)
+                    token.wait(self.check_interval)
+                    continue
+                if standby:
+                    self.on_log("✓ 已接管监控")
+                    standby = False
+                if self.interfaces and not self.interfaces.started:
+                    # 各网卡的监控只在持有实例锁时运行
+                    self.interfaces.start()
+
+                self._wait_for_login(token)
+                if token.cancelled:
+                    break
+
+                with profile_cycle(self.profiler, 'check'), self.events.cycle('check') as event_cycle:
+                    started = time.monotonic()
+                    if self.recovery:
+                        self.recovery.cycle_started()
+                    if self.predictor and self.predictor.expects_logout():
+                        self.state.expect_logout()
+                    dns = self.dns.prefetch() if self.dns else 0.0
+                    if dns and self.on_timing:
+                        self.on_timing('dns', dns)
+                    with measure_cycle(self.resources, 'check'):
+                        with guard_cycle(self.watchdog, 'check', ctx) as cycle:
+                            portal = self.check(ctx)
+                        if cycle is not None and cycle.expired:
+                            ctx.reset_playwright()
+                            portal = PORTAL_UNKNOWN
+                            self.last_error = TIMEOUT
+                        probe = None
+                        if portal != PORTAL_LOGGED_IN:
+                            probe = connectivity_probe.probe()
+                    self.state.observe(portal, probe)
+                    if self.recovery:
+                        self.recovery.observe(portal, probe)
+                    if self.keepalive:
+                        self.keepalive.observe(portal)
+                    if self.dns:
+                        self.dns.observe(portal == PORTAL_LOGGED_IN or probe == PROBE_ONLINE)
+                    if self.predictor:
+                        expiry = self.predictor.observe(portal, self.state.confirmation_delay())
+                        if expiry:
+                            self.events.emit('expiry', **expiry)
+                    elapsed = time.monotonic() - started
+                    event_cycle.outcome = portal
+                    event_cycle.error = self.last_error
+                    event_cycle.fields.update(probe=probe, state=self.state.state, dns=dns)
+                    if self.history:
+                        self.history.record_check(portal, probe, self.state.state, elapsed)
+                    if self.on_timing:
+                        self.on_timing('check', elapsed)
+
+                    # 在周期内触发登录，登录周期以本次检查为 parent
+                    if self.state.should_login(self.breaker):
+                        self.state.begin_login()
+                        self.on_need_login()
+
+                # 等待下次检查（疑似掉线时快速复查，预测的会话到期前后密集检查，超出流量预算时延长间隔），
+                # 停止时立即唤醒，休眠唤醒后立即检查，错过的检查只补一次
+                interval = self.bandwidth.check_interval(self.check_interval) if self.bandwidth else self.check_interval
+                delay = self.state.next_check_delay(interval)
+                if self.predictor:
+                    delay = self.predictor.next_check_delay(delay)
+                if self.idle_meter:
+                    self.idle_meter.idle_started()
+                reason = self._wait(delay, wakeup)
+                if self.idle_meter and not token.cancelled:
+                    self.idle_meter.idle_finished()
+                if reason == RESUMED:
+                    self.events.emit('resume', asleep=round(self.scheduler.last_sleep, 1))
+                    self.state.resumed()
+        finally:
+            if self.interfaces:
+                self.interfaces.stop()
+            self.profile.close()
+            if self.instance_lock:
+                self.instance_lock.release()
+            # 每次开始监控都会创建新的调度器和 Wakeup，这里关闭它们的 timerfd / eventfd
+            wakeup.close()
+            self.scheduler.close()
+        self.on_log(f"🔗 HTTP 连接: {http_pool.shared().summary()}")
+        self.on_log("监控已停止")
+
+    def _wait(self, delay, wakeup):
+        """等待下次检查，期间到期的保活在等待中完成
+
+        下次检查之前就会到期的保活提前到本次检查之后立即发送，不单独唤醒；
+        只有保活间隔短于检查间隔（如流量预算延长了间隔）时才在等待中途唤醒
+        """
+        deadline = self.scheduler.now() + delay
+        first = True
+        while True:
+            due_in = self.keepalive.due_in() if self.keepalive else None
+            if due_in is None or self.scheduler.now() + due_in >= deadline:
+                return self.scheduler.wait_until(deadline, wakeup)
+            if not first:
+                reason = self.scheduler.wait(max(0.0, due_in), wakeup)
+                if reason != DUE:
+                    return reason
+            first = False
+            self.events.emit('keepalive', ok=self.keepalive.refresh())
+
+    def check(self, ctx):
+        """执行一次门户页面检查
+
+        Returns:
+            str: PORTAL_LOGGED_IN / PORTAL_LOGGED_OUT / PORTAL_UNKNOWN
+        """
+        self.last_error = None
+        self.on_log("="*60)
+        self.on_log(f"[{datetime.now().strftime('%H:%M:%S')}] 开始检查网络状态...")
+        self.on_status("检查中...")
+
+        # 先用连接池预检，门户页面有变化、未登录或需要确认注销按钮时才打开浏览器
+        url = self.endpoints.ranked()[0] if self.endpoints else self.login_url
+        if self.precheck and self.precheck.unchanged(url):
+            self.on_log("✓ 网络已登录（门户页面未变化，外网可达）")
+            self.on_status("监控中 - 已登录")
+            return PORTAL_LOGGED_IN
+        portal = self._check_page(ctx)
+        if self.precheck:
+            self.precheck.record(portal)
+        return portal
+
+    def _check_page(self, ctx):
+        """用浏览器打开门户页面，按注销和登录按钮判断登录状态"""
+        try:
+            with self.profile.browser(ctx.playwright, 'check', driver_pid=ctx.playwright_pid,
+                                      reusable=True) as browser, \
+                    measure_bandwidth(self.bandwidth, 'check') as meter:
+                context = self.profile.new_context(browser, probe=True, meter=meter, ignore_https_errors=True)
+                page = context.new_page()
+
+                open_portal(self.endpoints, page, self.login_url, timeout=10000)
+                time.sleep(0.3)
+
+                try:
+                    logout_button = page.locator("button.loggoff")
+                    if logout_button.is_visible(timeout=3000):
+                        self.on_log("✓ 网络已登录")
+                        self.on_status("监控中 - 已登录")
+                        return PORTAL_LOGGED_IN
+                    self.on_log("⚠️ 检测到未登录状态")
+                    self.on_status("监控中 - 未登录")
+                    return PORTAL_LOGGED_OUT
+                except:
+                    login_button = page.locator("div.tab-group.account button.btn")
+                    if login_button.is_visible(timeout=3000):
+                        self.on_log("⚠️ 检测到未登录状态")
+                        return PORTAL_LOGGED_OUT
+                    return PORTAL_UNKNOWN
+        except PlaywrightTimeout as e:
+            self.on_log(f"⚠️ 检查时出错: {str(e)}")
+            self.last_error = TIMEOUT
+        except Exception as e:
+            self.on_log(f"⚠️ 检查时出错: {str(e)}")
+            self.last_error = type(e).__name__
+            ctx.reset_playwright()
+        return PORTAL_UNKNOWN
+
+
+class AutomationEngine:
+    """子进程内的检查/登录引擎，负责把任务提交到执行服务并把事件转发给 GUI"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.last_sent = 0.0
+        # 一个工作线程运行监控，一个运行登录
+        self.service = ExecutionService(max_workers=2, name="automation")
+        self.monitor_token = None
+        self.monitor_task = None
+        self.coordinator = None
+        self.breaker = None
+        self.watchdog = None
+        self.resources = None
+        self.profile = None
+        self.bandwidth = None
+        self.history = None
+        self.recovery = None
+        self.events = None
+        self.capture = None
+        self.profiler = None
+        self.keepalive = None
+        self.predictor = None
+        self.endpoints = None
+        self.dns = None
+        self.dns_urls = None
+
+    def send(self, kind, **payload):
+        """向 GUI 发送一条消息（多线程安全）"""
+        with self.send_lock:
+            self.last_sent = time.monotonic()
+            try:
+                self.conn.send((kind, payload))
+            except (OSError, EOFError):
+                pass
+
+    def log(self, message):
+        self.send('log', message=message)
+
+    def status(self, status):
+        self.send('status', status=status)
+
+    def timing(self, phase, seconds):
+        self.send('timing', phase=phase, seconds=round(seconds, 3))
+
+    def heartbeat_loop(self):
+        """一段时间没有发送过消息时发送心跳，供 GUI 端判断子进程是否存活"""
+        while True:
+            remaining = self.last_sent + HEARTBEAT_INTERVAL - time.monotonic()
+            if remaining <= 0:
+                self.send('heartbeat', pid=os.getpid())
+            else:
+                time.sleep(remaining)
+
+    def handle(self, command, args):
+        """处理来自 GUI 的命令"""
+        if command == 'start_monitor':
+            self.start_monitor(args['config'])
+        elif command == 'stop_monitor':
+            self.stop_monitor()
+        elif command == 'login':
+            self.login(args['config'], args.get('job', 'test_login'))
+
+    def _get_coordinator(self, config):
+        if self.coordinator is None:
+            self.coordinator = LoginCoordinator(config['lock_dir'], on_log=self.log, executor=self.service)
+        return self.coordinator
+
+    def _get_watchdog(self, config):
+        if self.watchdog is None:
+            self.watchdog = Watchdog.from_env(
+                record_file=os.path.join(config['lock_dir'], 'watchdog.jsonl'),
+                on_log=self.log
+            )
+        return self.watchdog
+
+    def _get_resources(self, config):
+        if self.resources is None:
+            self.resources = ResourceMonitor.from_env(
+                record_file=os.path.join(config['lock_dir'], 'resources.jsonl'),
+                on_log=self.log,
+                on_sample=lambda sample: self.send('resources', sample=sample)
+            )
+        return self.resources
+
+    def _get_profile(self, config):
+        if self.profile is None:
+            self.profile = BrowserProfile.from_env(
+                memory_file=os.path.join(config['lock_dir'], 'browser_memory.jsonl'),
+                on_log=self.log
+            )
+        self.profile.resolver = self._get_dns(config)
+        return self.profile
+
+    def _get_bandwidth(self, config):
+        if self.bandwidth is None:
+            self.bandwidth = BandwidthLedger.from_env(
+                state_file=os.path.join(config['lock_dir'], 'bandwidth.json'),
+                on_log=self.log,
+                on_update=lambda phase, sent, received, summary: self.send(
+                    'bandwidth', phase=phase, sent=sent, received=received, summary=summary
+                )
+            )
+            # 连通性探测、保活、门户地址探测和表单登录的流量
+            http_pool.shared().on_traffic = self.bandwidth.record
+        return self.bandwidth
+
+    def _get_history(self, config):
+        if self.history is None:
+            self.history = history_store.open_store(config['lock_dir'], 'gui')
+        return self.history
+
+    def _get_recovery(self, config):
+        if self.recovery is None:
+            self.recovery = RecoveryTracker.from_env(
+                record_file=os.path.join(config['lock_dir'], 'recovery.jsonl'),
+                on_log=self.log,
+                on_update=self.on_recovery
+            )
+        return self.recovery
+
+    def _get_capture(self, config):
+        if self.capture is None:
+            self.capture = FailureCapture.from_env(
+                root=os.path.join(config['lock_dir'], 'failures'),
+                on_log=self.log
+            )
+        return self.capture
+
+    def _get_profiler(self, config):
+        if self.profiler is None:
+            self.profiler = CycleProfiler.from_env(
+                os.path.join(config['lock_dir'], 'profiles'),
+                on_log=self.log
+            )
+        return self.profiler
+
+    def _get_keepalive(self, config):
+        if self.keepalive is None:
+            self.keepalive = SessionKeepalive.from_env(
+                state_file=os.path.join(config['lock_dir'], 'keepalive.json'),
+                on_log=self.log
+            )
+        return self.keepalive
+
+    def _get_predictor(self, config):
+        if self.predictor is None:
+            self.predictor = ExpiryPredictor.from_env(
+                state_file=os.path.join(config['lock_dir'], 'expiry.json'),
+                on_log=self.log
+            )
+        return self.predictor
+
+    def _get_endpoints(self, config):
+        # GUI 中修改登录地址后重新创建
+        if self.endpoints is None or self.endpoints.primary != config['login_url']:
+            self.endpoints = EndpointSelector.from_env(
+                config['login_url'],
+                state_file=os.path.join(config['lock_dir'], 'endpoints.json'),
+                on_log=self.log
+            )
+        return self.endpoints
+
+    def _get_dns(self, config):
+        # 门户地址变化（GUI 中修改登录地址）后重新创建，HTTP 探测同时改为连接可信地址
+        urls = self._get_endpoints(config).urls + [os.getenv("PROBE_URL", connectivity_probe.DEFAULT_PROBE_URL)]
+        if self.dns is None or self.dns_urls != urls:
+            self.dns = DnsCache.from_env(
+                urls,
+                state_file=os.path.join(config['lock_dir'], 'dns.json'),
+                on_log=self.log,
+                on_traffic=self._get_bandwidth(config).record
+            )
+            self.dns_urls = urls
+            http_pool.shared().resolver = self.dns
+        return self.dns
+
+    def _get_events(self, config):
+        if self.events is None:
+            self.events = EventLog.from_env(config['lock_dir'], 'gui')
+        return self.events
+
+    def _get_breaker(self, config):
+        if self.breaker is None:
+            self.breaker = LoginCircuitBreaker.from_env(
+                state_file=os.path.join(config['lock_dir'], 'login_breaker.json')
+            )
+        # 修改账号密码后重置熔断
+        self.breaker.bind_credentials(config['username'], config['password'])
+        return self.breaker
+
+    def on_recovery(self, incident, summary, alert):
+        """一次掉线恢复结束"""
+        self.events.emit('recovery', duration=incident['total'], stages=incident['stages'],
+                         login=incident['login'], alert=alert)
+        self.send('recovery', incident=incident, summary=summary, alert=alert)
+
+    def on_state_transition(self, old_state, new_state, reason):
+        """连接状态变化时通知 GUI"""
+        self.log(f"🔄 连接状态: {STATE_LABELS[old_state]} → {STATE_LABELS[new_state]}（{reason}）")
+        self.events.emit('transition', **{'from': old_state, 'to': new_state, 'reason': reason})
+        if self.history:
+            self.history.record_transition(old_state, new_state, reason)
+        if self.recovery:
+            self.recovery.on_transition(old_state, new_state, reason)
+        if new_state == LOCKED_OUT:
+            self.status(f"监控中 - {reason}")
+        else:
+            self.status(f"监控中 - {STATE_LABELS[new_state]}")
+
+    def start_monitor(self, config):
+        """开始监控"""
+        self.stop_monitor()
+        self._get_history(config)
+        self._get_events(config)
+        self._get_recovery(config)
+        state = ConnectionStateMachine.from_env(
+            transition_log=os.path.join(config['lock_dir'], 'state_transitions.jsonl'),
+            on_transition=self.on_state_transition
+        )
+        task = MonitorTask(
+            config['login_url'], config['check_interval'],
+            self.log, self.status,
+            lambda: self.login(config, 'auto_login'),
+            on_timing=self.timing,
+            coordinator=self._get_coordinator(config),
+            instance_lock=InterProcessLock(os.path.join(config['lock_dir'], 'monitor.lock')),
+            state=state,
+            breaker=self._get_breaker(config),
+            watchdog=self._get_watchdog(config),
+            resources=self._get_resources(config),
+            profile=self._get_profile(config),
+            bandwidth=self._get_bandwidth(config),
+            history=self._get_history(config),
+            recovery=self._get_recovery(config),
+            events=self._get_events(config),
+            profiler=self._get_profiler(config),
+            scheduler=CheckScheduler.from_env(on_log=self.log),
+            idle_meter=IdleMeter.from_env(
+                # GUI 进程是本进程的父进程，浏览器和驱动是子进程
+                {'worker': (os.getpid(), 'self'), 'browser': (os.getpid(), 'children'),
+                 'gui': (os.getppid(), 'self')},
+                on_log=self.log,
+                on_measure=lambda seconds, result: self.events.emit('idle', seconds=seconds, **result)
+            ),
+            keepalive=self._get_keepalive(config),
+            predictor=self._get_predictor(config),
+            endpoints=self._get_endpoints(config),
+            dns=self._get_dns(config),
+            precheck=PortalPrecheck.from_env(),
+            interfaces=InterfaceMonitors.from_env(
+                config['username'], config['password'], config['check_interval'], config['lock_dir'],
+                on_log=self.log,
+                on_change=lambda name, text: self.send('interface', name=name, text=text),
+                events=self._get_events(config)
+            )
+        )
+        self.monitor_task = task
+        self.monitor_token = CancellationToken()
+        self.service.submit(task.run, token=self.monitor_token)
+
+    def stop_monitor(self):
+        """停止监控"""
+        if self.monitor_token:
+            self.monitor_token.cancel()
+        self.monitor_token = None
+        self.monitor_task = None
+
+    def login(self, config, job):
+        """执行一次登录，结果以 result 消息返回
+
+        并发的登录请求由 LoginCoordinator 合并，同一时刻只会打开一个登录浏览器
+        """
+        if job == 'auto_login':
+            self.log("触发自动登录...")
+            # 自动登录由本进程发起，通知监管进程登录中（登录期间不因内存超标重启，超时仍按卡死处理）
+            self.send('login_started', job=job)
+
+        events = self._get_events(config)
+        task = LoginTask(
+            config['username'], config['password'], config['login_url'],
+            self.log, self.status,
+            on_timing=self.timing,
+            watchdog=self._get_watchdog(config),
+            resources=self._get_resources(config),
+            profile=self._get_profile(config),
+            bandwidth=self._get_bandwidth(config),
+            history=self._get_history(config),
+            job=job,
+            events=events,
+            parent=events.current(),
+            capture=self._get_capture(config),
+            profiler=self._get_profiler(config),
+            endpoints=self._get_endpoints(config)
+        )
+        monitor_task = self.monitor_task
+        breaker = self._get_breaker(config)
+        keepalive = self._get_keepalive(config)
+        predictor = self._get_predictor(config)
+        if job != 'auto_login':
+            # 手动登录视为用户已处理问题，解除熔断
+            breaker.reset()
+
+        def on_done(outcome):
+            # 登录结束后的状态转换记在登录周期下
+            with events.resume(task.cycle_id):
+                breaker.record(outcome)
+                if outcome:
+                    keepalive.logged_in()
+                    predictor.logged_in()
+                else:
+                    self.log(f"⚠️ {breaker.describe()}")
+                if job == 'auto_login' and monitor_task is not None:
+                    monitor_task.state.login_finished(outcome)
+                    # 登录成功后立即探测一次，确认已联网才算恢复（探测失败时由下一次检查确认）
+                    recovery = monitor_task.recovery
+                    if outcome and recovery and recovery.pending_confirmation():
+                        if connectivity_probe.probe() == PROBE_ONLINE:
+                            recovery.confirm()
+            self.send('result', job=job, success=outcome.success,
+                      detail=outcome.label if outcome.success else breaker.describe())
+
+        self._get_coordinator(config).submit(task.run, on_done)
+
+    def shutdown(self):
+        """停止所有任务"""
+        self.stop_monitor()
+        self.service.shutdown(cancel=True, wait=True, timeout=5)
+
+
+def worker_main(conn, env):
+    """子进程入口
+
+    Args:
+        conn: 与 GUI 进程相连的 multiprocessing Connection
+        env: 需要在子进程中设置的环境变量（浏览器路径等）
+    """
+    os.environ.update(env)
+    engine = AutomationEngine(conn)
+    threading.Thread(target=engine.heartbeat_loop, daemon=True).start()
+
+    # 清理上次运行中断后遗留的浏览器进程
+    reaped = reap_orphans()
+    if reaped:
+        engine.log(f"🧹 已清理 {reaped} 个遗留的浏览器/驱动进程")
+
+    while True:
+        try:
+            command, args = conn.recv()
+        except (EOFError, OSError):
+            # GUI 进程已退出
+            break
+        if command == 'shutdown':
+            break
+        try:
+            engine.handle(command, args)
+        except Exception as e:
+            engine.log(f"❌ 处理命令 {command} 时出错: {str(e)}")
+
+    engine.shutdown()
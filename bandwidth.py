@@ -0,0 +1,208 @@
+"""
+流量统计 - 按请求统计每次检查/登录的收发字节数（请求/响应的头部和正文）
+浏览器之外的请求（连通性探测、会话保活、门户地址探测、表单登录和 DNS 查询）按所属阶段计入，
+按小时、按天汇总保存在 logs/bandwidth.json，设置每日预算后自动延长检查间隔
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+HOURS_KEPT = 48
+DAYS_KEPT = 62
+
+
+def format_bytes(size):
+    """字节数转为易读文本"""
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+class BandwidthMeter:
+    """统计一次检查/登录中浏览器产生的流量
+
+    请求结束时只记录请求对象，周期结束（浏览器关闭前）再统一读取大小，
+    避免在事件回调中调用同步 API。
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.failed = []  # 失败的请求不计流量，仅供失败诊断使用
+        self.sent = 0
+        self.received = 0
+
+    def attach(self, context):
+        context.on("requestfinished", self.requests.append)
+        context.on("requestfailed", self.failed.append)
+
+    def collect(self):
+        """读取所有已完成请求的大小（需在浏览器关闭前调用）"""
+        for request in self.requests:
+            try:
+                sizes = request.sizes()
+            except Exception:
+                continue
+            self.sent += sizes['requestHeadersSize'] + sizes['requestBodySize']
+            self.received += sizes['responseHeadersSize'] + sizes['responseBodySize']
+        return self.sent, self.received, len(self.requests)
+
+
+class BandwidthLedger:
+    """按小时/天累计流量，并根据每日预算计算检查间隔"""
+
+    def __init__(self, state_file=None, daily_budget_mb=0, max_interval=1800, on_log=None, on_update=None):
+        self.state_file = state_file
+        self.daily_budget = int(daily_budget_mb * 1024 * 1024)
+        self.max_interval = max_interval
+        self.on_log = on_log or (lambda message: None)
+        self.on_update = on_update
+        self.lock = threading.Lock()
+        self.data = {'hours': {}, 'days': {}}
+        self.check_bytes = 0.0  # 单次检查流量的滑动平均
+        self.check_extra = 0  # 上一次检查以来浏览器之外的检查流量（连通性探测），计入下一次检查
+        self.stretched = False
+        self._load()
+
+    @classmethod
+    def from_env(cls, state_file=None, on_log=None, on_update=None):
+        """按 .env 中的流量预算配置创建"""
+        return cls(
+            state_file=state_file,
+            daily_budget_mb=float(os.getenv("DAILY_BANDWIDTH_BUDGET_MB", "0")),
+            max_interval=int(os.getenv("BANDWIDTH_MAX_INTERVAL_SECONDS", "1800")),
+            on_log=on_log,
+            on_update=on_update,
+        )
+
+    @contextmanager
+    def measure(self, phase):
+        """统计一次检查/登录的流量，需包在浏览器关闭之前退出"""
+        meter = BandwidthMeter()
+        try:
+            yield meter
+        finally:
+            self.add(phase, *meter.collect())
+
+    def record(self, phase, sent, received):
+        """记录浏览器之外的一次请求（连通性探测、保活、DNS 查询等），不计为一次检查/登录"""
+        self.add(phase, sent, received, requests=1, cycle=False)
+
+    def add(self, phase, sent, received, requests=0, cycle=True):
+        """记录一次检查/登录的流量，cycle=False 时只累计字节数和请求数"""
+        now = datetime.now()
+        with self.lock:
+            # 其他进程（GUI/命令行）可能也在记录，先合并磁盘上的数据
+            self._load()
+            for bucket, key in (('hours', now.strftime('%Y-%m-%d %H')), ('days', now.strftime('%Y-%m-%d'))):
+                entry = self.data[bucket].setdefault(key, {}).setdefault(
+                    phase, {'sent': 0, 'received': 0, 'requests': 0, 'cycles': 0}
+                )
+                entry['sent'] += sent
+                entry['received'] += received
+                entry['requests'] += requests
+                entry['cycles'] += int(cycle)
+            self._prune(now)
+            self._save()
+            if phase == 'check' and not cycle:
+                self.check_extra += sent + received
+            elif phase == 'check':
+                total, self.check_extra = sent + received + self.check_extra, 0
+                self.check_bytes = total if not self.check_bytes else self.check_bytes * 0.8 + total * 0.2
+        if self.on_update:
+            self.on_update(phase, sent, received, self.summary())
+
+    def total(self, bucket, key):
+        """某小时/某天的总流量（字节）"""
+        with self.lock:
+            phases = self.data[bucket].get(key, {})
+            return sum(entry['sent'] + entry['received'] for entry in phases.values())
+
+    def today(self):
+        return self.total('days', datetime.now().strftime('%Y-%m-%d'))
+
+    def this_hour(self):
+        return self.total('hours', datetime.now().strftime('%Y-%m-%d %H'))
+
+    def check_interval(self, base_interval):
+        """按每日预算计算检查间隔
+
+        剩余预算按当天剩余时间平均分配，平均每次检查的流量除以允许的速率即为最短间隔。
+        """
+        if self.daily_budget <= 0 or not self.check_bytes:
+            return base_interval
+        now = datetime.now()
+        remaining_budget = self.daily_budget - self.today()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        remaining_seconds = max(1.0, (midnight - now).total_seconds())
+        if remaining_budget <= 0:
+            interval = self.max_interval
+        else:
+            interval = min(self.max_interval, self.check_bytes / (remaining_budget / remaining_seconds))
+        interval = max(base_interval, int(interval))
+
+        stretched = interval > base_interval
+        if stretched and not self.stretched:
+            self.on_log(
+                f"📉 今日流量 {format_bytes(self.today())} / 预算 {format_bytes(self.daily_budget)}，"
+                f"检查间隔延长至 {interval} 秒"
+            )
+        elif not stretched and self.stretched:
+            self.on_log(f"📈 流量预算充足，检查间隔恢复为 {base_interval} 秒")
+        self.stretched = stretched
+        return interval
+
+    def summary(self):
+        """GUI 状态栏显示的简短统计"""
+        text = f"流量: 本小时 {format_bytes(self.this_hour())} | 今日 {format_bytes(self.today())}"
+        if self.daily_budget > 0:
+            text += f" / {format_bytes(self.daily_budget)}"
+        return text
+
+    def report(self, days=7, hours=24):
+        """按天、按小时的流量明细，供诊断窗口和命令行使用"""
+        with self.lock:
+            self._load()
+            data = json.loads(json.dumps(self.data))
+        names = {'check': "检查", 'login': "登录", 'keepalive': "保活", 'endpoint': "地址", 'dns': "DNS"}
+        lines = [f"  {'时间':<16} {'阶段':<4} {'次数':>6} {'请求':>6} {'发送':>10} {'接收':>10}"]
+        for title, bucket, count in (("按天", 'days', days), ("按小时", 'hours', hours)):
+            lines.append(f"  -- {title} --")
+            for key in sorted(data[bucket])[-count:]:
+                for phase, entry in sorted(data[bucket][key].items()):
+                    lines.append(
+                        f"  {key:<16} {names.get(phase, phase):<4} {entry['cycles']:>6} {entry['requests']:>6} "
+                        f"{format_bytes(entry['sent']):>10} {format_bytes(entry['received']):>10}"
+                    )
+        return "\n".join(lines)
+
+    def _prune(self, now):
+        oldest_hour = (now - timedelta(hours=HOURS_KEPT)).strftime('%Y-%m-%d %H')
+        oldest_day = (now - timedelta(days=DAYS_KEPT)).strftime('%Y-%m-%d')
+        self.data['hours'] = {k: v for k, v in self.data['hours'].items() if k >= oldest_hour}
+        self.data['days'] = {k: v for k, v in self.data['days'].items() if k >= oldest_day}
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.state_file)
+        except OSError:
+            pass
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.data = {'hours': data.get('hours', {}), 'days': data.get('days', {})}
@@ -0,0 +1,470 @@
+"""
+浏览器安装 - 为 playwright install 提供一个本地镜像：按请求的路径依次查找本地镜像目录、下载缓存，
+都没有时从下载源分段并行下载（断点续传，中断后从已完成的字节继续），校验后再交给 playwright：
+配置了校验清单（BROWSER_CHECKSUMS，sha256sum 格式）时比对其中的 sha256，否则只能检查 zip 的完整性（CRC），无法确认文件来源。
+下载缓存可以整个复制给其他机器作为本地镜像目录（BROWSER_MIRROR_DIR），机房批量部署只需下载一次；
+也可以直接解压预先打包的浏览器目录（BROWSER_ARCHIVE），完全离线安装
+"""
+import hashlib
+import http.server
+import json
+import os
+import posixpath
+import shutil
+import tarfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zipfile
+from contextlib import contextmanager
+
+
+CHUNK_SIZE = 256 * 1024
+SEGMENT_RETRIES = 5
+MIN_SEGMENT_BYTES = 4 * 1024 * 1024  # 小于该大小的文件不分段
+PROGRESS_INTERVAL = 0.5  # 进度回调的最小间隔（秒）
+# playwright 下载时的连接空闲超时（毫秒）：本地镜像在文件下载并校验完成后才开始响应
+DOWNLOAD_CONNECTION_TIMEOUT_MS = 60 * 60 * 1000
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_checksums(path):
+    """读取 sha256sum 格式的校验清单（每行 "<sha256>  <文件名或下载路径>"），返回 {名称: sha256}"""
+    checksums = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.split(None, 1)
+            if len(fields) == 2 and len(fields[0]) == 64:
+                name = fields[1].strip().lstrip("*").removeprefix("./")
+                checksums[name] = fields[0].lower()
+    return checksums
+
+
+def verify_file(path, expected=None):
+    """校验文件：给出 expected 时比对 sha256（可确认文件来源）；
+    否则有 .sha256 记录时比对哈希（只能发现缓存之后被改动或损坏），zip 文件检查每个成员的 CRC
+
+    Returns:
+        str | None: 校验失败的原因，通过时为 None
+    """
+    if expected:
+        return None if sha256_file(path) == expected.lower() else "sha256 与校验清单不一致"
+    record = path + ".sha256"
+    if os.path.exists(record):
+        with open(record, encoding='utf-8') as f:
+            fields = f.read().split()
+        if not fields or sha256_file(path) != fields[0].lower():
+            return "sha256 与下载时的记录不一致"
+        return None
+    if path.endswith(".zip"):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                broken = archive.testzip()
+        except (zipfile.BadZipFile, OSError) as e:
+            return f"不是完整的 zip 文件（{e}）"
+        if broken:
+            return f"{broken} 的 CRC 校验失败"
+    return None
+
+
+class SegmentedDownload:
+    """分段并行下载，进度保存在 <文件>.part.json，中断后再次 run() 从已完成的字节继续
+
+    服务器不支持 Range 时退回单连接下载（无法续传）
+    """
+
+    def __init__(self, url, path, connections=4, timeout=30, on_progress=None, cancelled=None):
+        self.url = url
+        self.path = path
+        self.part_file = path + ".part"
+        self.state_file = path + ".part.json"
+        self.connections = max(1, connections)
+        self.timeout = timeout
+        self.on_progress = on_progress or (lambda done, total, speed: None)
+        self.cancelled = cancelled or threading.Event()
+        self.failed = threading.Event()  # 某一段重试后仍失败，其他段随之停止
+        self.lock = threading.Lock()
+        self.size = None
+        self.segments = []  # [{'start', 'end', 'done'}]，end 为 None 表示长度未知
+        self.resumed = 0  # 从上次中断处继续的字节数
+        self.last_report = 0.0
+        self.last_saved = 0.0
+        self.started = 0.0
+
+    @property
+    def done(self):
+        return sum(segment['done'] for segment in self.segments)
+
+    def run(self):
+        """下载到 path，返回下载的字节数（不含续传前已完成的部分）"""
+        size, ranges = self._probe()
+        self.size = size
+        if not self._resume(size, ranges):
+            self.segments = self._plan(size, ranges)
+            with open(self.part_file, 'wb') as f:
+                if size:
+                    f.truncate(size)
+            self._save()
+        self.resumed = self.done
+        self.started = time.monotonic()
+        errors = []
+
+        def worker(segment):
+            try:
+                self._fetch(segment, ranges)
+            except Exception as e:
+                errors.append(e)
+                self.failed.set()
+
+        threads = [threading.Thread(target=worker, args=(segment,), daemon=True) for segment in self.segments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._save()
+        if errors:
+            raise errors[0]
+        if self.cancelled.is_set():
+            raise InterruptedError("下载已取消")
+        if size is not None and self.done != size:
+            raise OSError(f"下载不完整（{self.done}/{size} 字节）")
+        os.replace(self.part_file, self.path)
+        os.remove(self.state_file)
+        self._report(force=True)
+        return self.done - self.resumed
+
+    def _probe(self):
+        """文件大小和是否支持 Range（请求第一个字节）"""
+        request = urllib.request.Request(self.url, headers={'Range': 'bytes=0-0'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status == 206:
+                total = (response.headers.get('Content-Range') or '').rpartition('/')[2]
+                if total.isdigit():
+                    return int(total), True
+            length = response.headers.get('Content-Length')
+            return (int(length) if length and length.isdigit() else None), False
+
+    def _plan(self, size, ranges):
+        if not ranges or not size or size < MIN_SEGMENT_BYTES:
+            return [{'start': 0, 'end': size - 1 if size else None, 'done': 0}]
+        count = min(self.connections, size // (MIN_SEGMENT_BYTES // 2))
+        step = -(-size // count)
+        return [{'start': start, 'end': min(start + step, size) - 1, 'done': 0}
+                for start in range(0, size, step)]
+
+    def _resume(self, size, ranges):
+        """上次的进度与本次的文件一致时继续"""
+        if not ranges or not os.path.exists(self.part_file) or not os.path.exists(self.state_file):
+            return False
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get('url') != self.url or state.get('size') != size or os.path.getsize(self.part_file) != size:
+            return False
+        self.segments = state['segments']
+        return True
+
+    def _fetch(self, segment, ranges):
+        error = None
+        for attempt in range(SEGMENT_RETRIES):
+            if self._stopped():
+                return
+            if segment['end'] is not None and segment['start'] + segment['done'] > segment['end']:
+                return
+            if not ranges:
+                # 不支持续传，从头开始
+                segment['done'] = 0
+            start = segment['start'] + segment['done']
+            headers = {'Range': f"bytes={start}-{segment['end']}"} if ranges else {}
+            try:
+                request = urllib.request.Request(self.url, headers=headers)
+                with urllib.request.urlopen(request, timeout=self.timeout) as response, \
+                        open(self.part_file, 'r+b') as f:
+                    if ranges and response.status != 206:
+                        raise OSError(f"服务器没有按范围返回（HTTP {response.status}）")
+                    f.seek(start)
+                    while not self._stopped():
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        with self.lock:
+                            segment['done'] += len(chunk)
+                        self._report()
+                if segment['end'] is None or self._stopped():
+                    return
+            except (urllib.error.URLError, OSError) as e:
+                error = e
+                self._save()
+                self.cancelled.wait(min(2 ** attempt, 10))
+        if segment['end'] is not None and segment['start'] + segment['done'] <= segment['end']:
+            raise error or OSError("下载不完整")
+
+    def _stopped(self):
+        return self.cancelled.is_set() or self.failed.is_set()
+
+    def _report(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_report < PROGRESS_INTERVAL:
+                return
+            self.last_report = now
+            done = self.done
+            if now - self.last_saved > 2:
+                self.last_saved = now
+                self._save()
+        speed = (done - self.resumed) / max(now - self.started, 0.001)
+        self.on_progress(done, self.size, speed)
+
+    def _save(self):
+        try:
+            tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'url': self.url, 'size': self.size, 'segments': self.segments}, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError:
+            pass
+
+
+class BrowserInstaller:
+    """浏览器安装
+
+    用法:
+        installer = BrowserInstaller.from_env(project_dir, browsers_path, download_host, on_log=print)
+        if not installer.install_archive():
+            with installer.serve() as overrides:   # playwright install 的环境变量
+                env.update(overrides)
+                subprocess.run([... "install", "chromium"], env=env)
+    """
+
+    def __init__(self, browsers_path, download_host, mirror_dir=None, cache_dir=None, archive=None,
+                 connections=4, checksums=None, on_log=None, on_progress=None):
+        self.browsers_path = str(browsers_path)
+        self.download_host = download_host
+        self.mirror_dir = mirror_dir
+        self.cache_dir = cache_dir
+        self.archive = archive
+        self.connections = connections
+        self.checksums = checksums or {}  # 下载路径或文件名 -> 期望的 sha256
+        self.on_log = on_log or (lambda message: None)
+        self.on_progress = on_progress or (lambda name, done, total, speed: None)
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.path_locks = {}  # 下载路径 -> 锁，同一文件只下载一次，不同文件互不阻塞
+        self.downloaded = 0  # 本次从下载源下载的字节数
+
+    @classmethod
+    def from_env(cls, project_dir, browsers_path, download_host, on_log=None, on_progress=None):
+        """按 .env 配置创建，相对路径相对于项目目录"""
+        def resolve(name, default=""):
+            value = os.getenv(name, default)
+            return os.path.join(str(project_dir), value) if value and not os.path.isabs(value) else value or None
+
+        checksums_file = resolve("BROWSER_CHECKSUMS")
+        return cls(
+            browsers_path,
+            download_host,
+            mirror_dir=resolve("BROWSER_MIRROR_DIR"),
+            cache_dir=resolve("BROWSER_CACHE_DIR", "browser_cache"),
+            archive=resolve("BROWSER_ARCHIVE"),
+            connections=int(os.getenv("BROWSER_DOWNLOAD_CONNECTIONS", "4")),
+            checksums=load_checksums(checksums_file) if checksums_file else None,
+            on_log=on_log,
+            on_progress=on_progress,
+        )
+
+    def install_archive(self):
+        """从 BROWSER_ARCHIVE（打包好的浏览器目录，zip 或 tar）安装
+
+        Returns:
+            bool: 是否已从压缩包安装；未配置时为 False，配置了但无法安装时抛出 OSError
+        """
+        if not self.archive:
+            return False
+        if not os.path.isfile(self.archive):
+            raise OSError(f"找不到浏览器压缩包: {self.archive}")
+        self.on_log(f"从压缩包安装浏览器: {self.archive}")
+        problem = verify_file(self.archive, self.expected(os.path.basename(self.archive)))
+        if problem:
+            raise OSError(f"浏览器压缩包校验失败: {problem}")
+        staging = self.browsers_path.rstrip("/\\") + ".extracting"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            _extract(self.archive, staging)
+            root = _find_browsers_root(staging)
+            if root is None:
+                raise OSError("压缩包中没有已完成安装的浏览器（chromium-*/INSTALLATION_COMPLETE）")
+            os.makedirs(self.browsers_path, exist_ok=True)
+            for name in os.listdir(root):
+                target = os.path.join(self.browsers_path, name)
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                elif os.path.exists(target):
+                    os.remove(target)
+                shutil.move(os.path.join(root, name), target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.on_log(f"✓ 已从压缩包安装到 {self.browsers_path}")
+        return True
+
+    @contextmanager
+    def serve(self):
+        """在本机启动镜像服务，返回 playwright install 需要的环境变量"""
+        installer = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                installer._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, name="browser-mirror", daemon=True)
+        thread.start()
+        cancelled = self.cancelled = threading.Event()
+        no_proxy = ",".join(filter(None, [os.getenv("NO_PROXY", ""), "127.0.0.1"]))
+        try:
+            yield {
+                'PLAYWRIGHT_DOWNLOAD_HOST': f"http://127.0.0.1:{server.server_port}",
+                'PLAYWRIGHT_DOWNLOAD_CONNECTION_TIMEOUT': str(DOWNLOAD_CONNECTION_TIMEOUT_MS),
+                'NO_PROXY': no_proxy,
+            }
+        finally:
+            # 停止进行中的下载（进度已保存，下次继续）
+            cancelled.set()
+            self.cancelled = threading.Event()
+            server.shutdown()
+            server.server_close()
+
+    def expected(self, path):
+        """校验清单中该下载路径（或文件名）的 sha256，没有时为 None"""
+        return self.checksums.get(path) or self.checksums.get(posixpath.basename(path))
+
+    def fetch(self, path):
+        """本地镜像目录、下载缓存中校验通过的文件，都没有时从下载源下载到缓存
+
+        Returns:
+            str | None: 本地文件路径，没有下载源且本地没有时为 None
+        """
+        name = posixpath.basename(path)
+        expected = self.expected(path)
+        with self.lock:
+            path_lock = self.path_locks.setdefault(path, threading.Lock())
+        with path_lock:
+            if self.mirror_dir:
+                for candidate in (os.path.join(self.mirror_dir, *path.split("/")), os.path.join(self.mirror_dir, name)):
+                    if os.path.isfile(candidate):
+                        problem = verify_file(candidate, expected)
+                        if problem is None:
+                            self.on_log(f"使用本地镜像: {candidate}")
+                            return candidate
+                        self.on_log(f"⚠️ 本地镜像中的 {name} 校验失败（{problem}），跳过")
+            if not self.cache_dir:
+                return None
+            cached = os.path.join(self.cache_dir, *path.split("/"))
+            if os.path.isfile(cached):
+                problem = verify_file(cached, expected)
+                if problem is None:
+                    self.on_log(f"使用下载缓存: {cached}")
+                    return cached
+                self.on_log(f"⚠️ 下载缓存中的 {name} 校验失败（{problem}），重新下载")
+                os.remove(cached)
+            if not self.download_host:
+                return None
+            if os.path.exists(cached + ".sha256"):
+                os.remove(cached + ".sha256")
+            url = self.download_host.rstrip("/") + "/" + path
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            self.on_log(f"下载 {url}")
+            download = SegmentedDownload(
+                url, cached, connections=self.connections, cancelled=self.cancelled,
+                on_progress=lambda done, total, speed: self.on_progress(name, done, total, speed)
+            )
+            started = time.monotonic()
+            received = download.run()
+            with self.lock:
+                self.downloaded += received
+            problem = verify_file(cached, expected)
+            if problem:
+                os.remove(cached)
+                raise OSError(f"{name} 下载后校验失败: {problem}")
+            # 记录下载时的哈希，之后使用缓存（或复制给其他机器）时可发现文件损坏，但不能证明来源
+            with open(cached + ".sha256", 'w', encoding='utf-8') as f:
+                f.write(f"{expected or sha256_file(cached)}  {name}\n")
+            elapsed = time.monotonic() - started
+            resumed = f"，续传 {download.resumed / 1024 / 1024:.1f} MB" if download.resumed else ""
+            checked = "sha256 与校验清单一致" if expected else (
+                "zip 完整（未配置 BROWSER_CHECKSUMS，未确认来源）" if name.endswith(".zip")
+                else "未校验（未配置 BROWSER_CHECKSUMS）")
+            self.on_log(f"✓ {name} 下载完成: {download.size / 1024 / 1024:.1f} MB，"
+                        f"{elapsed:.1f} 秒（{received / 1024 / 1024 / max(elapsed, 0.001):.1f} MB/s{resumed}），{checked}")
+            return cached
+
+    def _handle(self, request):
+        path = posixpath.normpath(urllib.parse.unquote(urllib.parse.urlsplit(request.path).path)).lstrip("/")
+        if not path or path.startswith("..") or path == ".":
+            request.send_error(404)
+            return
+        try:
+            local = self.fetch(path)
+        except urllib.error.HTTPError as e:
+            # 下载源没有该文件等，原样返回给 playwright
+            self.on_log(f"❌ {posixpath.basename(path)} 获取失败: HTTP {e.code}")
+            request.send_error(e.code)
+            return
+        except Exception as e:
+            self.on_log(f"❌ {posixpath.basename(path)} 获取失败: {e}")
+            request.send_error(502, str(e))
+            return
+        if local is None:
+            self.on_log(f"❌ 本地镜像和缓存中都没有 {path}，且未配置下载源")
+            request.send_error(404)
+            return
+        request.send_response(200)
+        request.send_header('Content-Type', 'application/octet-stream')
+        request.send_header('Content-Length', str(os.path.getsize(local)))
+        request.end_headers()
+        try:
+            with open(local, 'rb') as f:
+                shutil.copyfileobj(f, request.wfile, CHUNK_SIZE)
+        except OSError:
+            pass
+
+
+def _extract(archive, target):
+    """解压 zip 或 tar，zip 中记录的文件权限一并恢复（Linux 上浏览器需要可执行权限）"""
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as f:
+            for info in f.infolist():
+                path = f.extract(info, target)
+                mode = info.external_attr >> 16
+                if mode and not info.is_dir():
+                    os.chmod(path, mode & 0o777)
+        return
+    with tarfile.open(archive) as f:
+        f.extractall(target, filter='data')
+
+
+def _find_browsers_root(staging):
+    """压缩包中包含 chromium-*/INSTALLATION_COMPLETE 的目录（可以是压缩包根目录或其中一层子目录）"""
+    for root, dirs, _ in os.walk(staging):
+        for name in dirs:
+            if name.startswith("chromium") and os.path.exists(os.path.join(root, name, "INSTALLATION_COMPLETE")):
+                return root
+        if root.count(os.sep) - staging.count(os.sep) >= 2:
+            dirs.clear()
+    return None
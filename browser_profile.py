@@ -0,0 +1,286 @@
+"""
+浏览器启动配置 - 低内存 Chromium 启动参数、浏览器复用与内存预算
+low_memory 配置关闭 GPU、扩展、后台网络、组件更新等，限制为单个渲染进程，检查时不加载图片/字体/媒体
+配置了 DnsCache 时，门户和探测主机固定到可信地址（--host-resolver-rules），不在页面加载中解析主机名
+"""
+import glob
+import json
+import os
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import process_utils
+
+
+PROFILE_DEFAULT = "default"
+PROFILE_LOW_MEMORY = "low_memory"
+
+# 注意不要传 --disable-features：Chromium 只认最后一个，会覆盖 Playwright 自己关闭的特性
+LOW_MEMORY_ARGS = [
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-breakpad",
+    "--disable-domain-reliability",
+    "--disable-client-side-phishing-detection",
+    "--disable-dev-shm-usage",
+    "--disable-site-isolation-trials",
+    "--renderer-process-limit=1",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--disk-cache-size=1",
+    "--media-cache-size=1",
+    "--aggressive-cache-discard",
+]
+
+# 检查时不需要的资源类型（样式表会影响元素可见性判断，不能屏蔽）
+PROBE_BLOCKED_RESOURCES = {"image", "media", "font"}
+
+MAX_RECORD_BYTES = 2 * 1024 * 1024
+
+
+def find_headless_shell(browsers_path=None):
+    """查找已安装的 chromium headless shell，找不到返回 None"""
+    browsers_path = browsers_path or os.getenv("PLAYWRIGHT_BROWSERS_PATH")
+    if not browsers_path:
+        return None
+    if sys.platform == "win32":
+        names = ("headless_shell.exe", "chrome-headless-shell.exe")
+    else:
+        names = ("headless_shell", "chrome-headless-shell")
+    candidates = []
+    for name in names:
+        candidates += glob.glob(os.path.join(browsers_path, "chromium_headless_shell-*", "*", name))
+    # 目录名带有版本号，取最新的
+    candidates.sort(reverse=True)
+    return candidates[0] if candidates else None
+
+
+def _browser_pids(driver_pid=None):
+    """浏览器进程列表：有驱动 pid 时为其子孙进程，否则为当前进程孙辈及以下（跳过驱动本身）"""
+    processes = process_utils.list_processes()
+    if driver_pid:
+        return process_utils.get_descendants(driver_pid, processes)
+    own = os.getpid()
+    return [pid for pid in process_utils.get_descendants(own, processes) if processes[pid].ppid != own]
+
+
+class MemoryStats:
+    """检查/登录期间浏览器内存统计（典型值与峰值），记录到 logs/browser_memory.jsonl"""
+
+    def __init__(self, record_file=None, history=200):
+        self.record_file = record_file
+        self.samples = deque(maxlen=history)
+        self.lock = threading.Lock()
+
+    def add(self, profile, phase, rss_mb):
+        sample = {
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'profile': profile,
+            'phase': phase,
+            'rss_mb': rss_mb,
+        }
+        with self.lock:
+            self.samples.append(sample)
+        if not self.record_file:
+            return
+        try:
+            if os.path.exists(self.record_file) and os.path.getsize(self.record_file) > MAX_RECORD_BYTES:
+                os.replace(self.record_file, self.record_file + ".1")
+            with open(self.record_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def load_memory_samples(record_file, limit=1000):
+    """读取浏览器内存记录"""
+    samples = deque(maxlen=limit)
+    try:
+        with open(record_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    samples.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return list(samples)
+
+
+def format_memory_report(samples):
+    """按启动配置和阶段汇总浏览器内存：典型值（中位数）与峰值"""
+    if not samples:
+        return "暂无浏览器内存记录"
+    groups = {}
+    for sample in samples:
+        groups.setdefault((sample['profile'], sample['phase']), []).append(sample['rss_mb'])
+    names = {'check': "检查", 'login': "登录"}
+    lines = [f"  {'配置':<12} {'阶段':<4} {'次数':>6} {'典型MB':>8} {'峰值MB':>8}"]
+    for (profile, phase), values in sorted(groups.items()):
+        values.sort()
+        typical = values[len(values) // 2]
+        lines.append(f"  {profile:<12} {names.get(phase, phase):<4} {len(values):>6} {typical:>8} {values[-1]:>8}")
+    return "\n".join(lines)
+
+
+class BrowserProfile:
+    """浏览器启动配置
+
+    用法:
+        with profile.browser(playwright, 'check', driver_pid=pid, reusable=True) as browser:
+            context = profile.new_context(browser, probe=True)
+            ...
+    """
+
+    def __init__(self, name=PROFILE_LOW_MEMORY, rss_budget_mb=0, keep_alive=False,
+                 memory_file=None, on_log=None, resolver=None):
+        self.name = name if name in (PROFILE_DEFAULT, PROFILE_LOW_MEMORY) else PROFILE_LOW_MEMORY
+        self.rss_budget_mb = rss_budget_mb
+        self.keep_alive = keep_alive
+        self.memory = MemoryStats(memory_file)
+        self.on_log = on_log or (lambda message: None)
+        self.resolver = resolver  # DnsCache，None 时由浏览器自己解析
+        self.headless_shell = find_headless_shell() if self.name == PROFILE_LOW_MEMORY else None
+        self._local = threading.local()  # 每个工作线程各自复用的浏览器
+
+    @classmethod
+    def from_env(cls, memory_file=None, on_log=None, resolver=None):
+        """按 .env 配置创建"""
+        return cls(
+            name=os.getenv("BROWSER_PROFILE", PROFILE_LOW_MEMORY),
+            rss_budget_mb=int(os.getenv("BROWSER_RSS_BUDGET_MB", "250")),
+            keep_alive=os.getenv("BROWSER_KEEP_ALIVE", "false").lower() in ("1", "true", "yes"),
+            memory_file=memory_file,
+            on_log=on_log,
+            resolver=resolver,
+        )
+
+    def launch_options(self, headless=True, **kwargs):
+        """chromium.launch() 的参数"""
+        options = dict(kwargs)
+        options['headless'] = headless
+        if self.name == PROFILE_LOW_MEMORY:
+            options['args'] = LOW_MEMORY_ARGS + list(options.get('args', []))
+            if headless and self.headless_shell:
+                options['executable_path'] = self.headless_shell
+        rules = self._resolver_rules()
+        if rules:
+            options['args'] = list(options.get('args', [])) + [f"--host-resolver-rules={rules}"]
+        return options
+
+    def launch(self, chromium, headless=True, **kwargs):
+        """按配置启动浏览器，headless shell 启动失败时退回默认浏览器"""
+        options = self.launch_options(headless, **kwargs)
+        try:
+            return chromium.launch(**options)
+        except Exception:
+            if 'executable_path' not in options:
+                raise
+            self.on_log("⚠️ headless shell 启动失败，改用默认浏览器")
+            self.headless_shell = None
+            options.pop('executable_path')
+            return chromium.launch(**options)
+
+    def new_context(self, browser, probe=False, meter=None, **kwargs):
+        """创建浏览器上下文
+
+        Args:
+            probe: 检查用的上下文，low_memory 配置下屏蔽图片/字体/媒体并禁用 Service Worker
+            meter: BandwidthMeter，统计该上下文产生的流量
+        """
+        if probe and self.name == PROFILE_LOW_MEMORY:
+            kwargs.setdefault('service_workers', 'block')
+            kwargs.setdefault('viewport', {'width': 800, 'height': 600})
+        context = browser.new_context(**kwargs)
+        if probe and self.name == PROFILE_LOW_MEMORY:
+            context.route("**/*", _block_heavy_resources)
+        if meter is not None:
+            meter.attach(context)
+        return context
+
+    @contextmanager
+    def browser(self, playwright, phase, headless=True, driver_pid=None, reusable=False, **kwargs):
+        """获取一个浏览器，结束时统计内存并关闭（或在预算内保留复用）
+
+        Args:
+            phase: 'check' 或 'login'，用于内存统计
+            driver_pid: Playwright 驱动进程 pid，用于统计浏览器进程树内存
+            reusable: 是否允许在多次检查之间复用（需开启 BROWSER_KEEP_ALIVE）
+        """
+        reuse = reusable and self.keep_alive
+        browser = getattr(self._local, 'browser', None) if reuse else None
+        if browser is not None and not browser.is_connected():
+            browser = None
+        if browser is not None and getattr(self._local, 'rules', None) != self._resolver_rules():
+            # 可信地址变了，启动参数需要更新
+            self.close()
+            browser = None
+        if browser is None:
+            browser = self.launch(playwright.chromium, headless, **kwargs)
+            if reuse:
+                self._local.browser = browser
+                self._local.rules = self._resolver_rules()
+        try:
+            yield browser
+        finally:
+            rss_mb = self._measure(phase, driver_pid)
+            if reuse and browser.is_connected() and not self._over_budget(rss_mb):
+                for context in list(browser.contexts):
+                    try:
+                        context.close()
+                    except Exception:
+                        pass
+            else:
+                if reuse:
+                    self._local.browser = None
+                    if browser.is_connected():
+                        self.on_log(f"♻️ 浏览器内存 {rss_mb} MB 超过预算 {self.rss_budget_mb} MB，已回收")
+                try:
+                    browser.close()
+                except Exception:
+                    pass
+
+    def close(self):
+        """关闭当前线程复用的浏览器"""
+        browser = getattr(self._local, 'browser', None)
+        self._local.browser = None
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception:
+                pass
+
+    def _resolver_rules(self):
+        return self.resolver.resolver_rules() if self.resolver is not None else None
+
+    def _over_budget(self, rss_mb):
+        return self.rss_budget_mb > 0 and rss_mb is not None and rss_mb > self.rss_budget_mb
+
+    def _measure(self, phase, driver_pid):
+        """统计当前浏览器进程树的内存（页面已加载，接近本次周期的峰值）"""
+        if not process_utils.is_supported():
+            return None
+        try:
+            rss = sum(process_utils.get_rss(pid) for pid in _browser_pids(driver_pid))
+        except Exception:
+            return None
+        rss_mb = round(rss / 1024 / 1024, 1)
+        self.memory.add(self.name, phase, rss_mb)
+        return rss_mb
+
+
+def _block_heavy_resources(route):
+    if route.request.resource_type in PROBE_BLOCKED_RESOURCES:
+        route.abort()
+    else:
+        route.continue_()
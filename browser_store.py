@@ -0,0 +1,350 @@
+"""
+浏览器存储 - 同一台机器上的多个部署共用一份浏览器文件
+安装完成的浏览器目录（chromium-<revision> 等）按内容哈希放入机器级存储（trees/<目录名>-<哈希>），
+各部署的 browsers 目录中的文件硬链接到存储中（不在同一分区时改为目录符号链接 / Windows 目录联接，都不行时保留副本）。
+每个部署的 browsers/manifest.json 记录各目录的版本、大小和完整性哈希：判断是否已安装只读这个清单，
+完整性校验（重新计算哈希）只在 setup.py --verify 时进行
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from login_coordinator import InterProcessLock
+
+
+MANIFEST_NAME = "manifest.json"
+BROWSER_DIR = re.compile(r"^[a-z_]+-\d+$")  # playwright 的浏览器目录名：<名称>-<revision>
+INSTALL_MARKER = "INSTALLATION_COMPLETE"
+
+
+def default_store_dir():
+    """机器级存储的默认位置：Windows 为 %PROGRAMDATA%，其他系统为用户缓存目录"""
+    if sys.platform == "win32":
+        return os.path.join(os.getenv("PROGRAMDATA", r"C:\ProgramData"), "campus-login", "browser-store")
+    return os.path.join(os.path.expanduser("~"), ".cache", "campus-login", "browser-store")
+
+
+@functools.lru_cache(maxsize=1)
+def required_browsers():
+    """playwright install chromium 安装的目录名（按当前 playwright 版本的 browsers.json），读取不到时为空列表
+
+    不处理 browsers.json 中按平台覆盖的 revision（仅旧版 macOS 使用）
+    """
+    try:
+        import playwright
+        path = os.path.join(os.path.dirname(playwright.__file__), "driver", "package", "browsers.json")
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (ImportError, OSError, ValueError):
+        return []
+    names = {"chromium", "chromium-headless-shell", "ffmpeg"} | ({"winldd"} if sys.platform == "win32" else set())
+    return [f"{browser['name'].replace('-', '_')}-{browser['revision']}"
+            for browser in data.get('browsers', []) if browser.get('name') in names]
+
+
+def load_manifest(browsers_path):
+    """读取部署的安装清单，没有或无法读取时返回 None"""
+    try:
+        with open(os.path.join(str(browsers_path), MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest.get('browsers'), dict) else None
+
+
+def installed(browsers_path):
+    """浏览器是否已安装：查清单中是否有当前版本的 chromium 目录（不读取浏览器文件）
+
+    没有清单的旧安装按是否存在 chromium-* 目录判断
+    """
+    manifest = load_manifest(browsers_path)
+    if manifest is None:
+        return any(Path(browsers_path).glob("chromium-*"))
+    entries = manifest['browsers']
+    required = [name for name in required_browsers() if name.startswith("chromium-")]
+    required = required or [name for name in entries if name.startswith("chromium-")]
+    return bool(required) and all(
+        name in entries and os.path.isdir(os.path.join(str(browsers_path), name)) for name in required
+    )
+
+
+def verify(browsers_path, on_log=None):
+    """按清单重新计算各浏览器目录的哈希
+
+    Returns:
+        list[str]: 问题列表，为空表示全部一致
+    """
+    on_log = on_log or (lambda message: None)
+    manifest = load_manifest(browsers_path)
+    if manifest is None:
+        return ["没有安装清单（manifest.json），请重新安装浏览器"]
+    problems = []
+    for name, entry in sorted(manifest['browsers'].items()):
+        path = os.path.join(str(browsers_path), name)
+        if not os.path.isdir(path):
+            problems.append(f"{name}: 目录不存在")
+            continue
+        on_log(f"校验 {name}...")
+        digest, size, files = tree_digest(path)
+        if digest != entry['hash']:
+            problems.append(f"{name}: 哈希不一致（{files} 个文件 / {size} 字节，清单记录 {entry['files']} / {entry['size']}）")
+    return problems
+
+
+def tree_digest(path):
+    """目录的内容哈希：按相对路径排序，包含每个文件的 sha256、可执行位和符号链接目标
+
+    Returns:
+        tuple[str, int, int]: (哈希, 总字节数, 文件数)
+    """
+    digest = hashlib.sha256()
+    size = files = 0
+    for relative, full in _walk(path):
+        if os.path.islink(full):
+            digest.update(f"L\0{relative}\0{os.readlink(full)}\n".encode())
+            continue
+        file_hash = hashlib.sha256()
+        with open(full, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                file_hash.update(chunk)
+        executable = int(os.access(full, os.X_OK)) if sys.platform != "win32" else 0
+        digest.update(f"F\0{relative}\0{executable}\0{file_hash.hexdigest()}\n".encode())
+        size += os.path.getsize(full)
+        files += 1
+    return digest.hexdigest(), size, files
+
+
+class BrowserStore:
+    """机器级浏览器存储
+
+    用法:
+        store = BrowserStore.from_env(on_log=print)
+        if not store.link(browsers_path):     # 存储中已有当前版本时直接链接，不用下载
+            ...                               # playwright install / 压缩包安装
+            store.adopt(browsers_path)        # 放入存储并写安装清单
+    """
+
+    def __init__(self, root=None, on_log=None):
+        self.root = root  # None 表示不使用共享存储，只写安装清单
+        self.on_log = on_log or (lambda message: None)
+
+    @classmethod
+    def from_env(cls, on_log=None):
+        """按 .env 配置创建，BROWSER_STORE=false 时不使用共享存储"""
+        enabled = os.getenv("BROWSER_STORE", "true").lower() in ("1", "true", "yes")
+        return cls(os.getenv("BROWSER_STORE_DIR", "") or default_store_dir() if enabled else None, on_log=on_log)
+
+    @property
+    def trees_dir(self):
+        return os.path.join(self.root, "trees")
+
+    def link(self, browsers_path, names=None):
+        """从存储中链接浏览器目录到部署，names 默认为当前 playwright 版本需要的目录
+
+        Returns:
+            bool: 需要的目录是否都已在部署中（存储中缺少任何一个时不做改动并返回 False）
+        """
+        names = names or required_browsers()
+        if not self.root or not names:
+            return False
+        store_manifest = self._load_store_manifest()
+        if any(name not in store_manifest for name in names):
+            return False
+        os.makedirs(browsers_path, exist_ok=True)
+        manifest = load_manifest(browsers_path) or {'browsers': {}}
+        for name in names:
+            entry = dict(store_manifest[name])
+            target = os.path.join(str(browsers_path), name)
+            tree = os.path.join(self.trees_dir, entry['tree'])
+            if manifest['browsers'].get(name, {}).get('hash') == entry['hash'] and os.path.isdir(target):
+                continue
+            if os.path.lexists(target):
+                _remove(target)
+            entry['link'] = _materialize(tree, target)
+            manifest['browsers'][name] = entry
+            self.on_log(f"✓ 已从共享存储链接 {name}（{_LINK_LABELS[entry['link']]}）")
+        self._save_manifest(browsers_path, manifest)
+        return True
+
+    def adopt(self, browsers_path):
+        """把部署中已完成安装的浏览器目录放入存储（部署中的文件改为链接），并写安装清单
+
+        Returns:
+            dict: 安装清单
+        """
+        manifest = load_manifest(browsers_path) or {'browsers': {}}
+        if not os.path.isdir(str(browsers_path)):
+            return manifest
+        lock = None
+        if self.root:
+            os.makedirs(self.trees_dir, exist_ok=True)
+            lock = InterProcessLock(os.path.join(self.root, "store.lock"))
+            if not lock.acquire(timeout=300):
+                self.on_log("⚠️ 共享存储被其他安装占用，本次只写安装清单")
+                lock = None
+        try:
+            store_manifest = self._load_store_manifest() if lock else {}
+            for name in sorted(os.listdir(str(browsers_path))):
+                path = os.path.join(str(browsers_path), name)
+                if not BROWSER_DIR.match(name) or not os.path.exists(os.path.join(path, INSTALL_MARKER)):
+                    continue
+                known = manifest['browsers'].get(name)
+                if known and known.get('tree') and os.path.islink(path):
+                    continue  # 已经链接到存储
+                self.on_log(f"计算 {name} 的完整性哈希...")
+                digest, size, files = tree_digest(path)
+                entry = {'revision': name.rsplit("-", 1)[1], 'hash': digest, 'size': size, 'files': files,
+                         'tree': None, 'link': 'local', 'added_at': time.time()}
+                if lock:
+                    entry['tree'] = f"{name}-{digest[:16]}"
+                    entry['link'] = self._store_tree(path, os.path.join(self.trees_dir, entry['tree']))
+                    store_manifest[name] = {key: entry[key] for key in
+                                            ('revision', 'hash', 'size', 'files', 'tree', 'added_at')}
+                    self.on_log(f"✓ {name} 已放入共享存储（{files} 个文件，{size / 1024 / 1024:.0f} MB，"
+                                f"{_LINK_LABELS[entry['link']]}）")
+                manifest['browsers'][name] = entry
+            if lock:
+                self._save_json(os.path.join(self.root, MANIFEST_NAME), store_manifest)
+        finally:
+            if lock:
+                lock.release()
+        manifest['store'] = self.root
+        self._save_manifest(browsers_path, manifest)
+        return manifest
+
+    def _store_tree(self, path, tree):
+        """把部署中的目录放入存储（同一分区时硬链接，不占额外空间），返回部署与存储的链接方式"""
+        if not os.path.isdir(tree):
+            staging = f"{tree}.{os.getpid()}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.copytree(path, staging, symlinks=True, copy_function=_link_or_copy)
+            try:
+                os.rename(staging, tree)
+            except OSError:
+                # 其他部署同时放入了同一内容
+                shutil.rmtree(staging, ignore_errors=True)
+        if _same_file(path, tree):
+            return 'hardlink'
+        # 不在同一分区：部署中的目录改为指向存储的链接，失败时保留原目录
+        backup = f"{path}.{os.getpid()}.old"
+        os.rename(path, backup)
+        try:
+            link = _materialize(tree, path, allow_copy=False)
+        except OSError:
+            os.rename(backup, path)
+            return 'copy'
+        shutil.rmtree(backup, ignore_errors=True)
+        return link
+
+    def _load_store_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST_NAME), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # 只保留存储中实际存在的目录
+        return {name: entry for name, entry in data.items()
+                if isinstance(entry, dict) and os.path.isdir(os.path.join(self.trees_dir, entry.get('tree', '')))}
+
+    def _save_manifest(self, browsers_path, manifest):
+        manifest['updated_at'] = time.time()
+        self._save_json(os.path.join(str(browsers_path), MANIFEST_NAME), manifest)
+
+    def _save_json(self, path, data):
+        try:
+            tmp_file = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, path)
+        except OSError as e:
+            self.on_log(f"⚠️ 无法写入 {path}: {e}")
+
+
+_LINK_LABELS = {
+    'hardlink': "硬链接",
+    'symlink': "符号链接",
+    'junction': "目录联接",
+    'copy': "副本，不在同一分区且无法创建链接",
+    'local': "未使用共享存储",
+}
+
+
+def _materialize(tree, target, allow_copy=True):
+    """在 target 处建立存储目录 tree 的链接：逐个文件硬链接、目录符号链接、目录联接，都不行时复制
+
+    Returns:
+        str: 'hardlink' / 'symlink' / 'junction' / 'copy'
+    """
+    staging = f"{target}.{os.getpid()}.linking"
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        shutil.copytree(tree, staging, symlinks=True, copy_function=os.link)
+        os.rename(staging, target)
+        return 'hardlink'
+    except (OSError, shutil.Error):
+        shutil.rmtree(staging, ignore_errors=True)
+    try:
+        os.symlink(tree, target, target_is_directory=True)
+        return 'symlink'
+    except OSError:
+        pass
+    if sys.platform == "win32":
+        try:
+            import _winapi
+            _winapi.CreateJunction(tree, target)
+            return 'junction'
+        except OSError:
+            pass
+    if not allow_copy:
+        raise OSError(f"无法链接 {tree}")
+    shutil.copytree(tree, target, symlinks=True)
+    return 'copy'
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _same_file(path, tree):
+    """部署目录中的文件是否与存储共用（取第一个普通文件比较）"""
+    for relative, full in _walk(path):
+        if not os.path.islink(full):
+            try:
+                return os.path.samefile(full, os.path.join(tree, relative))
+            except OSError:
+                return False
+    return False
+
+
+def _walk(path):
+    """按相对路径排序的文件列表（符号链接不展开），相对路径统一用 /"""
+    result = []
+    for root, dirs, files in os.walk(path):
+        for name in dirs:
+            full = os.path.join(root, name)
+            if os.path.islink(full):
+                result.append(full)
+        result += [os.path.join(root, name) for name in files]
+    return sorted((os.path.relpath(full, path).replace(os.sep, "/"), full) for full in result)
+
+
+def _remove(path):
+    if os.path.islink(path) or (sys.platform == "win32" and os.path.isdir(path) and _is_junction(path)):
+        os.unlink(path) if os.path.islink(path) else os.rmdir(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def _is_junction(path):
+    return hasattr(os.path, 'isjunction') and os.path.isjunction(path)
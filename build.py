@@ -66,8 +66,164 @@ PLAYWRIGHT_DOWNLOAD_HOST=https://npmmirror.com/mirrors/playwright/
 # 浏览器驱动存放路径（相对路径或绝对路径）
 PLAYWRIGHT_BROWSERS_PATH=browsers
 
+# 浏览器安装：本地镜像目录（下载缓存或手动放入的 chromium-*.zip 等文件），有时不从镜像源下载
+BROWSER_MIRROR_DIR=
+# 下载缓存目录，下载中断后从已完成的部分继续，可整个复制给其他机器作为本地镜像目录
+BROWSER_CACHE_DIR=browser_cache
+# 分段并行下载的连接数
+BROWSER_DOWNLOAD_CONNECTIONS=4
+# 离线安装：打包好的浏览器目录压缩包（zip/tar），配置后直接解压，不执行 playwright install
+BROWSER_ARCHIVE=
+# 校验清单（sha256sum 格式，每行 "<sha256>  <文件名>"），配置后下载、本地镜像和压缩包都按其中的 sha256 校验；
+# 未配置时只检查 zip 完整性，无法确认文件来源
+BROWSER_CHECKSUMS=
+# 共享浏览器存储：同一台机器上的多个部署共用一份浏览器文件（硬链接），已有当前版本时安装直接链接
+BROWSER_STORE=true
+# 共享存储目录，留空为默认位置（Windows: %PROGRAMDATA%/campus-login/browser-store，其他: ~/.cache/campus-login/browser-store）
+BROWSER_STORE_DIR=
+
 # 网络检查间隔（秒）
 CHECK_INTERVAL_SECONDS=30
+
+# 工作进程内存预算（MB），超过后自动重启工作进程，0 表示不限制
+WORKER_MEMORY_BUDGET_MB=600
+
+# 工作进程卡死判定时间（秒），检查或登录超过该时间未完成则重启工作进程
+WORKER_HANG_TIMEOUT_SECONDS=120
+
+# 看门狗截止时间（秒）：单次检查/登录超时后强制结束浏览器进程
+CHECK_DEADLINE_SECONDS=45
+LOGIN_DEADLINE_SECONDS=90
+
+# 资源泄漏检测窗口：连续多少次检查/登录后资源占用持续增长则告警
+LEAK_DETECT_WINDOW=10
+
+# 浏览器启动配置：low_memory（精简参数、单渲染进程、检查时不加载图片）或 default
+BROWSER_PROFILE=low_memory
+
+# 是否在多次检查之间复用浏览器（省去每次启动，但常驻内存）
+BROWSER_KEEP_ALIVE=false
+
+# 复用浏览器的内存预算（MB），超过后关闭并重新启动，0 表示不限制
+BROWSER_RSS_BUDGET_MB=250
+
+# 每日流量预算（MB），检查流量超出按天平均的预算时自动延长检查间隔，0 表示不限制
+DAILY_BANDWIDTH_BUDGET_MB=0
+
+# 按流量预算延长后的最长检查间隔（秒）
+BANDWIDTH_MAX_INTERVAL_SECONDS=1800
+
+# 掉线恢复目标（秒）：从第一次检查失败到确认联网，单次或 p95 超过时在日志和托盘提示中告警，0 表示不告警
+RECOVERY_SLO_SECONDS=120
+
+# 结构化事件日志（logs/events.jsonl，每行一个 JSON 事件）：是否启用 / 单个文件上限（MB）/ 保留的轮转文件数
+EVENT_LOG=true
+EVENT_LOG_MAX_MB=100
+EVENT_LOG_BACKUPS=3
+
+# 失败诊断（logs/failures/）：登录失败时保存截图、页面、msg-zone 文本和网络请求，按总大小（MB）和条目数淘汰旧记录
+FAILURE_CAPTURE=true
+FAILURE_CAPTURE_MAX_MB=50
+FAILURE_CAPTURE_MAX_ENTRIES=30
+# 同时保存 Playwright trace（每次登录都录制，成功时丢弃，会增加一些开销）
+FAILURE_TRACE=false
+
+# 性能剖析：用 cProfile 剖析前 N 次检查/登录，.prof 文件保存到 logs/profiles/，0 表示不剖析（未启用时没有任何开销）
+PROFILE_CYCLES=0
+# 剖析哪些阶段（check / login，逗号分隔）/ 日志中显示耗时最多的前几个函数
+PROFILE_PHASES=check,login
+PROFILE_TOP=15
+
+# 休眠唤醒检测：Windows/macOS 上每次最多等待多少秒就核对一次时钟（即唤醒后最迟多久开始检查，Linux 上不需要）/
+# 时钟偏差超过多少秒视为休眠或系统时间调整
+RESUME_POLL_SECONDS=15
+CLOCK_JUMP_SECONDS=10
+
+# 空闲测量：在日志和事件日志中输出每两次检查之间的唤醒次数（次/分钟，仅 Linux）和 CPU 占用
+IDLE_MEASURE=false
+
+# 会话保活：在门户空闲超时之前发送一个最小的请求，避免被注销后再走一遍浏览器登录
+KEEPALIVE=true
+# 保活请求地址（门户的心跳接口等），留空使用 PROBE_URL
+KEEPALIVE_URL=
+# 门户空闲超时（秒），0 表示从掉线记录中自动学习 / 在超时的多大比例时保活
+PORTAL_IDLE_TIMEOUT_SECONDS=0
+KEEPALIVE_MARGIN=0.6
+
+# 会话到期预测：从检查记录中学习门户按固定会话时长或固定维护时间注销的规律，到期前后密集检查
+PREDICT_EXPIRY=true
+# 预测到期前多少秒开始密集检查 / 密集检查的间隔（秒） / 注销时间相差多少秒以内算同一规律
+PREDICT_LEAD_SECONDS=30
+PREDICT_BURST_SECONDS=10
+PREDICT_SPREAD_SECONDS=180
+# 置信度达到多少时密集检查 / 达到多少时一次未登录即确认掉线并立即登录 / 至少几次注销才算规律
+PREDICT_BURST_CONFIDENCE=0.6
+PREDICT_LOGIN_CONFIDENCE=0.85
+PREDICT_MIN_SAMPLES=3
+
+# 门户地址：LOGIN_URL 之外等价的备用地址（其他主机名、IP、http/https），逗号分隔；按打开耗时排序，打不开时切换
+LOGIN_URL_FALLBACKS=
+# 最快的地址超过多少秒才算慢 / 慢或状况未知时对冲请求的间隔（秒） / 打开失败后冷却多少秒
+ENDPOINT_SLOW_SECONDS=3
+ENDPOINT_HEDGE_SECONDS=1.5
+ENDPOINT_COOLDOWN_SECONDS=300
+
+# 多网卡监控：有线和无线各自需要门户会话时，逗号分隔的网卡，每项为 名称=源地址、网卡名（仅 Linux）或源地址
+# 每个网卡独立探测、独立登录（绑定源地址的 HTTP 请求，不经浏览器），留空不启用
+# 承载默认路由的网卡只探测、不做表单登录（由浏览器监控登录），表单登录与浏览器登录共用 login.lock 串行执行
+INTERFACES=
+# 表单登录：门户认证接口地址、URL 编码的表单（{username}/{password} 会被替换）、响应中表示成功的文本（留空时以探测确认）
+HTTP_LOGIN_URL=
+HTTP_LOGIN_FORM=user={username}&pass={password}
+HTTP_LOGIN_SUCCESS=
+HTTP_LOGIN_TIMEOUT_SECONDS=10
+# 各网卡的登录串行执行，两次登录至少间隔多少秒
+INTERFACE_LOGIN_SPACING_SECONDS=10
+
+# DNS 缓存：门户和探测主机的解析结果缓存多少秒，过期后多少秒内先用旧结果、在后台刷新
+# 确认在线时的解析结果固定到浏览器和连通性探测，掉线时不再等待被门户接管的 DNS
+DNS_CACHE=true
+DNS_TTL_SECONDS=300
+DNS_STALE_SECONDS=86400
+# 没有缓存时等待解析的最长时间（秒）
+DNS_TIMEOUT_SECONDS=2
+
+# HTTP 连接池：连通性探测、会话保活、门户地址对冲和表单登录复用 keep-alive 连接和 TLS 会话
+# 每个主机最多保持几个连接，空闲连接最多保留多少秒（服务器声明的超时更短时以服务器为准）
+HTTP_POOL_PER_HOST=2
+HTTP_POOL_IDLE_SECONDS=30
+# 保活和对冲请求带 ETag / Last-Modified，门户页面未变化时只返回 304
+HTTP_CONDITIONAL=true
+# 门户预检：检查前先用连接池请求门户页面，页面与上次“已登录”时相同且外网可达时不打开浏览器
+# 距上次浏览器检查超过多少秒时仍打开浏览器确认（0 或 PORTAL_PRECHECK=false 为每次都打开浏览器）
+PORTAL_PRECHECK=true
+PORTAL_PRECHECK_MAX_SECONDS=300
+
+# 本地控制接口（仅命令行版本）：端口为 0 且未设置套接字时不启动，只允许监听本机
+CONTROL_HOST=127.0.0.1
+CONTROL_PORT=0
+# Unix 套接字路径（设置后代替端口，例如 /run/campus-login.sock）
+CONTROL_SOCKET=
+# 执行操作需要的令牌（请求头 Authorization: Bearer <令牌>），留空表示不校验
+CONTROL_TOKEN=
+
+# 连通性探测地址（应返回 HTTP 204，未认证时会被门户拦截）
+PROBE_URL=http://connect.rom.miui.com/generate_204
+
+# 连接状态机阈值：连续多少次确认掉线才登录 / 连续多少次在线才恢复
+STATE_OFFLINE_CONFIRMATIONS=2
+STATE_ONLINE_CONFIRMATIONS=1
+
+# 疑似掉线时的快速复查间隔（秒）
+SUSPECT_RECHECK_SECONDS=5
+
+# 登录失败后的退避时间（秒）：从基础值开始指数增长，不超过最大值
+# 账号密码错误时暂停自动登录，直到修改配置或手动登录
+LOGIN_BACKOFF_BASE_SECONDS=30
+LOGIN_BACKOFF_MAX_SECONDS=1800
+
+# 流量或余额用尽时的冷却时间（秒）
+LOGIN_QUOTA_COOLDOWN_SECONDS=3600
 """
     
     with open(".env.example", "w", encoding="utf-8") as f:
@@ -104,6 +260,7 @@ def create_readme():
 - 校园网自动登录.exe：主程序
 - _internal/：程序依赖文件（由 PyInstaller 生成）
 - browsers/：浏览器驱动文件夹（首次运行自动创建）
+- browser_cache/：浏览器下载缓存（安装时创建，可以删除，也可以复制给其他机器作为本地镜像目录）
 - logs/：日志文件夹（自动创建）
 - .env：配置文件（需要手动创建）
 
@@ -124,6 +281,10 @@ def create_readme():
 - 检查网络连接
 - 手动点击"安装依赖"按钮重试
 - 修改 .env 中的 PLAYWRIGHT_DOWNLOAD_HOST 镜像源
+- 再次点击"安装依赖"会从中断处继续下载（browser_cache 目录）
+- 无法联网时，把其他机器的 browser_cache 目录复制过来并设置 BROWSER_MIRROR_DIR，
+  或设置 BROWSER_ARCHIVE 为打包好的 browsers 目录
+- 同一台电脑上已有其他副本安装过浏览器时，会直接从共享浏览器存储链接（BROWSER_STORE_DIR），不再下载
 
 ### 登录失败？
 - 检查账号密码是否正确
@@ -13,6 +13,34 @@ a = Analysis(
     datas=[
         ('ui_layout_tk.py', '.'),  # UI 布局模块
         ('setup.py', '.'),  # 安装脚本
+        ('browser_install.py', '.'),  # 浏览器安装
+        ('browser_store.py', '.'),  # 共享浏览器存储
+        ('supervisor.py', '.'),  # 工作进程监管器
+        ('automation_worker.py', '.'),  # 自动化工作进程
+        ('process_utils.py', '.'),  # 进程工具
+        ('login_coordinator.py', '.'),  # 登录任务协调器
+        ('execution_service.py', '.'),  # 执行服务（工作线程池）
+        ('connection_state.py', '.'),  # 连接状态机
+        ('connectivity_probe.py', '.'),  # 连通性探测
+        ('login_policy.py', '.'),  # 登录失败分类与熔断
+        ('cycle_watchdog.py', '.'),  # 看门狗
+        ('resource_monitor.py', '.'),  # 资源采样
+        ('browser_profile.py', '.'),  # 浏览器启动配置
+        ('bandwidth.py', '.'),  # 流量统计
+        ('history_store.py', '.'),  # 历史记录
+        ('recovery_slo.py', '.'),  # 掉线恢复耗时
+        ('control_server.py', '.'),  # 本地控制接口
+        ('event_log.py', '.'),  # 结构化事件日志
+        ('failure_capture.py', '.'),  # 失败诊断
+        ('cycle_profiler.py', '.'),  # 性能剖析
+        ('check_scheduler.py', '.'),  # 休眠感知的检查调度
+        ('idle_meter.py', '.'),  # 空闲测量
+        ('session_keepalive.py', '.'),  # 会话保活
+        ('expiry_predictor.py', '.'),  # 会话到期预测
+        ('portal_endpoints.py', '.'),  # 门户地址选择
+        ('interface_monitor.py', '.'),  # 多网卡监控
+        ('dns_cache.py', '.'),  # DNS 缓存
+        ('http_pool.py', '.'),  # HTTP 连接池
     ],
     hiddenimports=[
         # Playwright 相关
@@ -46,8 +74,8 @@ a = Analysis(
         'PIL._tkinter_finder',
         
         # 其他依赖
+        'multiprocessing',
         'dotenv',
-        'schedule',
     ],
     hookspath=[],
     hooksconfig={},
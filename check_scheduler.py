@@ -0,0 +1,183 @@
+"""
+检查调度 - 感知系统休眠/唤醒和系统时间跳变的等待
+time.monotonic 和基于它的超时等待在系统休眠期间不计时，唤醒后还要等完剩余的间隔，第一次检查最多被推迟一个完整间隔，
+而 schedule 按系统时间计时，系统时间被调整时会提前或推迟触发。
+这里按包含休眠时间的时钟（Linux CLOCK_BOOTTIME、macOS CLOCK_MONOTONIC）计算截止时间，发现休眠后立即返回，
+错过的多次检查合并为一次。
+Linux 上用该时钟的 timerfd 和 eventfd 阻塞等待，两次检查之间没有任何唤醒；其他平台分段等待并比较两种时钟
+"""
+import os
+import select
+import sys
+import threading
+import time
+
+
+# wait() 的返回值
+DUE = "due"          # 到达截止时间
+RESUMED = "resumed"  # 系统从休眠中唤醒
+WOKEN = "woken"      # 等待的事件被触发（停止监控、控制接口操作等）
+
+
+def suspend_clock():
+    """包含休眠时间的单调时钟，没有时返回 None"""
+    if sys.platform.startswith("linux") and hasattr(time, "CLOCK_BOOTTIME"):
+        return lambda: time.clock_gettime(time.CLOCK_BOOTTIME)
+    if sys.platform == "darwin" and hasattr(time, "CLOCK_MONOTONIC"):
+        # macOS 的 time.monotonic 不含休眠时间，CLOCK_MONOTONIC 包含
+        return lambda: time.clock_gettime(time.CLOCK_MONOTONIC)
+    return None
+
+
+class Wakeup:
+    """可从其他线程唤醒的等待事件（接口同 threading.Event）
+
+    Linux 上附带 eventfd，CheckScheduler 可以把它和 timerfd 放在一起阻塞等待；不再使用时需 close()
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()  # close() 之后其他线程不再写入（文件描述符可能已被复用）
+        self._fd = None
+        if hasattr(os, "eventfd"):
+            self._fd = os.eventfd(0, os.EFD_CLOEXEC | os.EFD_NONBLOCK)
+
+    def set(self):
+        self._event.set()
+        with self._lock:
+            if self._fd is not None:
+                os.eventfd_write(self._fd, 1)
+
+    def clear(self):
+        self._event.clear()
+        with self._lock:
+            if self._fd is not None:
+                try:
+                    os.eventfd_read(self._fd)
+                except BlockingIOError:
+                    pass
+
+    def close(self):
+        """关闭 eventfd，之后仍可作为普通事件使用"""
+        with self._lock:
+            fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def fileno(self):
+        return self._fd
+
+
+class CheckScheduler:
+    """休眠感知的检查调度
+
+    用法:
+        reason = scheduler.wait(interval, token)
+        if reason == RESUMED:
+            ...  # 立即检查
+
+    Linux/macOS 上比较不含休眠的 time.monotonic 与包含休眠的时钟，差值即休眠时长；
+    Windows 上 time.monotonic 本身包含休眠时间，而超时等待不含，按实际经过时间超出分段等待时长判断。
+    Linux 上等待 Wakeup 时不分段：CLOCK_BOOTTIME 的 timerfd 在截止时间到达时（包括休眠期间到达、唤醒后）才触发；
+    不再使用时需 close()
+    """
+
+    def __init__(self, poll=15, threshold=10, on_log=None):
+        self.poll = max(1, poll)
+        self.threshold = threshold
+        self.on_log = on_log or (lambda message: None)
+        clock = suspend_clock()
+        self.clock = clock or time.monotonic
+        self.compare_monotonic = clock is not None
+        self.timerfd = None
+        if hasattr(os, "timerfd_create") and hasattr(time, "CLOCK_BOOTTIME") and clock is not None:
+            self.timerfd = os.timerfd_create(time.CLOCK_BOOTTIME, flags=os.TFD_CLOEXEC | os.TFD_NONBLOCK)
+        self.last_sleep = 0.0  # 最近一次检测到的休眠时长（秒）
+
+    @classmethod
+    def from_env(cls, on_log=None):
+        """按 .env 中的休眠检测配置创建"""
+        return cls(
+            poll=int(os.getenv("RESUME_POLL_SECONDS", "15")),
+            threshold=int(os.getenv("CLOCK_JUMP_SECONDS", "10")),
+            on_log=on_log,
+        )
+
+    def close(self):
+        """关闭 timerfd，之后的等待改为分段等待"""
+        timerfd, self.timerfd = self.timerfd, None
+        if timerfd is not None:
+            os.close(timerfd)
+
+    def now(self):
+        """调度用的时钟（包含休眠时间，不受系统时间调整影响）"""
+        return self.clock()
+
+    def wait(self, delay, event):
+        """等待 delay 秒，见 wait_until()"""
+        return self.wait_until(self.now() + delay, event)
+
+    def wait_until(self, deadline, event):
+        """等待到截止时间（按 now() 的时钟）
+
+        Linux 上等待 Wakeup 时一次阻塞到底，其他情况每次最多等待 poll 秒并检查期间是否发生过休眠；
+        截止时间已过（包括休眠期间错过）只返回一次
+
+        Args:
+            event: 带 wait(timeout) 方法的对象（Wakeup、threading.Event、CancellationToken），被触发时立即返回
+
+        Returns:
+            str: DUE / RESUMED / WOKEN
+        """
+        if self.timerfd is not None and isinstance(event, Wakeup) and event.fileno() is not None:
+            return self._wait_timerfd(deadline, event)
+        while True:
+            remaining = deadline - self.now()
+            if remaining <= 0:
+                return DUE
+            timeout = min(remaining, self.poll)
+            before = (time.monotonic(), self.clock(), time.time())
+            if event.wait(timeout):
+                return WOKEN
+            if self._detect(before, timeout):
+                return RESUMED
+
+    def _wait_timerfd(self, deadline, event):
+        """一次阻塞等待到截止时间或事件触发，期间没有唤醒"""
+        if event.is_set():
+            return WOKEN
+        if deadline - self.now() <= 0:
+            return DUE
+        before = (time.monotonic(), self.clock(), time.time())
+        os.timerfd_settime(self.timerfd, flags=os.TFD_TIMER_ABSTIME, initial=deadline)
+        try:
+            select.select([self.timerfd, event.fileno()], [], [])
+        finally:
+            os.timerfd_settime(self.timerfd, initial=0)  # 解除定时
+        if event.is_set():
+            return WOKEN
+        if self._detect(before, 0):
+            return RESUMED
+        return DUE
+
+    def _detect(self, before, timeout):
+        """比较各时钟在一次分段等待中的走时，发现休眠返回 True，系统时间跳变只记录日志"""
+        monotonic, clock, wall = time.monotonic(), self.clock(), time.time()
+        elapsed = clock - before[1]
+        awake = monotonic - before[0] if self.compare_monotonic else timeout
+        asleep = elapsed - awake
+        # 系统时间的变化应与包含休眠的时钟一致，偏差即时间被调整（NTP 同步、手动修改、时区等）
+        jump = (wall - before[2]) - elapsed
+        if abs(jump) > self.threshold:
+            self.on_log(f"🕒 系统时间{'前进' if jump > 0 else '后退'}了 {abs(jump):.0f} 秒，检查调度不受影响")
+        if asleep > self.threshold:
+            self.last_sleep = asleep
+            self.on_log(f"💤 系统休眠约 {asleep:.0f} 秒后唤醒，立即检查")
+            return True
+        return False
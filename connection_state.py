@@ -0,0 +1,201 @@
+"""
+连接状态机 - 综合门户页面检查和连通性探测判断在线/离线
+状态转换需要连续多次确认（滞回），只有确认掉线后才触发登录，避免一次慢加载就打开登录浏览器
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from connectivity_probe import PROBE_ONLINE, PROBE_CAPTIVE
+
+
+# 连接状态
+ONLINE = "online"
+SUSPECT = "suspect"
+OFFLINE = "offline"
+LOGGING_IN = "logging_in"
+LOCKED_OUT = "locked_out"
+
+STATE_LABELS = {
+    ONLINE: "已登录",
+    SUSPECT: "疑似掉线",
+    OFFLINE: "已掉线",
+    LOGGING_IN: "正在登录",
+    LOCKED_OUT: "登录已锁定",
+}
+
+# 门户页面检查结果
+PORTAL_LOGGED_IN = "logged_in"
+PORTAL_LOGGED_OUT = "logged_out"
+PORTAL_UNKNOWN = "unknown"  # 超时、出错或页面无法识别
+
+
+class ConnectionStateMachine:
+    """连接状态机
+
+    每个检查周期调用 observe() 输入信号，根据返回的状态决定是否登录：
+        - 门户显示已登录，或探测外网可达 -> 在线证据
+        - 门户显示未登录，或探测被门户拦截 -> 确认掉线证据
+        - 检查出错/超时且外网不可达 -> 仅作为可疑证据，单独不会触发登录
+    """
+
+    def __init__(self, offline_confirmations=2, online_confirmations=1,
+                 suspect_recheck=5, transition_log=None, on_transition=None):
+        self.offline_confirmations = max(1, offline_confirmations)
+        self.online_confirmations = max(1, online_confirmations)
+        self.suspect_recheck = suspect_recheck
+        self.transition_log = transition_log
+        self.on_transition = on_transition
+
+        self.lock = threading.RLock()
+        self.state = ONLINE
+        self.entered_at = time.time()
+        self.offline_evidence = 0  # 连续的确认掉线证据
+        self.suspect_evidence = 0  # 连续的可疑证据（含出错）
+        self.online_evidence = 0
+        self.fast_path = None  # 休眠唤醒后或预测到期时的下一次检查，一次掉线证据即确认（值为转换原因）
+
+    @classmethod
+    def from_env(cls, transition_log=None, on_transition=None):
+        """按 .env 中的阈值配置创建状态机"""
+        return cls(
+            offline_confirmations=int(os.getenv("STATE_OFFLINE_CONFIRMATIONS", "2")),
+            online_confirmations=int(os.getenv("STATE_ONLINE_CONFIRMATIONS", "1")),
+            suspect_recheck=int(os.getenv("SUSPECT_RECHECK_SECONDS", "5")),
+            transition_log=transition_log,
+            on_transition=on_transition,
+        )
+
+    @property
+    def label(self):
+        return STATE_LABELS[self.state]
+
+    def observe(self, portal, probe=None):
+        """输入一次检查的信号
+
+        Args:
+            portal: 门户页面检查结果（PORTAL_*）
+            probe: 连通性探测结果（PROBE_*），None 表示未探测
+
+        Returns:
+            str: 更新后的状态
+        """
+        with self.lock:
+            if self.state == LOGGING_IN:
+                return self.state
+            fast_path, self.fast_path = self.fast_path, None
+
+            if portal == PORTAL_LOGGED_IN or probe == PROBE_ONLINE:
+                self.online_evidence += 1
+                self.offline_evidence = 0
+                self.suspect_evidence = 0
+                if self.state != ONLINE and self.online_evidence >= self.online_confirmations:
+                    self._transition(ONLINE, f"portal={portal}, probe={probe}")
+                return self.state
+
+            self.online_evidence = 0
+            self.suspect_evidence += 1
+            # 门户明确显示未登录，或探测请求被门户拦截，才算确认掉线的证据
+            if portal == PORTAL_LOGGED_OUT or probe == PROBE_CAPTIVE:
+                self.offline_evidence += 1
+
+            if self.state == LOCKED_OUT:
+                # 锁定状态由熔断器解除，见 should_login()
+                return self.state
+
+            if self.state == ONLINE:
+                self._transition(SUSPECT, f"portal={portal}, probe={probe}")
+            if self.state == SUSPECT and fast_path and self.offline_evidence:
+                self._transition(OFFLINE, fast_path)
+            elif self.state == SUSPECT and self.offline_evidence >= self.offline_confirmations:
+                self._transition(OFFLINE, f"连续 {self.offline_evidence} 次确认掉线")
+            return self.state
+
+    def should_login(self, breaker=None):
+        """是否应该触发登录（仅在确认掉线且熔断器允许时）
+
+        Args:
+            breaker: LoginCircuitBreaker，熔断时进入 LOCKED_OUT，熔断解除后回到 OFFLINE
+        """
+        with self.lock:
+            if self.state not in (OFFLINE, LOCKED_OUT):
+                return False
+            if breaker is None:
+                return self.state == OFFLINE
+            allowed, reason = breaker.allow()
+            if allowed:
+                if self.state == LOCKED_OUT:
+                    self._transition(OFFLINE, reason or "熔断解除")
+                return True
+            if self.state != LOCKED_OUT:
+                self._transition(LOCKED_OUT, reason)
+            return False
+
+    def resumed(self):
+        """系统从休眠中唤醒：门户会话多半已过期，下一次检查明确显示未登录时直接确认掉线"""
+        with self.lock:
+            self.fast_path = "休眠唤醒后确认掉线"
+
+    def expect_logout(self, reason="预测的会话到期"):
+        """预计门户即将注销会话：下一次检查明确显示未登录时直接确认掉线"""
+        with self.lock:
+            self.fast_path = reason
+
+    def confirmation_delay(self):
+        """不走快速确认时，第一次掉线证据之后确认掉线还需要的复查时间（秒）"""
+        return (self.offline_confirmations - 1) * self.suspect_recheck
+
+    def next_check_delay(self, check_interval):
+        """下一次检查的等待时间：可疑状态下快速复查以尽快确认"""
+        with self.lock:
+            if self.state == SUSPECT:
+                return min(self.suspect_recheck, check_interval)
+            return check_interval
+
+    def begin_login(self, reason="确认掉线"):
+        """登录开始"""
+        with self.lock:
+            if self.state != LOGGING_IN:
+                self._transition(LOGGING_IN, reason)
+
+    def login_finished(self, outcome):
+        """登录结束
+
+        Args:
+            outcome: 登录结果（bool 或 LoginOutcome）
+        """
+        with self.lock:
+            if outcome:
+                self.offline_evidence = 0
+                self.suspect_evidence = 0
+                self._transition(ONLINE, "登录成功")
+            else:
+                self._transition(OFFLINE, f"登录失败: {getattr(outcome, 'label', '未知错误')}")
+
+    def _transition(self, new_state, reason):
+        old_state = self.state
+        if old_state == new_state:
+            return
+        now = time.time()
+        record = {
+            'time': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+            'from': old_state,
+            'to': new_state,
+            'reason': reason,
+            'duration': round(now - self.entered_at, 1),
+            'offline_evidence': self.offline_evidence,
+            'suspect_evidence': self.suspect_evidence,
+        }
+        self.state = new_state
+        self.entered_at = now
+
+        if self.transition_log:
+            try:
+                with open(self.transition_log, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+        if self.on_transition:
+            self.on_transition(old_state, new_state, reason)
@@ -0,0 +1,34 @@
+"""
+连通性探测 - 轻量 HTTP 探测，作为门户页面检查之外的第二个信号
+请求一个返回 204 的地址：未认证时会被门户重定向或拦截。请求经共用的 HTTP 连接池发出，两次检查之间复用连接
+"""
+import os
+
+import http_pool
+
+
+DEFAULT_PROBE_URL = "http://connect.rom.miui.com/generate_204"
+
+# 探测结果
+PROBE_ONLINE = "online"  # 外网可达
+PROBE_CAPTIVE = "captive"  # 被门户拦截（重定向或返回了其他内容）
+PROBE_UNREACHABLE = "unreachable"  # 网络不可达或超时
+
+
+def probe(url=None, timeout=3, source=None):
+    """执行一次连通性探测
+
+    Args:
+        url: 探测地址，默认读取 .env 中的 PROBE_URL
+        source: 源地址（多网卡时绑定出口），默认使用系统路由
+
+    Returns:
+        str: PROBE_ONLINE / PROBE_CAPTIVE / PROBE_UNREACHABLE
+    """
+    try:
+        url = url or os.getenv("PROBE_URL", DEFAULT_PROBE_URL)
+        response = http_pool.shared().request('GET', url, timeout=timeout, source=source, phase='check')
+    except (OSError, ValueError):
+        return PROBE_UNREACHABLE
+    # 3xx（不跟随重定向）、门户返回的页面或错误页都说明被拦截
+    return PROBE_ONLINE if response.status == 204 else PROBE_CAPTIVE
@@ -0,0 +1,236 @@
+"""
+本地控制接口 - 供无界面运行时查询状态和下发操作
+只监听本机回环地址或 Unix 套接字，提供 Prometheus 文本格式指标、JSON 状态，以及立即检查/立即登录/暂停/恢复/重新加载配置
+
+接口：
+    GET  /metrics          Prometheus 文本格式指标
+    GET  /status           JSON 格式状态
+    POST /actions/<名称>   执行操作（check / login / pause / resume / reload）
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, bool) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_prometheus(metrics):
+    """把指标转为 Prometheus 文本格式
+
+    Args:
+        metrics: [(名称, 类型, 说明, [(标签 dict, 值), ...]), ...]，值为 None 的样本会被跳过
+    """
+    lines = []
+    for name, kind, help_text, samples in metrics:
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """请求处理，server.control 为所属的 ControlServer"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        control = self.server.control
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/metrics":
+            self._reply(200, format_prometheus(control.collect_metrics()), PROMETHEUS_CONTENT_TYPE)
+        elif path in ("", "/status"):
+            self._reply_json(200, control.collect_status())
+        else:
+            self._reply_json(404, {'ok': False, 'message': "未知接口"})
+
+    def do_POST(self):
+        control = self.server.control
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if control.token and self.headers.get("Authorization") != f"Bearer {control.token}":
+            self._reply_json(401, {'ok': False, 'message': "令牌无效"})
+            return
+        path = self.path.split("?", 1)[0].rstrip("/")
+        name = path[len("/actions/"):] if path.startswith("/actions/") else ""
+        action = control.actions.get(name)
+        if action is None:
+            self._reply_json(404, {'ok': False, 'message': f"未知操作: {name or path}",
+                                   'actions': sorted(control.actions)})
+            return
+        try:
+            ok, message = action()
+        except Exception as e:
+            ok, message = False, str(e)
+        control.on_log(f"控制接口: {name} -> {message}")
+        self._reply_json(202 if ok else 409, {'ok': ok, 'message': message})
+
+    def _reply_json(self, code, data):
+        self._reply(code, json.dumps(data, ensure_ascii=False), "application/json; charset=utf-8")
+
+    def _reply(self, code, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求很频繁，不写入日志
+        pass
+
+
+class _TCPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, control):
+        if ":" in address[0]:
+            self.address_family = socket.AF_INET6
+        self.control = control
+        super().__init__(address, _Handler)
+
+
+if hasattr(socketserver, "UnixStreamServer"):  # Windows 上没有 Unix 套接字
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path, control):
+            self.control = control
+            super().__init__(path, _Handler)
+
+        def get_request(self):
+            request, _ = super().get_request()
+            # BaseHTTPRequestHandler 需要 (host, port) 形式的客户端地址
+            return request, ("local", 0)
+
+
+class ControlServer:
+    """本地控制接口
+
+    用法:
+        server = ControlServer.from_env(collect_status, collect_metrics, {'check': ..., 'pause': ...})
+        server.start()  # 未配置端口和套接字时不启动
+    """
+
+    def __init__(self, collect_status, collect_metrics, actions, host="127.0.0.1", port=0,
+                 socket_path=None, token=None, on_log=None):
+        self.collect_status = collect_status
+        self.collect_metrics = collect_metrics
+        self.actions = actions
+        self.on_log = on_log or (lambda message: None)
+        if host not in LOOPBACK_HOSTS:
+            self.on_log(f"⚠️ 控制接口只允许监听本机，已忽略 CONTROL_HOST={host}")
+            host = "127.0.0.1"
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.token = token
+        self.server = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    @classmethod
+    def from_env(cls, collect_status, collect_metrics, actions, on_log=None):
+        """按 .env 中的控制接口配置创建"""
+        return cls(
+            collect_status, collect_metrics, actions,
+            host=os.getenv("CONTROL_HOST", "127.0.0.1"),
+            port=int(os.getenv("CONTROL_PORT", "0")),
+            socket_path=os.getenv("CONTROL_SOCKET", "") or None,
+            token=os.getenv("CONTROL_TOKEN", "") or None,
+            on_log=on_log,
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.port or self.socket_path)
+
+    @property
+    def address(self):
+        if self.socket_path:
+            return f"unix:{self.socket_path}"
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """在后台线程中启动，未启用或启动失败时返回 False"""
+        if not self.enabled:
+            return False
+        try:
+            if self.socket_path:
+                if not hasattr(socketserver, "UnixStreamServer"):
+                    self.on_log("⚠️ 当前系统不支持 Unix 套接字，控制接口未启动")
+                    return False
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+                self.server = _UnixServer(self.socket_path, self)
+                os.chmod(self.socket_path, 0o600)
+            else:
+                self.server = _TCPServer((self.host, self.port), self)
+        except OSError as e:
+            self.on_log(f"⚠️ 控制接口启动失败（{self.address}）: {e}")
+            self.server = None
+            return False
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._serve, args=(self.server,), name="control-server", daemon=True)
+        self.thread.start()
+        self.on_log(f"控制接口已启动: {self.address}")
+        return True
+
+    def _serve(self, server):
+        """阻塞等待连接，没有请求时不唤醒（serve_forever 每 0.5 秒轮询一次停止标志）"""
+        while not self.stopping.is_set():
+            server.handle_request()
+
+    def _wake(self):
+        """连接一次自己，让阻塞中的 handle_request() 返回并看到停止标志"""
+        try:
+            if self.socket_path:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.settimeout(1)
+                    sock.connect(self.socket_path)
+            else:
+                address = self.server.server_address
+                with socket.create_connection(address[:2], timeout=1):
+                    pass
+        except OSError:
+            pass
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.stopping.set()
+        self._wake()
+        self.thread.join(timeout=2)
+        self.server.server_close()
+        self.server = None
+        if self.socket_path and os.path.exists(self.socket_path):
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
@@ -0,0 +1,126 @@
+"""
+性能剖析 - 用 cProfile 包裹前 N 次检查/登录周期，查找 Python 端的热点（日志、消息转发、Playwright RPC 等）
+每个周期保存一个 .prof 文件到 logs/profiles/，并在日志中输出按累计耗时排序的前几个函数，
+剖析完指定次数后自动停止；未启用或已完成时不包裹，不增加任何开销
+"""
+import cProfile
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+
+class CycleProfiler:
+    """检查/登录周期剖析
+
+    用法:
+        if profiler.wants('check'):
+            with profiler.profile('check'):
+                ...
+
+    cProfile 同一时刻只能有一个实例在运行，检查和登录并发时只剖析先开始的那个
+    """
+
+    def __init__(self, output_dir, cycles=0, phases=('check', 'login'), top=15, on_log=None):
+        self.output_dir = output_dir
+        self.remaining = max(0, cycles)
+        self.phases = set(phases)
+        self.top = top
+        self.on_log = on_log or (lambda message: None)
+        self.lock = threading.Lock()
+        self.active = False
+        self.count = 0
+
+    @classmethod
+    def from_env(cls, output_dir, on_log=None):
+        """按 .env 配置创建，PROFILE_CYCLES=0 时不剖析"""
+        phases = os.getenv("PROFILE_PHASES", "check,login")
+        return cls(
+            output_dir,
+            cycles=int(os.getenv("PROFILE_CYCLES", "0")),
+            phases=[phase.strip() for phase in phases.split(",") if phase.strip()],
+            top=int(os.getenv("PROFILE_TOP", "15")),
+            on_log=on_log,
+        )
+
+    def wants(self, phase):
+        """该阶段是否还需要剖析"""
+        return self.remaining > 0 and phase in self.phases
+
+    def profile(self, phase):
+        """剖析一次周期的上下文管理器"""
+        return _ProfiledCycle(self, phase)
+
+    def _begin(self, phase):
+        with self.lock:
+            if self.active or not self.wants(phase):
+                return None
+            self.active = True
+            self.remaining -= 1
+            self.count += 1
+            index = self.count
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 其他剖析工具（调试器、覆盖率等）正在运行
+            with self.lock:
+                self.active = False
+                self.remaining += 1
+                self.count -= 1
+            return None
+        return profiler, index
+
+    def _finish(self, profiler, phase, index, elapsed):
+        profiler.disable()
+        with self.lock:
+            self.active = False
+            remaining = self.remaining
+        stats = pstats.Stats(profiler)
+        path = os.path.join(self.output_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{phase}-{index}.prof")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stats.dump_stats(path)
+        except OSError:
+            path = None
+        lines = [f"📊 性能剖析 {phase} #{index}: 耗时 {elapsed:.2f} 秒，"
+                 f"{stats.total_calls} 次调用，CPU {stats.total_tt:.3f} 秒"]
+        lines += format_top(stats, self.top)
+        if path:
+            lines.append(f"  已保存: {path}")
+        if remaining == 0:
+            lines.append(f"  已完成 {index} 个周期的剖析，可用 python -m pstats 或 snakeviz 查看 .prof 文件")
+        self.on_log("\n".join(lines))
+
+
+class _ProfiledCycle:
+    def __init__(self, profiler, phase):
+        self.profiler = profiler
+        self.phase = phase
+        self.running = None
+        self.started = 0.0
+
+    def __enter__(self):
+        self.running = self.profiler._begin(self.phase)
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        if self.running is not None:
+            profiler, index = self.running
+            self.profiler._finish(profiler, self.phase, index, time.monotonic() - self.started)
+        return False
+
+
+def format_top(stats, top=15):
+    """按累计耗时排序的前 top 个函数"""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    lines = [f"  {'累计(秒)':>9} {'自身(秒)':>9} {'调用':>8}  函数"]
+    for (filename, line, name), (_, calls, self_time, cumulative, _) in rows:
+        if filename == '~':
+            where = name  # 内置函数
+        else:
+            where = f"{name} ({os.path.basename(filename)}:{line})"
+        lines.append(f"  {cumulative:>9.3f} {self_time:>9.3f} {calls:>8}  {where}")
+    return lines
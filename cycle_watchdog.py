@@ -0,0 +1,156 @@
+"""
+看门狗 - 为每次检查/登录设置硬性截止时间，超时后强制结束浏览器和驱动进程树
+Playwright 调用卡死时（如 page.goto 无响应），结束进程后被阻塞的调用会因连接断开而立即返回
+"""
+import importlib.util
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import process_utils
+
+
+class Cycle:
+    """一次受看门狗保护的检查或登录"""
+
+    def __init__(self, phase, deadline):
+        self.phase = phase
+        self.deadline = deadline
+        self.started = time.monotonic()
+        self.expired = False
+        self.finished = False
+        self.lock = threading.Lock()
+
+
+class Watchdog:
+    """检查/登录截止时间看门狗
+
+    用法:
+        with watchdog.guard('check', lambda: driver_pid) as cycle:
+            ...
+        if cycle.expired:
+            ...
+    """
+
+    PHASE_NAMES = {'check': '检查', 'login': '登录'}
+
+    def __init__(self, check_deadline=45, login_deadline=90, record_file=None, on_log=None):
+        self.deadlines = {'check': check_deadline, 'login': login_deadline}
+        self.record_file = record_file
+        self.on_log = on_log or (lambda message: None)
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls, record_file=None, on_log=None):
+        """按 .env 中的截止时间配置创建看门狗"""
+        return cls(
+            check_deadline=int(os.getenv("CHECK_DEADLINE_SECONDS", "45")),
+            login_deadline=int(os.getenv("LOGIN_DEADLINE_SECONDS", "90")),
+            record_file=record_file,
+            on_log=on_log,
+        )
+
+    @contextmanager
+    def guard(self, phase, target=None):
+        """在截止时间内执行一次检查或登录
+
+        Args:
+            phase: 'check' 或 'login'
+            target: 返回需要结束的进程 pid 的函数（如 Playwright 驱动进程），
+                返回 None 或不传时结束当前进程的全部子进程
+        """
+        cycle = Cycle(phase, self.deadlines[phase])
+        timer = threading.Timer(cycle.deadline, self._expire, args=(cycle, target))
+        timer.daemon = True
+        timer.start()
+        try:
+            yield cycle
+        finally:
+            timer.cancel()
+            with cycle.lock:
+                cycle.finished = True
+
+    def _expire(self, cycle, target):
+        with cycle.lock:
+            if cycle.finished:
+                return
+            cycle.expired = True
+
+        pid = None
+        if target is not None:
+            try:
+                pid = target()
+            except Exception:
+                pid = None
+        if pid:
+            killed = process_utils.kill_tree(pid)
+        else:
+            killed = process_utils.kill_tree(os.getpid(), include_self=False)
+
+        self.timeouts += 1
+        name = self.PHASE_NAMES.get(cycle.phase, cycle.phase)
+        self.on_log(f"⏱ 看门狗: {name}超过 {cycle.deadline} 秒未完成，已结束 {killed} 个浏览器/驱动进程")
+        self._record({
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'phase': cycle.phase,
+            'deadline': cycle.deadline,
+            'elapsed': round(time.monotonic() - cycle.started, 1),
+            'killed': killed,
+        })
+
+    def _record(self, record):
+        if not self.record_file:
+            return
+        try:
+            with open(self.record_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def _playwright_driver_dir():
+    """Playwright 驱动（node）所在目录，找不到返回 None"""
+    try:
+        spec = importlib.util.find_spec("playwright")
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.origin:
+        return None
+    return os.path.join(os.path.dirname(spec.origin), "driver")
+
+
+def reap_orphans(browsers_path=None):
+    """结束上次运行遗留的浏览器和驱动进程
+
+    只处理可执行文件位于浏览器目录或 Playwright 驱动目录下、且父进程已经退出的进程树，
+    其他正在运行的实例（GUI 或 main.py）启动的浏览器不受影响。
+
+    Returns:
+        int: 结束的进程数量
+    """
+    browsers_path = browsers_path or os.getenv("PLAYWRIGHT_BROWSERS_PATH")
+    prefixes = [os.path.normcase(os.path.abspath(path)) + os.sep
+                for path in (browsers_path, _playwright_driver_dir()) if path]
+    if not prefixes or not process_utils.is_supported():
+        return 0
+
+    processes = process_utils.list_processes()
+    owned = set()
+    for pid in processes:
+        exe = process_utils.get_exe(pid)
+        if exe and os.path.normcase(exe).startswith(tuple(prefixes)):
+            owned.add(pid)
+
+    killed = 0
+    for pid in owned:
+        parent = processes[pid].ppid
+        if parent in owned:
+            continue
+        # 父进程已退出：Windows 上父进程不存在，Linux 上会被 init/systemd 收养
+        parent_info = processes.get(parent)
+        if parent_info is None or parent == 1 or parent_info.name in ("systemd", "init"):
+            killed += process_utils.kill_tree(pid)
+    return killed
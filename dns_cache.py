@@ -0,0 +1,277 @@
+"""
+DNS 缓存 - 门户和探测地址的主机名解析结果按 TTL 缓存，过期后先返回旧结果、在后台刷新（stale-while-revalidate）
+刚掉线时 DNS 往往也被门户接管，Chromium 在 page.goto 中解析主机名可能卡住数秒；
+确认在线时的解析结果标记为可信，通过 --host-resolver-rules 固定到浏览器启动参数中，HTTP 探测也直接连接可信地址。
+解析结果保存在 logs/dns.json，重启后在断网状态下仍可使用
+"""
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import urllib.parse
+
+
+CONNECT_ATTEMPTS = 3  # 连接时最多尝试的缓存地址数，之后交给系统解析
+UNPIN_FAILURES = 3  # 可信地址连续连接失败几次后取消固定
+
+
+class DnsCache:
+    """主机名解析缓存
+
+    用法:
+        seconds = dns.prefetch()         # 每次检查前，返回阻塞等待解析的时间
+        dns.observe(online)              # 每次检查后，连续两次确认在线之间的解析结果标记为可信
+        dns.resolver_rules()             # 浏览器的 --host-resolver-rules
+        http_pool.shared().resolver = dns  # HTTP 请求连接可信地址
+    """
+
+    def __init__(self, hosts=(), ttl=300, stale=86400, timeout=2, enabled=True, state_file=None, on_log=None,
+                 on_traffic=None):
+        self.hosts = [host for host in dict.fromkeys(hosts) if host and not _is_address(host)]
+        self.ttl = ttl
+        self.stale = stale
+        self.timeout = timeout
+        self.enabled = enabled
+        self.state_file = state_file
+        self.on_log = on_log or (lambda message: None)
+        self.on_traffic = on_traffic  # (phase, sent, received)，BandwidthLedger.record
+        self.lock = threading.Lock()
+        self.entries = {}  # 主机名 -> {'addresses', 'resolved_at', 'good', 'lookup', 'failed'}
+        self.pending = {}  # 主机名 -> 正在解析的线程
+        self.last_lookup = 0.0  # 最近一次 prefetch() 阻塞等待的时间
+        self.online_since = None  # 连续确认在线的起点，期间的解析结果没有被门户接管
+        self._load()
+
+    @classmethod
+    def from_env(cls, urls, state_file=None, on_log=None, on_traffic=None):
+        """按 .env 配置创建，urls 为门户地址和探测地址，DNS_CACHE=false 时不缓存也不固定"""
+        return cls(
+            [urllib.parse.urlsplit(url).hostname for url in urls if url],
+            ttl=int(os.getenv("DNS_TTL_SECONDS", "300")),
+            stale=int(os.getenv("DNS_STALE_SECONDS", "86400")),
+            timeout=float(os.getenv("DNS_TIMEOUT_SECONDS", "2")),
+            enabled=os.getenv("DNS_CACHE", "true").lower() in ("1", "true", "yes"),
+            state_file=state_file,
+            on_log=on_log,
+            on_traffic=on_traffic,
+        )
+
+    def resolve(self, host):
+        """解析主机名，优先使用缓存
+
+        缓存在 TTL 内直接返回；过期但在 stale 时间内先返回旧结果并在后台刷新；
+        没有缓存时最多等待 timeout 秒，超时返回可信地址（没有时为空列表），解析在后台继续
+
+        Returns:
+            list[str]: 地址列表
+        """
+        if _is_address(host):
+            return [host]
+        thread = self._start(host)
+        if thread is not None:
+            thread.join(self.timeout)
+        return self._cached(host)
+
+    def prefetch(self):
+        """并行解析所有门户和探测主机，返回阻塞等待的秒数（全部命中缓存时为 0）"""
+        if not self.enabled:
+            return 0.0
+        started = time.monotonic()
+        threads = [thread for thread in map(self._start, self.hosts) if thread is not None]
+        deadline = started + self.timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self.last_lookup = round(time.monotonic() - started, 3) if threads else 0.0
+        return self.last_lookup
+
+    def observe(self, online):
+        """输入一次检查结果
+
+        只有在连续确认在线期间得到的解析结果才可信（掉线时的解析结果可能来自门户接管的 DNS），
+        可信结果固定到浏览器和 HTTP 探测；解析结果变化但还不可信时在后台重新解析
+        """
+        now = time.time()
+        with self.lock:
+            if not online:
+                self.online_since = None
+                return
+            since, self.online_since = self.online_since, self.online_since or now
+            if since is None:
+                return
+            changed = False
+            for host, entry in self.entries.items():
+                if not entry['addresses'] or entry.get('good') == entry['addresses']:
+                    continue
+                if entry['resolved_at'] >= since:
+                    entry['good'] = list(entry['addresses'])
+                    changed = True
+                else:
+                    self._refresh(host)
+            if changed:
+                self._save()
+
+    def pinned(self, host):
+        """主机的可信地址，没有时返回 None"""
+        with self.lock:
+            entry = self.entries.get(host)
+            good = entry and entry.get('good')
+            return good[0] if good else None
+
+    def resolver_rules(self):
+        """Chromium 的 --host-resolver-rules 参数值，没有可信地址时为 None"""
+        if not self.enabled:
+            return None
+        rules = []
+        for host in self.hosts:
+            address = self.pinned(host)
+            if address:
+                rules.append(f"MAP {host} {f'[{address}]' if ':' in address else address}")
+        return ", ".join(rules) or None
+
+    def connect(self, address, *args, **kwargs):
+        """socket.create_connection 的替代：主机名换成可信地址或缓存的解析结果，Host 头和 TLS SNI 不变
+
+        依次尝试可信地址和缓存的各个地址，都连不上时按主机名由系统解析连接；
+        可信地址连续 UNPIN_FAILURES 次连不上（CDN 换了地址）时取消固定并重新解析
+        """
+        host, port = address[0], address[1]
+        if not self.enabled or host not in self.hosts:
+            return socket.create_connection(address, *args, **kwargs)
+        pinned = self.pinned(host)
+        candidates = list(dict.fromkeys(([pinned] if pinned else []) + self.resolve(host)))
+        for candidate in candidates[:CONNECT_ATTEMPTS]:
+            try:
+                sock = socket.create_connection((candidate, port), *args, **kwargs)
+            except OSError:
+                if candidate == pinned:
+                    self._pin_failed(host, pinned)
+                continue
+            if candidate == pinned:
+                with self.lock:
+                    self.entries[host]['connect_failures'] = 0
+            return sock
+        return socket.create_connection(address, *args, **kwargs)
+
+    def summary(self):
+        """各主机的解析结果"""
+        now = time.time()
+        lines = []
+        with self.lock:
+            entries = {host: dict(self.entries.get(host) or {}) for host in self.hosts}
+        for host, entry in entries.items():
+            if not entry:
+                lines.append(f"  {host}: 未解析")
+                continue
+            age = now - entry['resolved_at']
+            if not entry['addresses']:
+                freshness = "解析失败"
+            else:
+                freshness = "有效" if age < self.ttl else ("过期（后台刷新）" if age < self.ttl + self.stale else "已失效")
+            text = f"  {host}: {', '.join(entry['addresses']) or '-'}（{freshness}，解析耗时 {entry['lookup']:.2f} 秒）"
+            if entry.get('good'):
+                text += f"，固定 {entry['good'][0]}"
+            lines.append(text)
+        return "\n".join(lines) or "  未配置需要解析的主机"
+
+    def _start(self, host):
+        """缓存可用时按需在后台刷新并返回 None，否则返回需要等待的解析线程"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry and entry['addresses']:
+                age = now - entry['resolved_at']
+                if age < self.ttl:
+                    return None
+                if age < self.ttl + self.stale:
+                    self._refresh(host)
+                    return None
+            return self._refresh(host)
+
+    def _pin_failed(self, host, address):
+        with self.lock:
+            entry = self.entries.get(host)
+            if not entry or address not in (entry.get('good') or []):
+                return
+            entry['connect_failures'] = entry.get('connect_failures', 0) + 1
+            if entry['connect_failures'] < UNPIN_FAILURES:
+                return
+            entry['good'], entry['connect_failures'] = [], 0
+            # 固定地址失效时缓存的解析结果多半也已过时
+            entry['resolved_at'] = 0.0
+            self._refresh(host)
+            self._save()
+        self.on_log(f"⚠️ {host} 的固定地址 {address} 连续 {UNPIN_FAILURES} 次无法连接，已取消固定并重新解析")
+
+    def _cached(self, host):
+        with self.lock:
+            entry = self.entries.get(host) or {}
+            return list(entry.get('addresses') or entry.get('good') or [])
+
+    def _refresh(self, host):
+        """在后台解析一次（同一主机只有一个解析在进行），需持有 self.lock"""
+        thread = self.pending.get(host)
+        if thread is None:
+            thread = threading.Thread(target=self._lookup, args=(host,), name=f"dns-{host}", daemon=True)
+            self.pending[host] = thread
+            thread.start()
+        return thread
+
+    def _lookup(self, host):
+        started = time.monotonic()
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except (OSError, UnicodeError):
+            infos = []
+        seconds = round(time.monotonic() - started, 3)
+        # IPv4 在前，门户通常只有 IPv4
+        addresses = sorted(dict.fromkeys(info[4][0] for info in infos), key=lambda a: ':' in a)
+        with self.lock:
+            self.pending.pop(host, None)
+            entry = self.entries.setdefault(host, {'addresses': [], 'resolved_at': 0.0, 'good': [], 'lookup': 0.0})
+            entry['lookup'] = seconds
+            failed, entry['failed'] = entry.get('failed', False), not addresses
+            if addresses:
+                entry['addresses'] = addresses
+                entry['resolved_at'] = time.time()
+                self._save()
+        if self.on_traffic:
+            # getaddrinfo 发出 A 和 AAAA 两个查询，按 DNS 报文格式估算（含 UDP/IP 头部 28 字节）
+            query = 12 + len(host) + 2 + 4 + 28
+            answers = sum(28 if ':' in address else 16 for address in addresses)
+            self.on_traffic('dns', 2 * query, 2 * query + answers if addresses else 0)
+        if not addresses and not failed:
+            # 只在开始解析失败时记录一次，掉线期间不重复
+            self.on_log(f"⚠️ 无法解析 {host}（{seconds:.1f} 秒），使用缓存的地址")
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError:
+            pass
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for host in self.hosts:
+            if isinstance(data.get(host), dict):
+                self.entries[host] = data[host]
+
+
+def _is_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,139 @@
+"""
+结构化事件日志 - 每行一个 JSON 对象，与人类可读的日志并存
+每次检查/登录是一个周期（cycle），周期内的事件（状态转换、登录结果等）带有同一个周期 ID，
+由检查触发的登录通过 parent 关联到触发它的检查周期，记录保存在 logs/events.jsonl
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import orjson  # 可选：序列化更快
+except ImportError:
+    orjson = None
+
+
+def dumps(record):
+    """序列化为一行 JSON（不含换行）"""
+    if orjson is not None:
+        return orjson.dumps(record).decode('utf-8')
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(line):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+class Cycle:
+    """一次检查/登录周期，退出前可设置 outcome / error 和附加字段"""
+
+    def __init__(self, cycle_id, phase):
+        self.id = cycle_id
+        self.phase = phase
+        self.outcome = None
+        self.error = None
+        self.fields = {}
+
+
+class EventLog:
+    """结构化事件日志
+
+    用法:
+        with events.cycle('check') as cycle:
+            ...
+            events.emit('transition', **{'from': old, 'to': new})
+            cycle.outcome = portal
+    """
+
+    def __init__(self, path=None, source="gui", max_bytes=100 * 1024 * 1024, backups=3):
+        self.path = path
+        self.source = source
+        self.max_bytes = max_bytes
+        self.backups = max(1, backups)
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        # 周期 ID：来源-进程号-序号，进程内递增，跨进程不重复
+        self._prefix = f"{source}-{os.getpid():x}-{int(time.time()) % 100000:05d}"
+        self._counter = itertools.count(1)
+
+    @classmethod
+    def from_env(cls, lock_dir, source):
+        """按 .env 配置创建，EVENT_LOG=false 时不写文件"""
+        enabled = os.getenv("EVENT_LOG", "true").lower() in ("1", "true", "yes")
+        return cls(
+            path=os.path.join(lock_dir, "events.jsonl") if enabled else None,
+            source=source,
+            max_bytes=int(float(os.getenv("EVENT_LOG_MAX_MB", "100")) * 1024 * 1024),
+            backups=int(os.getenv("EVENT_LOG_BACKUPS", "3")),
+        )
+
+    def current(self):
+        """当前线程所在周期的 ID，不在周期内返回 None"""
+        cycle = getattr(self._local, 'cycle', None)
+        return cycle.id if cycle else None
+
+    def emit(self, event, cycle=None, **fields):
+        """记录一个事件，值为 None 的字段不写入"""
+        if not self.path:
+            return
+        record = {
+            'ts': round(time.time(), 3),
+            'source': self.source,
+            'cycle': cycle or self.current(),
+            'event': event,
+        }
+        record.update(fields)
+        line = dumps({key: value for key, value in record.items() if value is not None}) + "\n"
+        with self.lock:
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+    @contextmanager
+    def cycle(self, phase, parent=None, **fields):
+        """一次检查/登录周期，开始和结束各记录一个事件，结束事件带耗时、结果和错误类别"""
+        cycle = Cycle(f"{self._prefix}-{next(self._counter)}", phase)
+        previous = getattr(self._local, 'cycle', None)
+        self._local.cycle = cycle
+        self.emit('cycle_start', phase=phase, parent=parent, **fields)
+        started = time.monotonic()
+        try:
+            yield cycle
+        except BaseException as e:
+            cycle.error = cycle.error or type(e).__name__
+            raise
+        finally:
+            self._local.cycle = previous
+            # 结束事件重复开始时的字段，按结束事件即可分组统计
+            self.emit(
+                'cycle_end', cycle=cycle.id, phase=phase, parent=parent,
+                duration=round(time.monotonic() - started, 3),
+                outcome=cycle.outcome, error=cycle.error, **{**fields, **cycle.fields}
+            )
+
+    @contextmanager
+    def resume(self, cycle_id):
+        """在其他线程中继续某个周期（如登录结束回调），期间的事件带该周期 ID"""
+        previous = getattr(self._local, 'cycle', None)
+        self._local.cycle = Cycle(cycle_id, None) if cycle_id else previous
+        try:
+            yield
+        finally:
+            self._local.cycle = previous
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
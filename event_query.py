@@ -0,0 +1,221 @@
+"""
+事件日志查询 - 流式过滤和汇总 logs/events.jsonl（逐行读取，不把文件载入内存，支持 .gz）
+
+用法:
+    uv run event_query.py --event cycle_end --phase check --since 24h --group-by outcome,error --stats duration
+    uv run event_query.py --cycle gui-1a2b-12345-42          # 某个周期的全部事件
+    uv run event_query.py --event cycle_end --error timeout --limit 20
+"""
+import argparse
+import glob
+import gzip
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+from event_log import dumps, loads
+
+
+RESERVOIR_SIZE = 10000  # 每组用于估算百分位数的样本数
+
+# 取值为字符串的字段，可直接在原始字节上匹配
+STRING_FIELDS = {'event', 'phase', 'source', 'cycle', 'parent', 'outcome', 'error', 'job', 'state', 'probe'}
+
+
+def parse_time(text):
+    """解析时间：相对时间（30m / 24h / 7d）或 YYYY-MM-DD[ HH:MM[:SS]]"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", text)
+    if match:
+        seconds = float(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+        return time.time() - seconds
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"无法解析时间: {text}")
+
+
+def default_files(log_dir="logs"):
+    """默认读取的文件：轮转的旧文件在前（编号越大越旧），当前文件在最后"""
+    path = os.path.join(log_dir, "events.jsonl")
+    backups = []
+    for name in glob.glob(path + ".*"):
+        suffix = name[len(path) + 1:].split(".")[0]
+        if suffix.isdigit():
+            backups.append((int(suffix), name))
+    return [name for _, name in sorted(backups, reverse=True)] + [path]
+
+
+def open_lines(path):
+    """按字节逐行读取（.gz 自动解压）"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+class Filter:
+    """事件过滤条件
+
+    等值条件先在原始字节上做子串匹配，不匹配的行无需解析 JSON
+    """
+
+    def __init__(self, equals, since=None, until=None):
+        self.equals = equals  # 字段 -> 字符串值
+        self.since = since
+        self.until = until
+        self.needles = []
+        for key, value in equals.items():
+            if key in STRING_FIELDS:
+                # 与 EventLog 写入格式一致：紧凑分隔符、非 ASCII 字符不转义
+                self.needles.append(f'"{key}":{dumps(value)}'.encode('utf-8'))
+            else:
+                # 数值等字段的写法不确定，只要求字段存在
+                self.needles.append(f'"{key}":'.encode('utf-8'))
+
+    def match(self, line):
+        """匹配时返回解析后的事件，否则返回 None"""
+        for needle in self.needles:
+            if needle not in line:
+                return None
+        try:
+            event = loads(line)
+        except ValueError:
+            return None
+        for key, value in self.equals.items():
+            if str(event.get(key)) != value:
+                return None
+        ts = event.get('ts', 0)
+        if self.since is not None and ts < self.since:
+            return None
+        if self.until is not None and ts > self.until:
+            return None
+        return event
+
+
+class Group:
+    """一组事件的计数与数值统计（百分位数用蓄水池抽样估算）"""
+
+    def __init__(self):
+        self.count = 0
+        self.values = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.reservoir = []
+
+    def add(self, value):
+        self.count += 1
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return
+        self.values += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        if len(self.reservoir) < RESERVOIR_SIZE:
+            self.reservoir.append(value)
+        else:
+            index = random.randrange(self.values)
+            if index < RESERVOIR_SIZE:
+                self.reservoir[index] = value
+
+    def percentile(self, p):
+        values = sorted(self.reservoir)
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def format_groups(groups, keys, stats_field):
+    headers = keys + ["次数"]
+    if stats_field:
+        headers += ["平均", "最小", "p50", "p95", "p99", "最大"]
+    rows = []
+    for group_key, group in sorted(groups.items(), key=lambda item: -item[1].count):
+        row = ["-" if value is None else str(value) for value in group_key] + [str(group.count)]
+        if stats_field:
+            if group.values:
+                row += [f"{group.total / group.values:.3f}", f"{group.minimum:g}",
+                        f"{group.percentile(50):g}", f"{group.percentile(95):g}",
+                        f"{group.percentile(99):g}", f"{group.maximum:g}"]
+            else:
+                row += ["-"] * 6
+        rows.append(row)
+    widths = [max(len(headers[i]), *(len(row[i]) for row in rows)) if rows else len(headers[i])
+              for i in range(len(headers))]
+    lines = ["  ".join(text.ljust(width) for text, width in zip(headers, widths))]
+    lines += ["  ".join(text.ljust(width) for text, width in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+def query(files, event_filter, group_by=None, stats_field=None, limit=0, out=sys.stdout):
+    """流式查询
+
+    Returns:
+        tuple[int, int]: (扫描行数, 匹配行数)
+    """
+    scanned = matched = 0
+    groups = {}
+    for path in files:
+        if not os.path.exists(path):
+            continue
+        with open_lines(path) as f:
+            for line in f:
+                scanned += 1
+                event = event_filter.match(line)
+                if event is None:
+                    continue
+                matched += 1
+                if group_by or stats_field:
+                    key = tuple(event.get(field) for field in group_by or [])
+                    group = groups.get(key)
+                    if group is None:
+                        group = groups[key] = Group()
+                    group.add(event.get(stats_field) if stats_field else None)
+                else:
+                    out.write(line.decode('utf-8', errors='replace'))
+                    if limit and matched >= limit:
+                        return scanned, matched
+    if group_by or stats_field:
+        out.write(format_groups(groups, group_by or [], stats_field) + "\n")
+    return scanned, matched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="流式查询结构化事件日志（logs/events.jsonl）")
+    parser.add_argument('files', nargs='*', help="事件日志文件（默认 logs/events.jsonl 及其轮转文件，支持 .gz）")
+    parser.add_argument('--event', help="事件类型，如 cycle_start / cycle_end / transition / recovery")
+    parser.add_argument('--phase', help="阶段：check / login")
+    parser.add_argument('--source', help="来源：gui / cli")
+    parser.add_argument('--cycle', help="周期 ID")
+    parser.add_argument('--parent', help="父周期 ID（查找某次检查触发的登录）")
+    parser.add_argument('--outcome', help="结果，如 logged_in / logged_out / success / failure")
+    parser.add_argument('--error', help="错误类别，如 timeout / bad_credentials")
+    parser.add_argument('--where', action='append', default=[], metavar="字段=值", help="其他等值条件，可重复")
+    parser.add_argument('--since', type=parse_time, help="开始时间（30m / 24h / 7d 或 YYYY-MM-DD[ HH:MM]）")
+    parser.add_argument('--until', type=parse_time, help="结束时间")
+    parser.add_argument('--group-by', help="按字段分组计数，逗号分隔，如 phase,outcome")
+    parser.add_argument('--stats', metavar="字段", help="分组统计数值字段，如 duration")
+    parser.add_argument('--limit', type=int, default=0, help="最多输出多少行（不分组时）")
+    args = parser.parse_args(argv)
+
+    equals = {}
+    for key in ('event', 'phase', 'source', 'cycle', 'parent', 'outcome', 'error'):
+        if getattr(args, key):
+            equals[key] = getattr(args, key)
+    for condition in args.where:
+        key, sep, value = condition.partition("=")
+        if not sep:
+            parser.error(f"条件格式应为 字段=值: {condition}")
+        equals[key] = value
+
+    group_by = [field.strip() for field in args.group_by.split(",")] if args.group_by else None
+    files = args.files or default_files()
+    started = time.perf_counter()
+    scanned, matched = query(files, Filter(equals, args.since, args.until), group_by, args.stats, args.limit)
+    print(f"（扫描 {scanned} 行，匹配 {matched} 行，耗时 {time.perf_counter() - started:.2f} 秒）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+执行服务 - 固定大小的工作线程池
+每个工作线程持有一个可复用的 Playwright 实例，任务通过取消令牌停止，结果以 Future 返回
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class OperationCancelled(Exception):
+    """任务被取消"""
+
+
+class CancellationToken:
+    """取消令牌
+
+    代替轮询 is_running 标志：等待中的任务在 cancel() 时立即被唤醒。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+        for callback in self._callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """取消时调用 callback（已取消时立即调用），用于唤醒不经由本令牌的等待"""
+        self._callbacks.append(callback)
+        if self._event.is_set():
+            callback()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """等待指定时间，期间被取消则立即返回
+
+        Returns:
+            bool: True 表示已被取消
+        """
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled()
+
+
+class WorkerContext:
+    """任务运行上下文，由执行任务的工作线程提供"""
+
+    def __init__(self, worker, token):
+        self._worker = worker
+        self.token = token
+
+    @property
+    def name(self):
+        return self._worker.name
+
+    @property
+    def playwright(self):
+        """当前工作线程的 Playwright 实例（首次使用时启动，之后复用）"""
+        return self._worker.get_playwright()
+
+    @property
+    def playwright_pid(self):
+        """当前工作线程的 Playwright 驱动进程 pid，未启动或无法获取时返回 None"""
+        return self._worker.get_driver_pid()
+
+    def reset_playwright(self):
+        """丢弃当前 Playwright 实例，下次使用时重新启动（驱动连接异常后调用）"""
+        self._worker.stop_playwright()
+
+
+class _Worker(threading.Thread):
+    """执行服务的工作线程"""
+
+    def __init__(self, service, name):
+        super().__init__(name=name, daemon=True)
+        self.service = service
+        self._playwright_manager = None
+        self._playwright = None
+
+    def get_playwright(self):
+        # Playwright 同步 API 绑定创建它的线程，因此每个工作线程各自持有一个实例
+        if self._playwright is None:
+            from playwright.sync_api import sync_playwright
+            self._playwright_manager = sync_playwright()
+            self._playwright = self._playwright_manager.start()
+        return self._playwright
+
+    def get_driver_pid(self):
+        # 浏览器进程由驱动进程启动，结束驱动进程树即可清理本线程的全部浏览器
+        try:
+            return self._playwright_manager._connection._transport._proc.pid
+        except AttributeError:
+            return None
+
+    def stop_playwright(self):
+        if self._playwright is None:
+            return
+        try:
+            self._playwright.stop()
+        except Exception:
+            pass
+        self._playwright_manager = None
+        self._playwright = None
+
+    def run(self):
+        while True:
+            item = self.service._queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs, token = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if token.cancelled:
+                future.set_exception(OperationCancelled())
+                continue
+            try:
+                result = fn(WorkerContext(self, token), *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        self.stop_playwright()
+
+
+class ExecutionService:
+    """固定大小的工作线程池
+
+    用法:
+        service = ExecutionService(max_workers=2)
+        token = CancellationToken()
+        future = service.submit(task, token=token)  # task(ctx, *args)
+        token.cancel()
+    """
+
+    def __init__(self, max_workers=2, name="worker"):
+        self._queue = queue.Queue()
+        self._tokens = set()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._workers = [_Worker(self, f"{name}-{i}") for i in range(max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn, *args, token=None, **kwargs):
+        """提交任务
+
+        Args:
+            fn: 任务函数，第一个参数为 WorkerContext
+            token: 取消令牌，不传则自动创建
+
+        Returns:
+            Future: 任务结果
+        """
+        if token is None:
+            token = CancellationToken()
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("执行服务已关闭")
+            self._tokens.add(token)
+        future.add_done_callback(lambda _: self._forget(token))
+        self._queue.put((future, fn, args, kwargs, token))
+        return future
+
+    def _forget(self, token):
+        with self._lock:
+            self._tokens.discard(token)
+
+    def shutdown(self, cancel=True, wait=False, timeout=None):
+        """关闭执行服务
+
+        Args:
+            cancel: 是否取消所有未完成的任务
+            wait: 是否等待工作线程退出
+        """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            tokens = list(self._tokens)
+        if cancel:
+            for token in tokens:
+                token.cancel()
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join(timeout)
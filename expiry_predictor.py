@@ -0,0 +1,309 @@
+"""
+会话到期预测 - 从检查记录中学习门户强制注销的规律：固定的会话时长（距登录的时间）和固定的维护时间（每天/每周几的某个时刻）
+预测到期前密集检查，置信度足够高时一次未登录即确认掉线并立即登录，不再等待正常检查间隔和多次确认。
+注销时间取最后一次确认在线的检查时间（下界），密集检查越多，学到的时间越准确。
+记录保存在 logs/expiry.json，并估算相比只在检查时发现掉线减少了多少掉线时间
+"""
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+from connection_state import PORTAL_LOGGED_IN, PORTAL_LOGGED_OUT
+from history_store import format_duration
+
+
+LOGOUTS_KEPT = 200
+DAYS_KEPT = 60
+WEEKDAY_LABELS = "一二三四五六日"
+
+
+class ExpiryPredictor:
+    """会话到期预测
+
+    用法:
+        predictor.logged_in()                            # 登录成功
+        if predictor.expects_logout():                   # 检查之前
+            state.expect_logout("预测的会话到期")
+        result = predictor.observe(portal, confirm)      # 每次检查
+        delay = predictor.next_check_delay(interval)     # 安排下次检查
+    """
+
+    def __init__(self, lead=30, burst=10, spread=180, burst_confidence=0.6, login_confidence=0.85,
+                 min_samples=3, enabled=True, state_file=None, on_log=None):
+        self.lead = lead
+        self.burst = max(1, burst)
+        self.spread = spread
+        self.burst_confidence = burst_confidence
+        self.login_confidence = login_confidence
+        self.min_samples = max(1, min_samples)
+        self.enabled = enabled
+        self.state_file = state_file
+        self.on_log = on_log or (lambda message: None)
+        self.lock = threading.Lock()
+        self.data = {'logouts': [], 'days': [], 'session_misses': 0,
+                     'hits': 0, 'misses': 0, 'reactive': 0, 'avoided': 0.0}
+        self.session_start = None
+        self.session_known = False  # 会话起点是否为本程序的登录（否则会话时长未知）
+        self.last_online = None  # 最近一次确认在线的检查时间
+        self.active = None  # 正在密集检查的预测
+        self.regular_at = None  # 密集检查替代的那次正常检查的时间
+        self.regular_interval = None
+        self.fast_path = False
+        self.patterns = None
+        self._load()
+
+    @classmethod
+    def from_env(cls, state_file=None, on_log=None):
+        """按 .env 中的到期预测配置创建"""
+        return cls(
+            lead=int(os.getenv("PREDICT_LEAD_SECONDS", "30")),
+            burst=int(os.getenv("PREDICT_BURST_SECONDS", "10")),
+            spread=int(os.getenv("PREDICT_SPREAD_SECONDS", "180")),
+            burst_confidence=float(os.getenv("PREDICT_BURST_CONFIDENCE", "0.6")),
+            login_confidence=float(os.getenv("PREDICT_LOGIN_CONFIDENCE", "0.85")),
+            min_samples=int(os.getenv("PREDICT_MIN_SAMPLES", "3")),
+            enabled=os.getenv("PREDICT_EXPIRY", "true").lower() in ("1", "true", "yes"),
+            state_file=state_file,
+            on_log=on_log,
+        )
+
+    def logged_in(self):
+        """登录成功，会话从现在开始"""
+        with self.lock:
+            self.session_start = self.last_online = time.time()
+            self.session_known = True
+
+    def expects_logout(self, now=None):
+        """当前是否处于高置信度的预测到期时段（此时一次未登录即可确认掉线）"""
+        now = now or time.time()
+        with self.lock:
+            prediction = self._predict(now)
+            self.fast_path = (
+                self.enabled and prediction is not None and prediction['confidence'] >= self.login_confidence
+                and prediction['start'] - self.lead <= now
+            )
+            return self.fast_path
+
+    def observe(self, portal, confirm_seconds=0.0):
+        """输入一次门户检查结果
+
+        Args:
+            confirm_seconds: 不走快速确认时确认掉线还需要的复查时间，用于估算减少的掉线时间
+
+        Returns:
+            dict | None: 命中 / 未命中 / 未预测到的注销，供事件日志记录
+        """
+        now = time.time()
+        with self.lock:
+            today = date.today().isoformat()
+            if today not in self.data['days']:
+                self.data['days'] = (self.data['days'] + [today])[-DAYS_KEPT:]
+                self.patterns = None
+                self._save()
+            if portal == PORTAL_LOGGED_IN:
+                if self.session_start is None:
+                    self.session_start, self.session_known = now, False
+                self.last_online = now
+                return self._check_miss(now)
+            if portal != PORTAL_LOGGED_OUT or self.last_online is None:
+                return None
+            result = self._logout(now, confirm_seconds)
+        if result['result'] == 'hit':
+            self.on_log(f"🔮 按预测发现会话到期（{result['label']}），"
+                        f"比正常检查约提前 {result['avoided']:.0f} 秒")
+        elif result['learned']:
+            self.on_log(f"🔮 发现会话到期规律: {result['learned']}")
+        del result['learned']
+        return result
+
+    def _logout(self, now, confirm_seconds):
+        at = self.last_online
+        age = round(at - self.session_start, 1) if self.session_known else None
+        local = datetime.fromtimestamp(at)
+        before = self._describe(self._patterns())
+        prediction = self.active or self._predict(now)
+        self.data['logouts'] = (self.data['logouts'] + [{
+            'at': round(at, 1), 'age': age,
+            'minute': local.hour * 60 + local.minute, 'weekday': local.weekday(), 'day': local.date().isoformat(),
+        }])[-LOGOUTS_KEPT:]
+        self.patterns = None
+        result = {'result': 'reactive', 'age': age}
+        if prediction and prediction['start'] - self.lead <= now and at <= prediction['end'] + self.lead:
+            # 密集检查替代的正常检查时间之后才会发现，快速确认还省去了复查
+            regular = self.regular_at or now
+            while self.regular_interval and regular < now:
+                regular += self.regular_interval
+            avoided = max(0.0, regular - now) + (confirm_seconds if self.fast_path else 0.0)
+            self.data['hits'] += 1
+            self.data['avoided'] += round(avoided, 1)
+            result = {'result': 'hit', 'kind': prediction['kind'], 'label': prediction['label'],
+                      'confidence': round(prediction['confidence'], 2), 'avoided': round(avoided, 1), 'age': age}
+        else:
+            self.data['reactive'] += 1
+        after = self._describe(self._patterns())
+        result['learned'] = after if after and after != before else None
+        self.session_start = self.last_online = None
+        self.active = self.regular_at = self.regular_interval = None
+        self.fast_path = False
+        self._save()
+        return result
+
+    def _check_miss(self, now):
+        """密集检查的时段已过仍在线，预测未命中"""
+        prediction = self.active
+        if prediction is None or now <= prediction['end'] + self.lead:
+            return None
+        self.active = self.regular_at = self.regular_interval = None
+        self.data['misses'] += 1
+        if prediction['kind'] == 'session':
+            self.data['session_misses'] += 1
+            self.patterns = None
+        self._save()
+        self.on_log(f"🔮 预测的会话到期未发生（{prediction['label']}）")
+        return {'result': 'miss', 'kind': prediction['kind'], 'label': prediction['label'],
+                'confidence': round(prediction['confidence'], 2)}
+
+    def next_check_delay(self, delay, now=None):
+        """下次检查的等待时间：预测到期前开始密集检查，直到预测时段结束"""
+        if not self.enabled:
+            return delay
+        now = now or time.time()
+        with self.lock:
+            prediction = self._predict(now)
+            if prediction is None:
+                return delay
+            burst_from = prediction['start'] - self.lead
+            result = min(delay, self.burst) if now >= burst_from else min(delay, max(0.0, burst_from - now))
+            if result < delay:
+                if self.active is None:
+                    self.on_log(f"🔮 预计 {time.strftime('%H:%M:%S', time.localtime(prediction['start']))} "
+                                f"会话到期（{prediction['label']}，置信度 {prediction['confidence']:.0%}），"
+                                f"届时每 {self.burst} 秒检查一次")
+                    self.regular_at, self.regular_interval = now + delay, delay
+                self.active = prediction
+            return result
+
+    def _predict(self, now):
+        """最早一个尚未结束、置信度达到密集检查阈值的预测"""
+        patterns = self._patterns()
+        candidates = []
+        session = patterns.get('session')
+        if session and self.session_known and self.session_start is not None:
+            start = self.session_start + session['age']
+            candidates.append({
+                'kind': 'session', 'start': start, 'end': start + session['width'],
+                'confidence': session['confidence'], 'label': f"会话时长约 {format_duration(session['age'])}",
+            })
+        daily = patterns.get('daily')
+        if daily:
+            midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+            for offset in (-1, 0, 1):
+                base = midnight.timestamp() + offset * 86400
+                weekday = (midnight.weekday() + offset) % 7
+                start = base + daily['minute'] * 60
+                candidates.append({
+                    'kind': 'daily', 'start': start, 'end': start + daily['width'] * 60,
+                    'confidence': daily['weekdays'].get(weekday, daily['confidence']),
+                    'label': f"周{WEEKDAY_LABELS[weekday]} {daily['minute'] // 60:02d}:{daily['minute'] % 60:02d}",
+                })
+        candidates = [c for c in candidates
+                      if c['end'] + self.lead > now and c['confidence'] >= self.burst_confidence]
+        return min(candidates, key=lambda c: c['start']) if candidates else None
+
+    def _patterns(self):
+        if self.patterns is None:
+            self.patterns = {'session': self._session_pattern(), 'daily': self._daily_pattern()}
+        return self.patterns
+
+    def _session_pattern(self):
+        """会话时长的聚集：时长相近（spread 内）的注销占全部已知时长会话的比例"""
+        ages = sorted(logout['age'] for logout in self.data['logouts'] if logout['age'] is not None)
+        best = None
+        for i, age in enumerate(ages):
+            members = [a for a in ages[i:] if a - age <= self.spread]
+            if best is None or len(members) > len(best):
+                best = members
+        if not best or len(best) < self.min_samples:
+            return None
+        return {'age': best[0], 'width': best[-1] - best[0], 'count': len(best),
+                'confidence': len(best) / (len(ages) + self.data['session_misses'])}
+
+    def _daily_pattern(self):
+        """每天固定时刻的聚集：出现注销的天数占有检查记录天数的比例，另按星期几分别计算"""
+        logouts = self.data['logouts']
+        width = max(1, self.spread // 60)
+        best = None
+        for logout in logouts:
+            members = [l for l in logouts if (l['minute'] - logout['minute']) % 1440 <= width]
+            days = {l['day'] for l in members}
+            if best is None or len(days) > len(best[1]):
+                best = (logout['minute'], days, members)
+        if best is None or len(best[1]) < self.min_samples:
+            return None
+        minute, days, members = best
+        observed = self.data['days']
+        weekdays = {}
+        for weekday in range(7):
+            seen = [d for d in observed if date.fromisoformat(d).weekday() == weekday]
+            if len(seen) >= 2:
+                weekdays[weekday] = len([d for d in days if date.fromisoformat(d).weekday() == weekday]) / len(seen)
+        return {'minute': minute, 'width': max((l['minute'] - minute) % 1440 for l in members) + 1,
+                'count': len(days), 'confidence': min(1.0, len(days) / max(1, len(observed))),
+                'weekdays': weekdays}
+
+    def _describe(self, patterns):
+        parts = []
+        session = patterns.get('session')
+        if session and session['confidence'] >= self.burst_confidence:
+            parts.append(f"会话时长约 {format_duration(session['age'])}"
+                         f"（{session['count']} 次，置信度 {session['confidence']:.0%}）")
+        daily = patterns.get('daily')
+        if daily:
+            clock = f"{daily['minute'] // 60:02d}:{daily['minute'] % 60:02d}"
+            if daily['confidence'] >= self.burst_confidence:
+                parts.append(f"每天 {clock}（{daily['count']} 天，置信度 {daily['confidence']:.0%}）")
+            else:
+                weekdays = [w for w, c in sorted(daily['weekdays'].items()) if c >= self.burst_confidence]
+                if weekdays:
+                    parts.append(f"每周{'、'.join(WEEKDAY_LABELS[w] for w in weekdays)} {clock}"
+                                 f"（{daily['count']} 天）")
+        return "；".join(parts)
+
+    def summary(self):
+        """学到的规律、命中情况和减少的掉线时间"""
+        with self.lock:
+            if not self.enabled:
+                return "到期预测: 未启用"
+            text = self._describe(self._patterns())
+            data = dict(self.data)
+        text = f"到期预测: {text}" if text else f"到期预测: 暂无规律（已记录 {len(data['logouts'])} 次注销）"
+        if data['hits'] or data['misses']:
+            text += (f"\n  命中 {data['hits']} 次，未命中 {data['misses']} 次，未预测到 {data['reactive']} 次，"
+                     f"共减少掉线约 {format_duration(data['avoided'])}")
+        return text
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError:
+            pass
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key in self.data:
+            if key in data:
+                self.data[key] = data[key]
+
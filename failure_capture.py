@@ -0,0 +1,186 @@
+"""
+失败诊断 - 只在登录失败时保存截图、页面 DOM、msg-zone 文本和网络请求记录
+可选保存 Playwright trace（开启后每次登录在内存中录制，成功时直接丢弃），
+保存在 logs/failures/ 下，按总大小和条目数自动淘汰最旧的记录
+"""
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+
+LINK_MARK = "📎 "  # 日志中诊断目录的标记，GUI 据此生成链接
+
+
+def link_text(path):
+    """附加到失败日志行末尾的诊断目录链接"""
+    return f" {LINK_MARK}{path}" if path else ""
+
+
+def find_link(message):
+    """从日志行中取出诊断目录，没有返回 None"""
+    index = message.rfind(LINK_MARK)
+    if index < 0:
+        return None
+    return message[index + len(LINK_MARK):].strip() or None
+
+
+class FailureCapture:
+    """失败诊断保存
+
+    用法:
+        tracing = capture.start_trace(context)
+        ...
+        path = capture.save(page, 'login', outcome, meter=meter, tracing=tracing)  # 失败时
+        capture.discard_trace(context, tracing)  # 成功时
+    """
+
+    def __init__(self, root=None, max_mb=50, max_entries=30, trace=False, on_log=None):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_entries = max(1, max_entries)
+        self.trace = trace
+        self.on_log = on_log or (lambda message: None)
+
+    @classmethod
+    def from_env(cls, root=None, on_log=None):
+        """按 .env 配置创建，FAILURE_CAPTURE=false 时不保存"""
+        enabled = os.getenv("FAILURE_CAPTURE", "true").lower() in ("1", "true", "yes")
+        return cls(
+            root=root if enabled else None,
+            max_mb=float(os.getenv("FAILURE_CAPTURE_MAX_MB", "50")),
+            max_entries=int(os.getenv("FAILURE_CAPTURE_MAX_ENTRIES", "30")),
+            trace=os.getenv("FAILURE_TRACE", "false").lower() in ("1", "true", "yes"),
+            on_log=on_log,
+        )
+
+    def start_trace(self, context):
+        """开启 trace 录制（未启用时什么也不做），返回是否已开启"""
+        if not (self.root and self.trace):
+            return False
+        try:
+            context.tracing.start(screenshots=True, snapshots=True)
+            return True
+        except Exception:
+            return False
+
+    def discard_trace(self, context, tracing):
+        """成功时停止录制并丢弃"""
+        if not tracing:
+            return
+        try:
+            context.tracing.stop()
+        except Exception:
+            pass
+
+    def save(self, page, phase, outcome=None, error=None, meter=None, tracing=False, cycle=None):
+        """保存一次失败的诊断信息（需在浏览器关闭前调用）
+
+        Args:
+            outcome: LoginOutcome
+            error: 导致失败的异常
+            meter: BandwidthMeter，其中的请求记录作为网络日志
+            tracing: start_trace() 的返回值
+            cycle: 事件日志中的周期 ID
+
+        Returns:
+            str | None: 诊断目录，未启用或保存失败时为 None
+        """
+        if not self.root or page is None:
+            return None
+        failure_class = getattr(outcome, 'failure_class', None) or (type(error).__name__ if error else "unknown")
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{phase}-{re.sub(r'[^A-Za-z0-9_]', '', failure_class)}"
+        path = os.path.join(self.root, name)
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError:
+            return None
+
+        info = {
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'phase': phase,
+            'cycle': cycle,
+            'failure_class': failure_class,
+            'message': getattr(outcome, 'message', None) or (str(error) if error else None),
+            'url': _safe(lambda: page.url),
+        }
+        _safe(lambda: page.screenshot(path=os.path.join(path, "screenshot.png"), full_page=True, timeout=5000))
+        _write(os.path.join(path, "page.html"), _safe(lambda: page.content()))
+        msg_zone = page.locator("div.msg-zone")
+        info['msg_zone'] = _safe(lambda: msg_zone.inner_text(timeout=1000) if msg_zone.is_visible() else None)
+        if meter is not None:
+            _write(os.path.join(path, "network.json"), json.dumps(network_log(meter), ensure_ascii=False, indent=1))
+        if tracing:
+            _safe(lambda: page.context.tracing.stop(path=os.path.join(path, "trace.zip")))
+        _write(os.path.join(path, "info.json"), json.dumps(info, ensure_ascii=False, indent=2))
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """按总大小和条目数淘汰最旧的诊断记录（至少保留最新一条）"""
+        try:
+            entries = sorted(
+                entry.path for entry in os.scandir(self.root) if entry.is_dir()
+            )
+        except OSError:
+            return
+        sizes = {entry: _dir_size(entry) for entry in entries}
+        total = sum(sizes.values())
+        removed = 0
+        while len(entries) > 1 and (total > self.max_bytes or len(entries) > self.max_entries):
+            oldest = entries.pop(0)
+            shutil.rmtree(oldest, ignore_errors=True)
+            total -= sizes[oldest]
+            removed += 1
+        if removed:
+            self.on_log(f"🧹 已清理 {removed} 条旧的失败诊断记录")
+
+
+def network_log(meter):
+    """把 BandwidthMeter 记录的请求整理为网络日志（仅在失败时调用，逐个读取响应状态）"""
+    entries = []
+    for request, failed in [(r, False) for r in meter.requests] + [(r, True) for r in meter.failed]:
+        entry = {
+            'method': _safe(lambda: request.method),
+            'url': _safe(lambda: request.url),
+            'type': _safe(lambda: request.resource_type),
+            'timing': _safe(lambda: request.timing),
+        }
+        if failed:
+            entry['failure'] = _safe(lambda: request.failure)
+        else:
+            response = _safe(lambda: request.response())
+            entry['status'] = _safe(lambda: response.status) if response else None
+        entries.append(entry)
+    entries.sort(key=lambda e: (e['timing'] or {}).get('startTime', 0))
+    return entries
+
+
+def _safe(func):
+    try:
+        return func()
+    except Exception:
+        return None
+
+
+def _write(path, text):
+    if text is None:
+        return
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    except OSError:
+        pass
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
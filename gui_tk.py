@@ -4,6 +4,7 @@
 """
 import os
 import sys
+import multiprocessing
 import threading
 import time
 from datetime import datetime
@@ -14,164 +15,25 @@ from tkinter import messagebox
 import pystray
 from PIL import Image, ImageDraw
 from dotenv import load_dotenv, set_key
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
 
-from ui_layout_tk import MainWindowUI, ConfigDialog
+from ui_layout_tk import MainWindowUI, ConfigDialog, DiagnosticsDialog
+from supervisor import AutomationSupervisor
+from resource_monitor import ResourceMonitor, format_report, format_sample
+from browser_profile import load_memory_samples, format_memory_report
+from bandwidth import BandwidthLedger
+import history_store
+from recovery_slo import RecoveryTracker
+from failure_capture import find_link
+from session_keepalive import SessionKeepalive
+from expiry_predictor import ExpiryPredictor
+from portal_endpoints import EndpointSelector
+from dns_cache import DnsCache
+from connectivity_probe import DEFAULT_PROBE_URL
+from execution_service import ExecutionService
 from setup import setup as install_playwright_browsers
-
-
-class LoginWorker(threading.Thread):
-    """登录工作线程"""
-    
-    def __init__(self, username, password, login_url, on_log, on_status, on_finished):
-        super().__init__(daemon=True)
-        self.username = username
-        self.password = password
-        self.login_url = login_url
-        self.on_log = on_log
-        self.on_status = on_status
-        self.on_finished = on_finished
-        self.is_running = True
-    
-    def run(self):
-        """执行登录"""
-        try:
-            self.on_log("="*60)
-            self.on_log(f"[{datetime.now().strftime('%H:%M:%S')}] 开始登录流程...")
-            self.on_status("正在登录...")
-            
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=False, slow_mo=500)
-                context = browser.new_context(
-                    viewport={'width': 1280, 'height': 720},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    ignore_https_errors=True
-                )
-                page = context.new_page()
-                
-                self.on_log(f"正在打开登录页面: {self.login_url}")
-                page.goto(self.login_url, wait_until='networkidle')
-                time.sleep(0.3)
-                
-                # 检查是否已登录
-                try:
-                    logout_button = page.locator("button.loggoff")
-                    if logout_button.is_visible(timeout=2000):
-                        self.on_log("✓ 已处于登录状态")
-                        browser.close()
-                        self.on_finished(True)
-                        return
-                except:
-                    pass
-                
-                # 填写用户名
-                self.on_log("正在填写用户名...")
-                username_input = page.locator('input#user')
-                username_input.clear()
-                username_input.fill(self.username, timeout=5000)
-                time.sleep(0.3)
-                
-                # 填写密码
-                self.on_log("正在填写密码...")
-                password_input = page.locator('input#pass')
-                password_input.clear()
-                password_input.fill(self.password, timeout=5000)
-                time.sleep(0.3)
-                
-                # 点击登录按钮
-                self.on_log("正在点击登录按钮...")
-                login_button = page.locator("div.tab-group.account button.btn")
-                login_button.click()
-                self.on_log("等待认证完成...")
-                time.sleep(3)
-                
-                # 验证登录结果
-                try:
-                    logout_button = page.locator("button.loggoff")
-                    if logout_button.is_visible(timeout=8000):
-                        self.on_log("✅ 登录成功！")
-                        time.sleep(0.3)
-                        browser.close()
-                        self.on_finished(True)
-                        return
-                    else:
-                        msg_zone = page.locator("div.msg-zone")
-                        error_msg = msg_zone.inner_text() if msg_zone.is_visible() else "未知错误"
-                        self.on_log(f"❌ 登录失败: {error_msg}")
-                        browser.close()
-                        self.on_finished(False)
-                        return
-                except PlaywrightTimeout:
-                    self.on_log("❌ 登录超时")
-                    browser.close()
-                    self.on_finished(False)
-                    return
-        except Exception as e:
-            self.on_log(f"❌ 发生错误: {str(e)}")
-            self.on_finished(False)
-
-
-class MonitorWorker(threading.Thread):
-    """监控工作线程"""
-    
-    def __init__(self, login_url, check_interval, on_log, on_status, on_need_login):
-        super().__init__(daemon=True)
-        self.login_url = login_url
-        self.check_interval = check_interval
-        self.on_log = on_log
-        self.on_status = on_status
-        self.on_need_login = on_need_login
-        self.is_running = True
-    
-    def run(self):
-        """持续监控"""
-        while self.is_running:
-            try:
-                self.on_log("="*60)
-                self.on_log(f"[{datetime.now().strftime('%H:%M:%S')}] 开始检查网络状态...")
-                self.on_status("检查中...")
-                
-                with sync_playwright() as p:
-                    browser = p.chromium.launch(headless=True)
-                    context = browser.new_context(ignore_https_errors=True)
-                    page = context.new_page()
-                    
-                    page.goto(self.login_url, timeout=10000)
-                    time.sleep(0.3)
-                    
-                    try:
-                        logout_button = page.locator("button.loggoff")
-                        if logout_button.is_visible(timeout=3000):
-                            self.on_log("✓ 网络已登录")
-                            self.on_status("监控中 - 已登录")
-                            browser.close()
-                        else:
-                            self.on_log("⚠️ 检测到未登录状态")
-                            self.on_status("监控中 - 未登录")
-                            browser.close()
-                            self.on_need_login()
-                    except:
-                        login_button = page.locator("div.tab-group.account button.btn")
-                        if login_button.is_visible(timeout=3000):
-                            self.on_log("⚠️ 检测到未登录状态")
-                            browser.close()
-                            self.on_need_login()
-                        else:
-                            browser.close()
-            except Exception as e:
-                self.on_log(f"⚠️ 检查时出错: {str(e)}")
-            
-            # 等待下次检查
-            for _ in range(self.check_interval):
-                if not self.is_running:
-                    break
-                time.sleep(1)
-        
-        self.on_log("监控已停止")
-    
-    def stop(self):
-        """停止监控"""
-        self.is_running = False
+from browser_install import BrowserInstaller
+import browser_store
+from browser_store import BrowserStore
 
 
 class MainWindow:
@@ -220,14 +82,55 @@ class MainWindow:
         self.ui.btn_config.config(command=self.open_config)
         self.ui.btn_clear_log.config(command=self.clear_log)
         self.ui.btn_install_deps.config(command=self.install_dependencies)
+        self.ui.btn_diagnostics.config(command=self.show_diagnostics)
         
-        # 工作线程
-        self.login_worker = None
-        self.monitor_worker = None
+        # 资源采样：工作进程在每次检查/登录前后采样并发来结果，GUI 进程同时采样自身
+        self.resources = ResourceMonitor.from_env(
+            record_file=str(self.logs_dir / "resources.jsonl"),
+            on_log=self.append_log
+        )
+        
+        # 流量统计由工作进程记录，GUI 只读取用于显示
+        self.bandwidth = BandwidthLedger(state_file=str(self.logs_dir / "bandwidth.json"))
+        # 可用率历史由工作进程写入，GUI 只查询
+        self.history = history_store.open_store(str(self.logs_dir), 'gui')
+        self.history_updated_at = 0.0
+        # 掉线恢复耗时由工作进程记录，GUI 读取同一文件用于诊断窗口和托盘提示
+        self.recovery_file = str(self.logs_dir / "recovery.jsonl")
+        self.recovery_alert = None
+        self.link_count = 0  # 日志中失败诊断链接的序号
+        self.stats_lines = {
+            'history': self.history.summary() if self.history else "可用率: 暂无记录",
+            'recovery': RecoveryTracker.from_env(record_file=self.recovery_file).summary(),
+            'resources': "资源: 暂无采样",
+            'bandwidth': self.bandwidth.summary(),
+        }
+        
+        # 后台任务（安装依赖等）通过执行服务运行，托盘图标有自己的线程
+        self.executor = ExecutionService(max_workers=2, name="gui")
+        
+        # 自动化工作进程（Playwright 检查/登录在子进程中运行）
+        self.supervisor = AutomationSupervisor(
+            {
+                "PLAYWRIGHT_BROWSERS_PATH": os.environ["PLAYWRIGHT_BROWSERS_PATH"],
+                "PLAYWRIGHT_DOWNLOAD_HOST": os.environ["PLAYWRIGHT_DOWNLOAD_HOST"],
+            },
+            self.append_log, self.update_status, self.on_worker_result,
+            on_timing=self.on_worker_timing,
+            memory_budget_mb=self.worker_memory_budget,
+            hang_timeout=self.worker_hang_timeout,
+            on_resources=self.on_worker_resources,
+            on_bandwidth=self.on_worker_bandwidth,
+            on_recovery=self.on_worker_recovery,
+            on_interface=self.on_worker_interface
+        )
+        self.supervisor.start()
+        self.is_logging_in = False
         self.is_monitoring = False
         
         # 系统托盘
         self.tray_icon = None
+        self.tray_thread = None
         self.is_quitting = False
         
         # 按钮点击时间记录（防抖）
@@ -236,7 +139,8 @@ class MainWindow:
             'monitor': 0,
             'config': 0,
             'clear_log': 0,
-            'install_deps': 0
+            'install_deps': 0,
+            'diagnostics': 0
         }
         self.click_interval = 0.8  # 最短点击间隔（秒）
         
@@ -283,6 +187,18 @@ class MainWindow:
         self.download_host = os.getenv("PLAYWRIGHT_DOWNLOAD_HOST", "https://npmmirror.com/mirrors/playwright/")
         self.browsers_path = os.getenv("PLAYWRIGHT_BROWSERS_PATH", "browsers")
         self.check_interval = int(os.getenv("CHECK_INTERVAL_SECONDS", "30"))
+        self.worker_memory_budget = int(os.getenv("WORKER_MEMORY_BUDGET_MB", "600"))
+        self.worker_hang_timeout = int(os.getenv("WORKER_HANG_TIMEOUT_SECONDS", "120"))
+    
+    def _worker_config(self):
+        """发送给工作进程的配置"""
+        return {
+            'username': self.username,
+            'password': self.password,
+            'login_url': self.login_url,
+            'check_interval': self.check_interval,
+            'lock_dir': str(self.logs_dir),
+        }
     
     def save_config(self, config):
         """保存配置到 .env 文件"""
@@ -314,10 +230,36 @@ class MainWindow:
             print(f"写入日志文件失败: {e}")
     
     def _append_log_ui(self, message):
-        """在UI线程中添加日志"""
-        self.ui.log_text.insert(tk.END, message + "\n")
+        """在UI线程中添加日志，失败诊断目录显示为可点击的链接"""
+        path = find_link(message)
+        if path:
+            self.link_count += 1
+            tag = f"link{self.link_count}"
+            self.ui.log_text.insert(tk.END, message[:message.rindex(path)])
+            self.ui.log_text.insert(tk.END, path, ("link", tag))
+            self.ui.log_text.tag_bind(tag, "<Button-1>", lambda e: self.open_path(path))
+            self.ui.log_text.insert(tk.END, "\n")
+        else:
+            self.ui.log_text.insert(tk.END, message + "\n")
         self.ui.log_text.see(tk.END)
     
+    def open_path(self, path):
+        """用系统文件管理器打开目录"""
+        import subprocess
+        
+        if not os.path.exists(path):
+            messagebox.showinfo("提示", f"诊断记录已被清理:\n{path}")
+            return
+        try:
+            if sys.platform == "win32":
+                os.startfile(path)
+            elif sys.platform == "darwin":
+                subprocess.Popen(["open", path])
+            else:
+                subprocess.Popen(["xdg-open", path])
+        except Exception as e:
+            messagebox.showerror("错误", f"无法打开目录: {e}")
+    
     def _create_tray_icon(self):
         """创建系统托盘图标"""
         # 尝试加载 icon.png
@@ -345,10 +287,17 @@ class MainWindow:
         self.tray_icon = pystray.Icon(
             '校园网自动登录',
             image,
-            '校园网自动登录',
+            self._tray_title(),
             menu
         )
     
+    def _tray_title(self):
+        """托盘提示文字：恢复耗时统计，超过目标时附带告警"""
+        title = f"校园网自动登录\n{self.stats_lines['recovery']}"
+        if self.recovery_alert:
+            title += f"\n⚠️ {self.recovery_alert}"
+        return title
+    
     def _create_default_icon(self):
         """创建默认图标（当 icon.png 不存在时）"""
         width = 64
@@ -379,9 +328,10 @@ class MainWindow:
         if self.tray_icon is None:
             self._create_tray_icon()
         
-        # 在新线程中启动托盘图标
-        if not self.tray_icon.visible:
-            threading.Thread(target=self.tray_icon.run, daemon=True).start()
+        # 托盘图标在自己的守护线程中一直运行到退出，不占用执行服务的工作线程；只启动一次
+        if self.tray_thread is None:
+            self.tray_thread = threading.Thread(target=self.tray_icon.run, name="tray", daemon=True)
+            self.tray_thread.start()
     
     def _quit_from_tray(self, icon=None, item=None):
         """从托盘退出"""
@@ -393,8 +343,8 @@ class MainWindow:
     
     def _do_quit(self):
         """执行退出"""
-        if self.monitor_worker and self.monitor_worker.is_alive():
-            self.monitor_worker.stop()
+        self.supervisor.shutdown()
+        self.executor.shutdown(cancel=True)
         
         self.root.destroy()
     
@@ -446,7 +396,7 @@ class MainWindow:
             messagebox.showwarning("配置错误", "请先配置账号密码！")
             return
         
-        if self.login_worker and self.login_worker.is_alive():
+        if self.is_logging_in:
             messagebox.showinfo("提示", "登录任务正在进行中...")
             return
         
@@ -455,13 +405,97 @@ class MainWindow:
         self.ui.btn_config.config(state=tk.DISABLED)
         self.ui.btn_install_deps.config(state=tk.DISABLED)
         
-        self.login_worker = LoginWorker(
-            self.username, self.password, self.login_url,
-            self.append_log, self.update_status, self.on_login_finished
+        self.is_logging_in = True
+        self.supervisor.login(self._worker_config(), job='test_login')
+    
+    def on_worker_result(self, job, success, detail=""):
+        """工作进程返回登录结果"""
+        if job == 'test_login':
+            self.is_logging_in = False
+            self.on_login_finished(success, detail)
+        else:
+            self.on_auto_login_finished(success, detail)
+    
+    def on_worker_timing(self, phase, seconds):
+        """工作进程返回阶段耗时"""
+        if phase == 'standby':
+            return
+        # 可用率每分钟最多刷新一次
+        if self.history and time.monotonic() - self.history_updated_at > 60:
+            self.history_updated_at = time.monotonic()
+            self.update_stats('history', self.history.summary())
+        names = {'check': '检查', 'login': '登录', 'dns': 'DNS 解析'}
+        self.append_log(f"⏱ {names.get(phase, phase)}耗时 {seconds:.2f} 秒")
+    
+    def on_worker_resources(self, sample):
+        """工作进程返回资源采样"""
+        self.resources.add(sample, remote=True)
+        if sample['when'] != 'after':
+            return
+        # 只统计 GUI 进程自身（不含工作进程），用于区分 Tk/线程泄漏与浏览器泄漏
+        gui_sample = self.resources.sample('gui', sample['phase'], 'after', include_children=False)
+        text = f"工作进程: {format_sample(sample)}"
+        if gui_sample:
+            text += f"\nGUI: 内存 {gui_sample['rss_mb']} MB | 句柄 {gui_sample['handles']} | 线程 {gui_sample['threads']}"
+        self.update_stats('resources', text)
+    
+    def on_worker_bandwidth(self, payload):
+        """工作进程返回流量统计"""
+        self.update_stats('bandwidth', payload['summary'])
+    
+    def on_worker_recovery(self, payload):
+        """工作进程返回一次掉线恢复的耗时"""
+        self.update_stats('recovery', payload['summary'])
+        # 告警只保留到下一次恢复，p95 持续超标时摘要中仍有提示
+        self.recovery_alert = payload['alert']
+        if self.tray_icon:
+            self.tray_icon.title = self._tray_title()
+            if payload['alert'] and self.tray_icon.visible and self.tray_icon.HAS_NOTIFICATION:
+                self.tray_icon.notify(payload['alert'], "掉线恢复过慢")
+    
+    def on_worker_interface(self, payload):
+        """工作进程返回某个网卡的监控状态（每个网卡在运行统计中占一行）"""
+        self.update_stats(f"interface:{payload['name']}", f"网卡 {payload['text']}")
+    
+    def update_stats(self, key, text):
+        """更新运行统计标签中的一项"""
+        self.stats_lines[key] = text
+        text = "\n".join(self.stats_lines.values())
+        self.root.after(0, lambda: self.ui.stats_label.config(text=text))
+    
+    def show_diagnostics(self):
+        """打开资源诊断窗口"""
+        if not self._check_click_interval('diagnostics'):
+            return
+        DiagnosticsDialog(self.root, "资源诊断", self._diagnostics_text)
+    
+    def _diagnostics_text(self):
+        """资源诊断窗口内容"""
+        memory_samples = load_memory_samples(str(self.logs_dir / "browser_memory.jsonl"))
+        endpoints = EndpointSelector.from_env(self.login_url, state_file=str(self.logs_dir / "endpoints.json"))
+        dns = DnsCache.from_env(endpoints.urls + [os.getenv("PROBE_URL", DEFAULT_PROBE_URL)],
+                                state_file=str(self.logs_dir / "dns.json"))
+        return (
+            format_report(self.resources.snapshot())
+            + "\n== 浏览器内存（按启动配置）==\n"
+            + format_memory_report(memory_samples)
+            + "\n\n== 流量统计 ==\n"
+            + self.bandwidth.report()
+            + "\n\n== 可用率 ==\n"
+            + (self.history.report() if self.history else "无法打开历史记录")
+            + "\n\n== 掉线恢复耗时 ==\n"
+            + RecoveryTracker.from_env(record_file=self.recovery_file).report()
+            + "\n\n== 会话保活 ==\n  "
+            + SessionKeepalive.from_env(state_file=str(self.logs_dir / "keepalive.json")).summary()
+            + "\n\n== 会话到期预测 ==\n"
+            + ExpiryPredictor.from_env(state_file=str(self.logs_dir / "expiry.json")).summary()
+            + "\n\n== 门户地址 ==\n"
+            + endpoints.summary()
+            + "\n\n== DNS 缓存 ==\n"
+            + dns.summary()
         )
-        self.login_worker.start()
     
-    def on_login_finished(self, success):
+    def on_login_finished(self, success, detail=""):
         """登录完成"""
         def restore_buttons():
             self.ui.btn_test_login.config(state=tk.NORMAL)
@@ -473,7 +507,7 @@ class MainWindow:
         if success:
             self.update_status("登录成功")
         else:
-            self.update_status("登录失败")
+            self.update_status(f"登录失败 - {detail}" if detail else "登录失败")
     
     def toggle_monitor(self):
         """切换监控状态"""
@@ -511,16 +545,11 @@ class MainWindow:
         self.ui.btn_install_deps.config(state=tk.DISABLED)
         self.update_status("监控中...")
         
-        self.monitor_worker = MonitorWorker(
-            self.login_url, self.check_interval,
-            self.append_log, self.update_status, self.auto_login
-        )
-        self.monitor_worker.start()
+        self.supervisor.start_monitor(self._worker_config())
     
     def stop_monitor(self):
         """停止监控"""
-        if self.monitor_worker:
-            self.monitor_worker.stop()
+        self.supervisor.stop_monitor()
         
         self.is_monitoring = False
         self.ui.btn_monitor.config(text="▶ 开始监控")
@@ -530,26 +559,12 @@ class MainWindow:
         self.update_status("监控已停止")
         self.append_log(f"[{datetime.now().strftime('%H:%M:%S')}] 监控已停止")
     
-    def auto_login(self):
-        """自动登录（由监控线程触发）"""
-        self.append_log("触发自动登录...")
-        
-        if self.login_worker and self.login_worker.is_alive():
-            self.append_log("登录任务正在进行中，跳过本次...")
-            return
-        
-        self.login_worker = LoginWorker(
-            self.username, self.password, self.login_url,
-            self.append_log, self.update_status, self.on_auto_login_finished
-        )
-        self.login_worker.start()
-    
-    def on_auto_login_finished(self, success):
+    def on_auto_login_finished(self, success, detail=""):
         """自动登录完成"""
         if success:
             self.update_status("监控中 - 已登录")
         else:
-            self.update_status("监控中 - 登录失败")
+            self.update_status(f"监控中 - {detail}" if detail else "监控中 - 登录失败")
     
     def open_config(self):
         """打开配置对话框"""
@@ -601,7 +616,8 @@ class MainWindow:
         reply = messagebox.askyesno(
             "安装依赖",
             "即将安装 Playwright 浏览器驱动（约 170 MB）。\n\n"
-            "使用国内镜像加速下载，请查看日志窗口了解进度。\n\n"
+            "优先使用本地镜像目录和下载缓存，需要下载时使用国内镜像分段下载、支持断点续传，"
+            "请查看日志窗口和状态栏了解进度。\n\n"
             "是否继续？"
         )
         
@@ -613,10 +629,10 @@ class MainWindow:
             self.ui.btn_install_deps.config(state=tk.DISABLED, text="安装中...")
             self.update_status("正在安装依赖...")
             
-            # 在新线程中执行安装
-            threading.Thread(target=self._do_install_dependencies, daemon=True).start()
+            # 在执行服务中执行安装
+            self.executor.submit(self._do_install_dependencies)
     
-    def _do_install_dependencies(self):
+    def _do_install_dependencies(self, ctx):
         """执行安装依赖，实时显示进度"""
         import subprocess
         
@@ -633,10 +649,37 @@ class MainWindow:
             # 创建目录
             browsers_path.mkdir(parents=True, exist_ok=True)
             
+            # 本地镜像目录、下载缓存和离线压缩包，从下载源下载时分段并行、断点续传
+            installer = BrowserInstaller.from_env(
+                self.project_dir, browsers_path, self.download_host,
+                on_log=self.append_log,
+                on_progress=self.on_install_progress
+            )
+            self.install_logged = {}
+            store = BrowserStore.from_env(on_log=self.append_log)
+            
             self.append_log(f"浏览器将安装到: {browsers_path}")
             self.append_log(f"下载镜像源: {self.download_host}")
+            if installer.mirror_dir:
+                self.append_log(f"本地镜像目录: {installer.mirror_dir}")
+            self.append_log(f"下载缓存: {installer.cache_dir}")
+            if store.root:
+                self.append_log(f"共享浏览器存储: {store.root}")
             self.append_log("")
             
+            # 共享存储中已有当前版本时直接链接，否则安装后放入存储
+            linked = store.link(browsers_path)
+            if linked or installer.install_archive():
+                if not linked:
+                    store.adopt(browsers_path)
+                self.append_log("=" * 60)
+                self.append_log("✅ Playwright 浏览器驱动安装成功！")
+                self.append_log(f"✅ 安装位置: {browsers_path}")
+                self.append_log("=" * 60)
+                self.root.after(0, lambda: messagebox.showinfo("安装完成", "Playwright 浏览器驱动安装成功！"))
+                self.update_status("依赖安装完成")
+                return
+            
             # 设置环境变量
             env = os.environ.copy()
             env["PLAYWRIGHT_BROWSERS_PATH"] = str(browsers_path)
@@ -687,28 +730,34 @@ class MainWindow:
             self.append_log(f"执行命令: {' '.join(cmd)}")
             self.append_log("")
             
-            # 实时执行命令并捕获输出
-            process = subprocess.Popen(
-                cmd,
-                env=env_to_use,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                encoding='utf-8',
-                errors='replace'
-            )
-            
-            # 实时读取输出
-            for line in iter(process.stdout.readline, ''):
-                if line:
-                    self.append_log(line.rstrip())
-            
-            process.stdout.close()
-            return_code = process.wait()
+            # 实时执行命令并捕获输出，下载请求经本地镜像服务
+            with installer.serve() as overrides:
+                env_to_use.update(overrides)
+                process = subprocess.Popen(
+                    cmd,
+                    env=env_to_use,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    bufsize=1,
+                    universal_newlines=True,
+                    encoding='utf-8',
+                    errors='replace'
+                )
+                
+                # 实时读取输出
+                for line in iter(process.stdout.readline, ''):
+                    if ctx.token.cancelled:
+                        process.terminate()
+                        break
+                    if line:
+                        self.append_log(line.rstrip())
+                
+                process.stdout.close()
+                return_code = process.wait()
             
             if return_code == 0:
+                store.adopt(browsers_path)
                 self.append_log("")
                 self.append_log("=" * 60)
                 self.append_log("✅ Playwright 浏览器驱动安装成功！")
@@ -738,6 +787,18 @@ class MainWindow:
         finally:
             self.root.after(0, lambda: self.ui.btn_install_deps.config(state=tk.NORMAL, text="📦 安装依赖"))
     
+    def on_install_progress(self, name, done, total, speed):
+        """浏览器下载进度：状态栏实时显示，日志每 10% 记录一次"""
+        percent = done / total if total else None
+        text = f"{percent:.0%}" if percent is not None else f"{done / 1024 / 1024:.1f} MB"
+        self.update_status(f"下载 {name} {text}（{speed / 1024 / 1024:.1f} MB/s）")
+        if percent is not None:
+            step = int(percent * 10)
+            if step > self.install_logged.get(name, -1):
+                self.install_logged[name] = step
+                self.append_log(f"  {name}: {percent:.0%}，{done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB，"
+                                f"{speed / 1024 / 1024:.1f} MB/s")
+    
     def on_closing(self):
         """关闭窗口事件"""
         if self.is_quitting:
@@ -816,8 +877,8 @@ class MainWindow:
             self.is_quitting = True
             if self.tray_icon:
                 self.tray_icon.stop()
-            if self.monitor_worker and self.monitor_worker.is_alive():
-                self.monitor_worker.stop()
+            self.supervisor.shutdown()
+            self.executor.shutdown(cancel=True)
             self.root.destroy()
     
     def run(self):
@@ -826,32 +887,18 @@ class MainWindow:
 
 
 def check_browser_installed():
-    """检查 Playwright 浏览器是否已安装"""
+    """检查 Playwright 浏览器是否已安装（只查安装清单，不重新加载 .env、不读取浏览器文件）"""
     # 支持打包后运行
     if getattr(sys, 'frozen', False):
         project_dir = Path(sys.executable).parent
     else:
         project_dir = Path(__file__).parent
     
-    env_file = project_dir / ".env"
-    
-    # 加载配置获取 browsers_path
-    if env_file.exists():
-        load_dotenv(env_file, override=True)
-    
-    browsers_path_config = os.getenv("PLAYWRIGHT_BROWSERS_PATH", "browsers")
-    
-    # 处理相对路径和绝对路径
-    if not os.path.isabs(browsers_path_config):
-        browsers_path = project_dir / browsers_path_config
-    else:
-        browsers_path = Path(browsers_path_config)
-    
-    if browsers_path.exists():
-        chromium_dirs = list(browsers_path.glob("chromium-*"))
-        if chromium_dirs:
-            return True
-    return False
+    # load_config / save_config 已同步到环境变量
+    browsers_path = Path(os.getenv("PLAYWRIGHT_BROWSERS_PATH", "browsers"))
+    if not browsers_path.is_absolute():
+        browsers_path = project_dir / browsers_path
+    return browser_store.installed(browsers_path)
 
 
 def main():
@@ -863,4 +910,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包环境下子进程需要通过 freeze_support 进入工作进程入口
+    multiprocessing.freeze_support()
     main()
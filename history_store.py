@@ -0,0 +1,246 @@
+"""
+历史记录 - 用 SQLite 保存每次检查、登录和连接状态转换，按时间索引，可快速查询数月内的可用率
+GUI 工作进程和 main.py 共用 logs/history.db（WAL 模式，允许多进程读写）
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from connection_state import ONLINE, SUSPECT
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checks (
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    portal TEXT,
+    probe TEXT,
+    state TEXT,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS idx_checks_ts ON checks (ts);
+
+CREATE TABLE IF NOT EXISTS logins (
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    job TEXT,
+    success INTEGER NOT NULL,
+    failure_class TEXT,
+    message TEXT,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS idx_logins_ts ON logins (ts);
+
+CREATE TABLE IF NOT EXISTS transitions (
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    from_state TEXT NOT NULL,
+    to_state TEXT NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transitions_ts ON transitions (ts);
+"""
+
+# 报表时间范围：(名称, 秒数)
+PERIODS = [("最近一天", 86400), ("最近一周", 7 * 86400), ("最近一月", 30 * 86400)]
+
+
+class HistoryStore:
+    """检查/登录/状态转换历史"""
+
+    def __init__(self, path, source="gui"):
+        self.path = path
+        self.source = source
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _insert(self, sql, params):
+        with self.lock:
+            try:
+                self.conn.execute(sql, params)
+                self.conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def record_check(self, portal, probe, state, latency):
+        """记录一次检查"""
+        self._insert(
+            "INSERT INTO checks VALUES (?, ?, ?, ?, ?, ?)",
+            (time.time(), self.source, portal, probe, state, round(latency, 3)),
+        )
+
+    def record_login(self, job, outcome, latency):
+        """记录一次登录（outcome 为 LoginOutcome）"""
+        self._insert(
+            "INSERT INTO logins VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), self.source, job, int(bool(outcome)),
+             getattr(outcome, 'failure_class', None), getattr(outcome, 'message', ""), round(latency, 3)),
+        )
+
+    def record_transition(self, from_state, to_state, reason):
+        """记录一次连接状态转换"""
+        self._insert(
+            "INSERT INTO transitions VALUES (?, ?, ?, ?, ?)",
+            (time.time(), self.source, from_state, to_state, reason),
+        )
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def outages(self, since, until=None):
+        """某时间范围内的掉线区间
+
+        掉线从进入“疑似掉线”（随后确认掉线）开始，到恢复“已登录”结束；
+        正在登录、登录锁定都算作掉线的一部分。
+
+        Returns:
+            list[tuple[float, float | None]]: (开始, 结束)，未恢复的掉线结束时间为 None
+        """
+        until = until or time.time()
+        previous = self._query(
+            "SELECT to_state, ts FROM transitions WHERE ts < ? ORDER BY ts DESC LIMIT 1", (since,)
+        )
+        rows = self._query(
+            "SELECT ts, from_state, to_state FROM transitions WHERE ts >= ? AND ts <= ? ORDER BY ts", (since, until)
+        )
+        result = []
+        state = previous[0][0] if previous else ONLINE
+        last_ts = since
+        outage_start = since if state not in (ONLINE, SUSPECT) else None
+        suspect_since = since if state == SUSPECT else None
+        for ts, from_state, to_state in rows:
+            if from_state != state:
+                # 程序重启过（状态机从“已登录”重新开始），未结束的掉线截止到重启前最后一次转换
+                if outage_start is not None:
+                    result.append((outage_start, last_ts))
+                outage_start = suspect_since = None
+            if to_state == SUSPECT:
+                suspect_since = ts
+            elif to_state == ONLINE:
+                if outage_start is not None:
+                    result.append((outage_start, ts))
+                outage_start = suspect_since = None
+            elif outage_start is None:
+                outage_start = suspect_since if suspect_since is not None else ts
+            state = to_state
+            last_ts = ts
+        if outage_start is not None:
+            result.append((outage_start, None))
+        return result
+
+    def first_record(self):
+        """最早一条记录的时间，没有记录返回 None"""
+        rows = self._query(
+            "SELECT MIN(ts) FROM (SELECT MIN(ts) AS ts FROM checks UNION ALL SELECT MIN(ts) FROM transitions)"
+        )
+        return rows[0][0] if rows else None
+
+    def stats(self, seconds, now=None):
+        """某时间段的可用率、掉线次数和平均恢复时间（MTTR）
+
+        Returns:
+            dict: uptime（百分比，无记录时为 None）/ outages / mttr（秒）/ downtime（秒）
+        """
+        now = now or time.time()
+        since = now - seconds
+        first = self.first_record()
+        if first is None:
+            return {'uptime': None, 'outages': 0, 'mttr': None, 'downtime': 0.0}
+        # 只统计有记录以来的时间
+        observed = now - max(since, first)
+        outages = self.outages(since, now)
+        durations = [(end or now) - start for start, end in outages]
+        downtime = sum(durations)
+        closed = [(end - start) for start, end in outages if end is not None]
+        return {
+            'uptime': max(0.0, 100.0 * (1 - downtime / observed)) if observed > 0 else None,
+            'outages': len(outages),
+            'mttr': sum(closed) / len(closed) if closed else None,
+            'downtime': downtime,
+        }
+
+    def login_stats(self, since):
+        """某时间之后的登录次数，按失败类别分组"""
+        return self._query(
+            "SELECT success, COALESCE(failure_class, ''), COUNT(*), AVG(latency) FROM logins "
+            "WHERE ts >= ? GROUP BY success, failure_class ORDER BY COUNT(*) DESC", (since,)
+        )
+
+    def check_count(self, since):
+        rows = self._query("SELECT COUNT(*), AVG(latency) FROM checks WHERE ts >= ?", (since,))
+        return rows[0]
+
+    def summary(self):
+        """GUI 状态栏显示的简短统计"""
+        day = self.stats(86400)
+        if day['uptime'] is None:
+            return "可用率: 暂无记录"
+        week = self.stats(7 * 86400)
+        text = f"可用率: 24h {day['uptime']:.2f}% | 7d {week['uptime']:.2f}%"
+        text += f"\n今日掉线 {day['outages']} 次"
+        if day['mttr'] is not None:
+            text += f" | MTTR {format_duration(day['mttr'])}"
+        return text
+
+    def report(self, periods=PERIODS, recent=20):
+        """可用率报表，供诊断窗口和命令行使用"""
+        now = time.time()
+        lines = [f"  {'时间范围':<8} {'可用率':>9} {'掉线':>6} {'掉线时长':>10} {'MTTR':>10} {'检查':>8}"]
+        for name, seconds in periods:
+            stats = self.stats(seconds, now)
+            checks, _ = self.check_count(now - seconds)
+            uptime = "-" if stats['uptime'] is None else f"{stats['uptime']:.3f}%"
+            mttr = "-" if stats['mttr'] is None else format_duration(stats['mttr'])
+            lines.append(f"  {name:<8} {uptime:>9} {stats['outages']:>6} "
+                         f"{format_duration(stats['downtime']):>10} {mttr:>10} {checks:>8}")
+
+        longest = max(seconds for _, seconds in periods)
+        lines.append("")
+        lines.append("  -- 最近的掉线 --")
+        outages = self.outages(now - longest, now)[-recent:]
+        if not outages:
+            lines.append("  无")
+        for start, end in reversed(outages):
+            end_text = time.strftime('%m-%d %H:%M:%S', time.localtime(end)) if end else "未恢复"
+            lines.append(f"  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start))} → {end_text}"
+                         f"（{format_duration((end or now) - start)}）")
+
+        lines.append("")
+        lines.append("  -- 登录（最近一月）--")
+        rows = self.login_stats(now - longest)
+        if not rows:
+            lines.append("  无")
+        for success, failure_class, count, latency in rows:
+            label = "成功" if success else f"失败（{failure_class or 'unknown'}）"
+            lines.append(f"  {label:<24} {count:>6} 次，平均耗时 {latency or 0:.1f} 秒")
+        return "\n".join(lines)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def format_duration(seconds):
+    """秒数转为易读文本"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}秒"
+    if seconds < 3600:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    if seconds < 86400:
+        return f"{seconds // 3600}时{seconds % 3600 // 60}分"
+    return f"{seconds // 86400}天{seconds % 86400 // 3600}时"
+
+
+def open_store(lock_dir, source):
+    """打开 lock_dir 下的历史库，失败时返回 None（不影响监控）"""
+    try:
+        return HistoryStore(os.path.join(lock_dir, "history.db"), source)
+    except sqlite3.Error:
+        return None
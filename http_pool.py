@@ -0,0 +1,309 @@
+"""
+HTTP 连接池 - 连通性探测、会话保活、门户地址对冲和表单登录共用的轻量 HTTP 客户端
+同一主机的连接保持 keep-alive 复用（每个主机最多 HTTP_POOL_PER_HOST 个），HTTPS 连接复用 TLS 会话（会话恢复，省去完整握手），
+GET 请求可带上次响应的 ETag / Last-Modified 做条件请求，页面未变化时门户只返回 304。
+指定 phase 的请求按估算的收发字节数（请求行、头部和正文）交给 on_traffic 计入流量统计。
+默认不跟随重定向（重定向本身就说明被门户拦截），表单登录等需要时指定 redirects 和 cookie
+"""
+import http.client
+import os
+import re
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_BODY = 256 * 1024  # 默认最多读取的正文字节数
+VALIDATORS_KEPT = 32  # 条件请求最多记住的地址数
+
+
+class HttpResponse:
+    """一次请求的结果，正文已读出、连接已归还"""
+
+    def __init__(self, url, status, headers, body, reused=False, not_modified=False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.reused = reused  # 是否复用了已有连接
+        self.not_modified = not_modified  # 条件请求返回 304，status/body 为上次的响应
+
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+
+class HttpPool:
+    """HTTP 连接池
+
+    用法:
+        response = http_pool.shared().request('GET', url, timeout=3, conditional=True)
+        response.status, response.body
+
+    连接失败、超时或响应不完整时抛出 OSError，地址无效时抛出 ValueError；4xx/5xx 正常返回
+    """
+
+    def __init__(self, per_host=2, idle_timeout=30, conditional=True, resolver=None):
+        self.per_host = max(1, per_host)
+        self.idle_timeout = idle_timeout
+        self.conditional = conditional
+        self.resolver = resolver  # DnsCache，连接可信地址
+        self.on_traffic = None  # (phase, sent, received)，BandwidthLedger.record
+        self.lock = threading.Lock()
+        self.idle = {}  # (scheme, host, port, source, verify) -> [(连接, 过期时间)]
+        self.slots = {}  # 同上 -> 每个主机的连接数上限
+        self.sessions = {}  # (host, port, verify) -> 上次的 TLS 会话
+        self.validators = {}  # (url, source) -> 上次响应的 ETag / Last-Modified 和正文
+        self.contexts = {}  # verify -> SSLContext（共用同一个上下文才能恢复会话）
+        self.stats = {'requests': 0, 'opened': 0, 'reused': 0, 'resumed': 0, 'not_modified': 0, 'received': 0}
+
+    @classmethod
+    def from_env(cls, resolver=None):
+        """按 .env 配置创建"""
+        return cls(
+            per_host=int(os.getenv("HTTP_POOL_PER_HOST", "2")),
+            idle_timeout=int(os.getenv("HTTP_POOL_IDLE_SECONDS", "30")),
+            conditional=os.getenv("HTTP_CONDITIONAL", "true").lower() in ("1", "true", "yes"),
+            resolver=resolver,
+        )
+
+    def request(self, method, url, body=None, headers=None, timeout=10, source=None, verify=True,
+                conditional=False, redirects=0, cookies=None, limit=MAX_BODY, phase=None):
+        """发送一次请求
+
+        Args:
+            source: 源地址（多网卡时绑定出口），None 为系统路由
+            verify: 是否校验 HTTPS 证书
+            conditional: GET 时带上次的 ETag / Last-Modified，返回 304 时给出上次的正文
+            redirects: 最多跟随几次重定向，0 为不跟随
+            cookies: http.cookiejar.CookieJar，发送并保存 cookie（跟随重定向登录时使用）
+            limit: 最多读取的正文字节数，超出时该连接不再复用
+            phase: 流量统计的阶段（check / keepalive / endpoint / login），None 为不统计
+
+        Returns:
+            HttpResponse: 最后一次响应
+        """
+        for attempt in range(redirects + 1):
+            response = self._send(method, url, body, headers, timeout, source, verify, conditional, cookies, limit,
+                                  phase)
+            location = response.headers.get('Location')
+            if response.status not in REDIRECT_CODES or not location or attempt == redirects:
+                return response
+            url = urllib.parse.urljoin(url, location)
+            if response.status in (301, 302, 303) and method not in ('GET', 'HEAD'):
+                method, body = 'GET', None
+        return response
+
+    def summary(self):
+        """连接复用统计"""
+        with self.lock:
+            stats = dict(self.stats)
+        connections = stats['opened'] + stats['reused']
+        if not connections:
+            return "暂无 HTTP 请求记录"
+        return (f"请求 {stats['requests']} 次，新建连接 {stats['opened']} / 复用 {stats['reused']}"
+                f"（复用率 {stats['reused'] / connections:.0%}），TLS 会话恢复 {stats['resumed']} 次，"
+                f"未变化（304）{stats['not_modified']} 次，接收 {stats['received'] / 1024:.1f} KB")
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for conn, _ in connections:
+                conn.close()
+
+    def _send(self, method, url, body, headers, timeout, source, verify, conditional, cookies, limit, phase):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"不支持的地址: {url}")
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port, source, verify)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        headers = dict(headers or {})
+        request = None
+        if cookies is not None:
+            request = urllib.request.Request(url, headers=headers, method=method)
+            cookies.add_cookie_header(request)
+            headers = dict(request.header_items())
+        validator = None
+        if conditional and self.conditional and method == 'GET':
+            with self.lock:
+                validator = self.validators.get((url, source))
+            if validator:
+                if validator['etag']:
+                    headers['If-None-Match'] = validator['etag']
+                if validator['last_modified']:
+                    headers['If-Modified-Since'] = validator['last_modified']
+
+        slot = self._slot(key)
+        if not slot.acquire(timeout=timeout):
+            raise TimeoutError(f"{parts.hostname} 的连接数已达上限 {self.per_host}")
+        try:
+            # 只有幂等请求复用空闲连接：连接可能已被服务器关闭，失败后需要重试
+            idempotent = method in ('GET', 'HEAD')
+            conn, reused = self._checkout(key) if idempotent else (self._open(key), False)
+            try:
+                response, data = _roundtrip(conn, method, target, body, headers, timeout, limit)
+            except OSError:
+                conn.close()
+                if not reused:
+                    raise
+                # 复用的连接已被服务器关闭（空闲超时），换一个新连接重试
+                conn, reused = self._open(key), False
+                try:
+                    response, data = _roundtrip(conn, method, target, body, headers, timeout, limit)
+                except OSError:
+                    conn.close()
+                    raise
+            resumed = not reused and getattr(conn.sock, 'session_reused', False)
+            self._checkin(key, conn, response)
+        finally:
+            slot.release()
+
+        if request is not None:
+            cookies.extract_cookies(_CookieResponse(response.headers), request)
+        on_traffic = self.on_traffic
+        if phase and on_traffic is not None:
+            on_traffic(phase, _request_size(method, target, parts.netloc, headers, body),
+                       len(f"HTTP/1.1 {response.status} {response.reason}\r\n") + len(str(response.headers)) + len(data))
+        status, result_headers, not_modified = response.status, response.headers, False
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['reused' if reused else 'opened'] += 1
+            self.stats['received'] += len(data)
+            if resumed:
+                self.stats['resumed'] += 1
+            if status == 304 and validator:
+                self.stats['not_modified'] += 1
+                status, result_headers, data, not_modified = validator['status'], validator['headers'], \
+                    validator['body'], True
+            elif conditional and method == 'GET' and 200 <= status < 300:
+                etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+                if etag or last_modified:
+                    self.validators.pop((url, source), None)
+                    self.validators[(url, source)] = {'etag': etag, 'last_modified': last_modified,
+                                                      'status': status, 'headers': response.headers, 'body': data}
+                    while len(self.validators) > VALIDATORS_KEPT:
+                        self.validators.pop(next(iter(self.validators)))
+        return HttpResponse(url, status, result_headers, data, reused=reused, not_modified=not_modified)
+
+    def _slot(self, key):
+        with self.lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self.slots[key] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _checkout(self, key):
+        """取一个未过期的空闲连接，没有时新建"""
+        now = time.monotonic()
+        with self.lock:
+            connections = self.idle.get(key, [])
+            while connections:
+                conn, expires = connections.pop()
+                if expires > now:
+                    return conn, True
+                conn.close()
+        return self._open(key), False
+
+    def _open(self, key):
+        scheme, host, port, source, verify = key
+        connect = self.resolver.connect if self.resolver is not None else socket.create_connection
+        source_address = (source, 0) if source else None
+        if scheme == 'http':
+            return _PoolHTTPConnection(host, port, source_address=source_address, connect=connect)
+        with self.lock:
+            context = self.contexts.get(verify)
+            if context is None:
+                context = self.contexts[verify] = (ssl.create_default_context() if verify
+                                                   else ssl._create_unverified_context())
+            session = self.sessions.get((host, port, verify))
+        return _PoolHTTPSConnection(host, port, source_address=source_address, connect=connect,
+                                    context=context, session=session)
+
+    def _checkin(self, key, conn, response):
+        """正文已读完且服务器没有要求关闭时归还连接，保存 TLS 会话供下次新建连接时恢复"""
+        session = getattr(conn.sock, 'session', None)
+        if session is not None:
+            with self.lock:
+                self.sessions[key[1:3] + key[4:]] = session
+        if not response.isclosed() or conn.sock is None:
+            conn.close()
+            return
+        idle = self.idle_timeout
+        match = re.search(r'timeout=(\d+)', response.headers.get('Keep-Alive') or '')
+        if match:
+            # 服务器声明的空闲超时，提前一秒放弃，避免在它关闭的同时发出请求
+            idle = min(idle, int(match.group(1)) - 1)
+        if idle <= 0:
+            conn.close()
+            return
+        with self.lock:
+            self.idle.setdefault(key, []).append((conn, time.monotonic() + idle))
+
+
+def _request_size(method, target, host, headers, body):
+    """请求的字节数（含 http.client 自动添加的 Host、Accept-Encoding、Content-Length 头部）"""
+    lines = [f"{method} {target} HTTP/1.1", f"Host: {host}", "Accept-Encoding: identity"]
+    lines += [f"{key}: {value}" for key, value in headers.items()]
+    if body:
+        lines.append(f"Content-Length: {len(body)}")
+    return sum(len(line) + 2 for line in lines) + 2 + len(body or b'')
+
+
+def _roundtrip(conn, method, target, body, headers, timeout, limit):
+    """在连接上发送请求并读取正文，http.client 的异常统一为 OSError"""
+    try:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        conn.request(method, target, body=body, headers=headers)
+        response = conn.getresponse()
+        return response, response.read(limit)
+    except http.client.HTTPException as e:
+        raise ConnectionError(f"{type(e).__name__}: {e}") from e
+
+
+class _PoolHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, host, port, source_address=None, connect=None):
+        super().__init__(host, port, source_address=source_address)
+        self._create_connection = connect
+
+
+class _PoolHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, host, port, source_address=None, connect=None, context=None, session=None):
+        super().__init__(host, port, source_address=source_address, context=context)
+        self._create_connection = connect
+        self.tls_session = session
+
+    def connect(self):
+        # 与 HTTPSConnection.connect 相同，但带上上次的 TLS 会话
+        http.client.HTTPConnection.connect(self)
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=self.host, session=self.tls_session)
+
+
+class _CookieResponse:
+    """CookieJar.extract_cookies 需要的响应接口"""
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    def info(self):
+        return self.headers
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """进程内共用的连接池（按 .env 配置创建）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpPool.from_env()
+        return _shared
@@ -0,0 +1,98 @@
+"""
+空闲测量 - 统计两次检查之间的唤醒次数和 CPU 占用，用于确认空闲时进程确实处于休眠状态
+只在一次检查结束和下一次检查开始时各采样一次，测量本身不增加唤醒；
+唤醒次数取各线程的自愿上下文切换次数（仅 Linux），CPU 取进程树累计 CPU 时间的增量
+"""
+import os
+import time
+
+import process_utils
+
+
+SCOPE_LABELS = {'worker': "工作进程", 'gui': "GUI 进程", 'cli': "命令行", 'browser': "浏览器"}
+
+
+def snapshot(pid, which='self'):
+    """采样进程的累计唤醒次数和 CPU 时间
+
+    Args:
+        which: 'self' 只采样该进程 / 'children' 只采样其子进程（浏览器、驱动）
+    """
+    pids = [pid] if which == 'self' else process_utils.get_descendants(pid)
+    switches = [process_utils.get_context_switches(p) for p in pids]
+    return {
+        'wakeups': None if None in switches else sum(switches),
+        'cpu': sum(process_utils.get_cpu_time(p) for p in pids),
+        'processes': len(pids),
+    }
+
+
+class IdleMeter:
+    """空闲期唤醒测量
+
+    用法:
+        meter.idle_started()
+        ...  # 等待下一次检查
+        meter.idle_finished()  # 输出日志并返回测量结果
+    """
+
+    def __init__(self, scopes, enabled=False, on_log=None, on_measure=None):
+        self.scopes = scopes  # 名称 -> (pid, 'self' 或 'children')
+        self.enabled = enabled
+        self.on_log = on_log or (lambda message: None)
+        self.on_measure = on_measure
+        self.started_at = None
+        self.before = None
+
+    @classmethod
+    def from_env(cls, scopes, on_log=None, on_measure=None):
+        """按 .env 配置创建，IDLE_MEASURE=true 时才测量"""
+        return cls(
+            scopes,
+            enabled=os.getenv("IDLE_MEASURE", "false").lower() in ("1", "true", "yes"),
+            on_log=on_log,
+            on_measure=on_measure,
+        )
+
+    def idle_started(self):
+        if not self.enabled:
+            return
+        self.before = {name: snapshot(*target) for name, target in self.scopes.items()}
+        self.started_at = time.monotonic()
+
+    def idle_finished(self):
+        """结束一个空闲期
+
+        Returns:
+            dict | None: 名称 -> {'wakeups_per_min', 'cpu_percent'}，未测量时为 None
+        """
+        if not self.enabled or self.before is None:
+            return None
+        seconds = time.monotonic() - self.started_at
+        before, self.before = self.before, None
+        if seconds <= 0:
+            return None
+        result = {}
+        for name, target in self.scopes.items():
+            after = snapshot(*target)
+            wakeups = None
+            if after['wakeups'] is not None and before[name]['wakeups'] is not None:
+                # 子进程数变化时（浏览器退出等）计数不可比
+                if after['processes'] == before[name]['processes']:
+                    wakeups = round(max(0, after['wakeups'] - before[name]['wakeups']) * 60 / seconds, 1)
+            result[name] = {
+                'wakeups_per_min': wakeups,
+                'cpu_percent': round(max(0.0, after['cpu'] - before[name]['cpu']) * 100 / seconds, 3),
+            }
+        self.on_log(format_idle(seconds, result))
+        if self.on_measure:
+            self.on_measure(round(seconds, 1), result)
+        return result
+
+
+def format_idle(seconds, result):
+    parts = []
+    for name, values in result.items():
+        wakeups = "-" if values['wakeups_per_min'] is None else values['wakeups_per_min']
+        parts.append(f"{SCOPE_LABELS.get(name, name)} 唤醒 {wakeups} 次/分钟 CPU {values['cpu_percent']}%")
+    return f"💤 空闲 {seconds:.0f} 秒: " + " | ".join(parts)
@@ -0,0 +1,394 @@
+"""
+多网卡监控 - 有线和无线各自需要一个门户会话时，按源地址分别探测和登录
+浏览器无法指定出口网卡，这里用绑定源地址的 HTTP 请求：连通性探测判断各网卡是否在线，
+按 .env 中配置的表单（HTTP_LOGIN_URL / HTTP_LOGIN_FORM）直接提交登录。
+每个网卡有独立的连接状态机、登录熔断器和检查计划，在各自的线程中运行。
+网卡没有地址（断开、切换网络）时只算可疑、不会触发登录；登录在网卡之间串行并保持最小间隔，
+一个网卡故障转移时不会引起其他网卡连续登录。表单登录与浏览器登录共用 login.lock，
+承载默认路由的网卡由浏览器监控负责登录，这里只探测、不登录
+"""
+import http.cookiejar
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+
+import connectivity_probe
+import http_pool
+from connectivity_probe import PROBE_ONLINE, PROBE_UNREACHABLE
+from login_coordinator import InterProcessLock, LOGIN_WAIT_TIMEOUT
+from connection_state import ConnectionStateMachine, STATE_LABELS, OFFLINE, PORTAL_UNKNOWN
+from login_policy import LoginOutcome, LoginCircuitBreaker, TIMEOUT, PORTAL_DOWN, classify_failure
+from check_scheduler import CheckScheduler, Wakeup, RESUMED
+from event_log import EventLog
+
+
+SIOCGIFADDR = 0x8915  # Linux: 读取网卡的 IPv4 地址
+ROUTE_TEST_ADDRESS = "192.0.2.1"  # 文档保留地址（TEST-NET-1），只用于查询默认路由，不发送数据
+
+
+def interface_address(name):
+    """网卡当前的 IPv4 地址，没有地址或不支持按名称查询（非 Linux）时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    import fcntl
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            packed = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack('256s', name.encode()[:15]))
+    except OSError:
+        return None
+    return socket.inet_ntoa(packed[20:24])
+
+
+def default_route_address():
+    """默认路由使用的本机源地址（UDP connect 只查路由表、不发送数据），没有默认路由时返回 None"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect((ROUTE_TEST_ADDRESS, 53))
+            return sock.getsockname()[0]
+    except OSError:
+        return None
+
+
+def parse_interfaces(text):
+    """解析 INTERFACES：逗号分隔，每项为 名称=地址、网卡名（Linux 上自动读取地址）或地址
+
+    Returns:
+        list[tuple[str, str | None]]: (名称, 固定地址)，地址为 None 时每次检查按网卡名读取
+    """
+    result = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, address = item.partition("=")
+        name, address = name.strip(), address.strip()
+        if not address:
+            try:
+                socket.inet_aton(name)
+                address = name
+            except OSError:
+                address = None
+        result.append((name, address))
+    return result
+
+
+class HttpFormLogin:
+    """不经浏览器的表单登录（POST 到门户的认证接口）
+
+    form 为 URL 编码的表单模板，值中的 {username} / {password} 会被替换；
+    success 非空时响应中包含该文本才算成功，为空时由登录后的连通性探测确认
+    """
+
+    def __init__(self, url, form="user={username}&pass={password}", success="", timeout=10):
+        self.url = url
+        self.form = form
+        self.success = success
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls):
+        """按 .env 配置创建，未配置 HTTP_LOGIN_URL 时返回 None（只监控、不登录）"""
+        url = os.getenv("HTTP_LOGIN_URL", "")
+        if not url:
+            return None
+        return cls(
+            url,
+            form=os.getenv("HTTP_LOGIN_FORM", "user={username}&pass={password}"),
+            success=os.getenv("HTTP_LOGIN_SUCCESS", ""),
+            timeout=int(os.getenv("HTTP_LOGIN_TIMEOUT_SECONDS", "10")),
+        )
+
+    def submit(self, source, username, password):
+        """从 source 地址提交一次登录
+
+        Returns:
+            LoginOutcome: 登录结果（响应中没有成功标记时，以页面文本分类失败原因）
+        """
+        fields = [(key, value.format(username=username, password=password))
+                  for key, value in urllib.parse.parse_qsl(self.form, keep_blank_values=True)]
+        # 门户登录常先重定向、再设置 cookie，这里跟随重定向并保存 cookie
+        data = urllib.parse.urlencode(fields).encode()
+        try:
+            response = http_pool.shared().request(
+                'POST', self.url, body=data, timeout=self.timeout, source=source, redirects=5,
+                cookies=http.cookiejar.CookieJar(), phase='login',
+                headers={'Content-Type': 'application/x-www-form-urlencoded'}
+            )
+        except (TimeoutError, socket.timeout):
+            return LoginOutcome(False, TIMEOUT, f"{self.timeout} 秒内未响应")
+        except (OSError, ValueError) as e:
+            return LoginOutcome(False, PORTAL_DOWN, str(e))
+        if response.status >= 400:
+            return LoginOutcome(False, PORTAL_DOWN if response.status >= 500 else None, f"HTTP {response.status}")
+        text = response.text()
+        if self.success:
+            if self.success in text:
+                return LoginOutcome(True)
+            message = text.strip()[:200]
+            return LoginOutcome(False, classify_failure(message), message or "响应中没有成功标记")
+        return LoginOutcome(True)
+
+
+class LoginGate:
+    """网卡之间串行登录，两次登录至少间隔 spacing 秒
+
+    传入 lock_dir 时同时持有 login.lock（与 LoginCoordinator 相同的跨进程锁），表单登录不会与浏览器登录同时进行；
+    with 语句的值为是否拿到该锁（等待超过 LOGIN_WAIT_TIMEOUT 秒为 False）
+    """
+
+    def __init__(self, spacing=10, lock_dir=None):
+        self.spacing = spacing
+        self.lock = threading.Lock()
+        self.login_lock = InterProcessLock(os.path.join(lock_dir, "login.lock")) if lock_dir else None
+        self.last = 0.0
+
+    def __enter__(self):
+        self.lock.acquire()
+        remaining = self.last + self.spacing - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        if self.login_lock is None:
+            return True
+        return self.login_lock.acquire(timeout=LOGIN_WAIT_TIMEOUT)
+
+    def __exit__(self, *exc):
+        if self.login_lock is not None:
+            self.login_lock.release()
+        self.last = time.monotonic()
+        self.lock.release()
+        return False
+
+
+class InterfaceMonitor:
+    """单个网卡的监控：独立的连接状态机、登录熔断器和检查计划"""
+
+    def __init__(self, name, address, username, password, form_login, check_interval, lock_dir,
+                 gate, on_log=None, on_change=None, events=None):
+        self.name = name
+        self.address = address
+        self.username = username
+        self.password = password
+        self.form_login = form_login
+        self.check_interval = check_interval
+        self.gate = gate
+        self.on_log = on_log or (lambda message: None)
+        self.on_change = on_change
+        self.events = events or EventLog()
+        self.state = ConnectionStateMachine.from_env(
+            transition_log=os.path.join(lock_dir, f"state_transitions-{name}.jsonl"),
+            on_transition=self.on_transition
+        )
+        self.breaker = LoginCircuitBreaker.from_env(
+            state_file=os.path.join(lock_dir, f"login_breaker-{name}.json")
+        )
+        self.breaker.bind_credentials(username, password)
+        self.scheduler = None  # start() 时创建，run() 结束时关闭（timerfd / eventfd）
+        self.wake = None
+        self.stopping = False
+        self.thread = None
+        self.lock = threading.Lock()
+        self.source = None  # 最近一次检查使用的源地址，None 表示网卡没有地址
+        self.default_route = False  # 源地址是否承载默认路由（由浏览器监控负责登录）
+        self.check_counts = {}  # 探测结果 -> 次数
+        self.login_counts = {}  # 登录结果（success 或失败类别）-> 次数
+        self.last_check = None
+        self.last_login = None
+        self.warned = False  # 未配置表单登录的提示每次掉线只输出一次
+
+    def log(self, message):
+        self.on_log(f"[{self.name}] {message}")
+
+    def on_transition(self, old_state, new_state, reason):
+        self.log(f"🔄 连接状态: {STATE_LABELS[old_state]} → {STATE_LABELS[new_state]}（{reason}）")
+        self.events.emit('transition', interface=self.name, reason=reason, **{'from': old_state, 'to': new_state})
+        self._changed()
+
+    def resolve(self):
+        """本次检查使用的源地址"""
+        return self.address or interface_address(self.name)
+
+    def check(self):
+        """从本网卡探测一次连通性并输入状态机"""
+        with self.events.cycle('check', interface=self.name) as event_cycle:
+            started = time.monotonic()
+            source = self.resolve()
+            if source is None:
+                # 网卡断开或没有地址：只算可疑证据，不会触发登录
+                probe = PROBE_UNREACHABLE
+                if self.source is not None or self.last_check is None:
+                    self.log("⚠️ 网卡没有 IPv4 地址，暂停登录直到地址恢复")
+            else:
+                probe = connectivity_probe.probe(source=source)
+            default_route = source is not None and source == default_route_address()
+            if default_route and not self.default_route:
+                self.log("ℹ️ 该网卡承载默认路由，由浏览器监控负责登录，这里只探测")
+            self.source = source
+            self.default_route = default_route
+            state = self.state.observe(PORTAL_UNKNOWN, probe)
+            elapsed = time.monotonic() - started
+            event_cycle.outcome = probe
+            event_cycle.fields.update(source=source, state=state)
+            with self.lock:
+                self.check_counts[probe] = self.check_counts.get(probe, 0) + 1
+                self.last_check = {'probe': probe, 'source': source, 'state': state,
+                                   'seconds': round(elapsed, 3), 'time': time.time()}
+        self._changed()
+        return state
+
+    def login(self, parent=None):
+        """从本网卡提交一次表单登录（与其他网卡、浏览器登录串行）"""
+        with self.gate as locked, self.events.cycle('login', parent=parent, job='auto_login',
+                                                    interface=self.name) as event_cycle:
+            self.log(f"开始登录（源地址 {self.source}）...")
+            started = time.monotonic()
+            if not locked:
+                outcome = LoginOutcome(False, TIMEOUT, "等待其他登录完成超时")
+            elif self.source is None:
+                outcome = LoginOutcome(False, PORTAL_DOWN, "网卡没有地址")
+            else:
+                outcome = self.form_login.submit(self.source, self.username, self.password)
+            if locked and outcome and not self.form_login.success:
+                # 没有成功标记时以探测确认
+                if connectivity_probe.probe(source=self.source) != PROBE_ONLINE:
+                    outcome = LoginOutcome(False, message="提交登录后仍无法访问外网")
+            elapsed = time.monotonic() - started
+            event_cycle.outcome = 'success' if outcome else 'failure'
+            event_cycle.error = outcome.failure_class
+        self.breaker.record(outcome)
+        self.state.login_finished(outcome)
+        result = 'success' if outcome else outcome.failure_class
+        with self.lock:
+            self.login_counts[result] = self.login_counts.get(result, 0) + 1
+            self.last_login = {'result': result, 'message': outcome.message,
+                               'seconds': round(elapsed, 3), 'time': time.time()}
+        if outcome:
+            self.log(f"✅ 登录成功（{elapsed:.1f} 秒）")
+        else:
+            self.log(f"❌ 登录失败: {outcome.message}（{outcome.label}），{self.breaker.describe()}")
+        self._changed()
+        return outcome
+
+    def run(self):
+        """持续监控，直到 stop()"""
+        try:
+            self._run()
+        finally:
+            self.scheduler.close()
+            self.wake.close()
+
+    def _run(self):
+        while not self.stopping:
+            self.check()
+            if self.default_route:
+                pass  # 掉线由浏览器监控登录，避免一次注销引起两次登录
+            elif self.state.state == OFFLINE and self.form_login is None:
+                if not self.warned:
+                    self.log("⚠️ 已掉线，但未配置 HTTP_LOGIN_URL，无法从该网卡自动登录")
+                    self.warned = True
+            elif self.state.should_login(self.breaker):
+                self.state.begin_login()
+                self.login(self.events.current())
+            elif self.state.state != OFFLINE:
+                self.warned = False
+            if self.stopping:
+                break
+            reason = self.scheduler.wait(self.state.next_check_delay(self.check_interval), self.wake)
+            self.wake.clear()
+            if reason == RESUMED:
+                self.state.resumed()
+
+    def start(self):
+        self.stopping = False
+        self.scheduler = CheckScheduler.from_env(on_log=self.log)
+        self.wake = Wakeup()
+        self.thread = threading.Thread(target=self.run, name=f"interface-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+        if self.wake is not None:
+            self.wake.set()
+
+    def status(self):
+        with self.lock:
+            return {
+                'state': self.state.state,
+                'label': self.state.label,
+                'source': self.source,
+                'default_route': self.default_route,
+                'last_check': self.last_check,
+                'last_login': self.last_login,
+                'checks': dict(self.check_counts),
+                'logins': dict(self.login_counts),
+                'breaker': self.breaker.describe(),
+            }
+
+    def describe(self):
+        """状态栏中的一行"""
+        source = self.source or "无地址"
+        if self.default_route:
+            source += "，默认路由"
+        return f"{self.name}（{source}）: {self.state.label}"
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self.name, self.describe())
+
+
+class InterfaceMonitors:
+    """按 INTERFACES 配置的各网卡监控，未配置时为空，start()/stop() 不做任何事"""
+
+    def __init__(self, monitors):
+        self.monitors = monitors
+        self.started = False
+
+    @classmethod
+    def from_env(cls, username, password, check_interval, lock_dir, on_log=None, on_change=None, events=None):
+        gate = LoginGate(spacing=int(os.getenv("INTERFACE_LOGIN_SPACING_SECONDS", "10")), lock_dir=lock_dir)
+        form_login = HttpFormLogin.from_env()
+        return cls([
+            InterfaceMonitor(name, address, username, password, form_login, check_interval, lock_dir, gate,
+                             on_log=on_log, on_change=on_change, events=events)
+            for name, address in parse_interfaces(os.getenv("INTERFACES", ""))
+        ])
+
+    def __bool__(self):
+        return bool(self.monitors)
+
+    def update_credentials(self, username, password):
+        """重新加载配置后更新账号密码（修改后重置各网卡的熔断）"""
+        for monitor in self.monitors:
+            monitor.username, monitor.password = username, password
+            monitor.breaker.bind_credentials(username, password)
+
+    def start(self):
+        self.started = True
+        for monitor in self.monitors:
+            monitor.start()
+
+    def stop(self):
+        self.started = False
+        for monitor in self.monitors:
+            monitor.stop()
+
+    def status(self):
+        return {monitor.name: monitor.status() for monitor in self.monitors}
+
+    def metrics(self):
+        """/metrics 中各网卡的指标（与 collect_metrics 的格式相同）"""
+        statuses = self.status()
+        return [
+            ('campus_login_interface_state', 'gauge', "各网卡的连接状态（对应状态为 1）",
+             [({'interface': name, 'state': state}, int(state == status['state']))
+              for name, status in statuses.items() for state in STATE_LABELS]),
+            ('campus_login_interface_checks_total', 'counter', "各网卡的探测次数（按结果）",
+             [({'interface': name, 'probe': probe}, count)
+              for name, status in statuses.items() for probe, count in status['checks'].items()]),
+            ('campus_login_interface_logins_total', 'counter', "各网卡的登录次数（按结果）",
+             [({'interface': name, 'result': result}, count)
+              for name, status in statuses.items() for result, count in status['logins'].items()]),
+        ]
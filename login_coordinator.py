@@ -0,0 +1,238 @@
+"""
+登录任务协调器 - 跨进程锁 + 合并并发登录请求
+保证同一台机器上（GUI 测试登录、监控自动登录、main.py）同一时刻最多只有一个登录浏览器
+"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from login_policy import LoginOutcome, TIMEOUT, classify_exception
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+LOGIN_WAIT_TIMEOUT = 180  # 等待其他进程完成登录的最长时间（秒）
+
+
+class InterProcessLock:
+    """基于文件的跨进程互斥锁，进程退出时由操作系统自动释放"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = None
+
+    @property
+    def is_held(self):
+        """当前对象是否持有锁"""
+        return self.file is not None
+
+    def _try_lock(self, f):
+        try:
+            if sys.platform == "win32":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(self, f):
+        try:
+            if sys.platform == "win32":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+
+    def acquire(self, timeout=0.0, poll_interval=0.5):
+        """获取锁
+
+        Args:
+            timeout: 最长等待时间（秒），0 表示不等待
+
+        Returns:
+            bool: 是否获取成功
+        """
+        if self.file is not None:
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        f = open(self.path, "a+")
+        while True:
+            if self._try_lock(f):
+                f.seek(0)
+                f.truncate()
+                f.write(str(os.getpid()))
+                f.flush()
+                self.file = f
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                f.close()
+                return False
+            time.sleep(min(poll_interval, remaining))
+
+    def release(self):
+        """释放锁"""
+        if self.file is None:
+            return
+        self._unlock(self.file)
+        self.file.close()
+        self.file = None
+
+    def is_locked_elsewhere(self):
+        """锁是否被其他进程（或本进程的其他锁对象）持有"""
+        if self.file is not None:
+            return False
+        if not self.path.exists():
+            return False
+        with open(self.path, "a+") as f:
+            if self._try_lock(f):
+                self._unlock(f)
+                return False
+        return True
+
+
+class LoginCoordinator:
+    """登录任务协调器
+
+    - 同一进程内：并发的登录请求合并为一个正在进行的任务，结果分发给所有等待者
+    - 不同进程间：通过 login.lock 文件锁串行化，后到者等待先到者完成并复用其结果
+
+    传入 executor（ExecutionService）时登录任务在其工作线程中运行，
+    run_login 会收到该线程的 WorkerContext；否则在新线程中以无参方式调用。
+    """
+
+    def __init__(self, lock_dir, on_log=None, executor=None):
+        lock_dir = Path(lock_dir)
+        self.executor = executor
+        self.lock = InterProcessLock(lock_dir / "login.lock")
+        self.result_file = lock_dir / "login.result.json"
+        self.on_log = on_log or (lambda message: None)
+        self.cond = threading.Condition()
+        self.in_flight = False
+        self.waiters = []
+
+    def submit(self, run_login, on_done):
+        """提交登录请求（异步）
+
+        Args:
+            run_login: 实际执行登录的函数，返回 LoginOutcome（或 bool）
+            on_done: 登录完成回调，参数为 LoginOutcome
+
+        Returns:
+            bool: True 表示启动了新任务，False 表示已合并到正在进行的任务
+        """
+        with self.cond:
+            self.waiters.append(on_done)
+            if self.in_flight:
+                self.on_log("登录任务正在进行中，等待其结果...")
+                return False
+            self.in_flight = True
+
+        if self.executor is not None:
+            self.executor.submit(lambda ctx: self._run(lambda: run_login(ctx)))
+        else:
+            threading.Thread(target=self._run, args=(run_login,), daemon=True).start()
+        return True
+
+    def run(self, run_login):
+        """提交登录请求并等待结果（同步）"""
+        done = threading.Event()
+        result = {}
+
+        def on_done(outcome):
+            result['outcome'] = outcome
+            done.set()
+
+        self.submit(run_login, on_done)
+        done.wait()
+        return result['outcome']
+
+    def is_busy(self):
+        """是否有登录任务正在进行（本进程或其他进程）"""
+        with self.cond:
+            if self.in_flight:
+                return True
+        return self.lock.is_locked_elsewhere()
+
+    def wait_idle(self, timeout):
+        """等待登录任务结束
+
+        Returns:
+            bool: 在超时前空闲返回 True
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        while self.lock.is_locked_elsewhere():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+        return True
+
+    def _login(self, run_login):
+        outcome = run_login()
+        if not isinstance(outcome, LoginOutcome):
+            outcome = LoginOutcome(bool(outcome))
+        self._write_result(outcome)
+        return outcome
+
+    def _run(self, run_login):
+        requested_at = time.time()
+        outcome = LoginOutcome(False, message="登录任务未执行")
+        try:
+            if self.lock.acquire():
+                outcome = self._login(run_login)
+            else:
+                self.on_log("另一进程正在登录，等待其完成...")
+                if self.lock.acquire(timeout=LOGIN_WAIT_TIMEOUT):
+                    shared = self._read_result()
+                    if shared and shared.get('finished_at', 0) >= requested_at:
+                        # 其他进程刚刚完成登录，直接复用其结果
+                        outcome = LoginOutcome.from_dict(shared)
+                        self.on_log(f"复用其他进程的登录结果: {outcome.label}")
+                    else:
+                        outcome = self._login(run_login)
+                else:
+                    outcome = LoginOutcome(False, TIMEOUT, "等待其他进程登录超时")
+                    self.on_log("❌ 等待其他进程登录超时")
+        except Exception as e:
+            outcome = LoginOutcome(False, classify_exception(e), str(e))
+            self.on_log(f"❌ 登录任务出错: {str(e)}")
+        finally:
+            self.lock.release()
+            with self.cond:
+                waiters, self.waiters = self.waiters, []
+                self.in_flight = False
+                self.cond.notify_all()
+            for on_done in waiters:
+                on_done(outcome)
+
+    def _write_result(self, outcome):
+        data = outcome.to_dict()
+        data.update({'pid': os.getpid(), 'finished_at': time.time()})
+        try:
+            self.result_file.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        except OSError:
+            pass
+
+    def _read_result(self):
+        try:
+            return json.loads(self.result_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,248 @@
+"""
+登录失败分类与熔断策略
+按门户返回的错误信息（msg-zone 文本）或异常类型把登录失败分为几类，每类对应不同的重试策略：
+    密码错误     -> 熔断，直到修改配置或手动登录成功
+    流量/余额用尽 -> 熔断，冷却较长时间后再试
+    账号在线/频繁 -> 指数退避（带随机抖动）
+    门户不可用   -> 指数退避（带随机抖动）
+    超时         -> 立即重试一次，之后指数退避
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+
+# 失败分类
+BAD_CREDENTIALS = "bad_credentials"
+ACCOUNT_IN_USE = "account_in_use"
+QUOTA_EXHAUSTED = "quota_exhausted"
+PORTAL_DOWN = "portal_down"
+TIMEOUT = "timeout"
+UNKNOWN = "unknown"
+
+FAILURE_LABELS = {
+    BAD_CREDENTIALS: "账号或密码错误",
+    ACCOUNT_IN_USE: "账号已在线或请求过于频繁",
+    QUOTA_EXHAUSTED: "流量或余额用尽",
+    PORTAL_DOWN: "门户不可用",
+    TIMEOUT: "登录超时",
+    UNKNOWN: "未知错误",
+}
+
+# 门户错误提示关键字（按优先级匹配，只用于门户页面上的提示文本）
+# 熔断时间长的类别只匹配明确的短语：误判为密码错误会停止自动登录，误判为流量用尽会冷却一小时
+_KEYWORDS = [
+    (BAD_CREDENTIALS, ("密码错误", "密码不正确", "用户名或密码", "账号或密码", "帐号或密码",
+                       "用户不存在", "账号不存在", "帐号不存在")),
+    (QUOTA_EXHAUSTED, ("流量已用完", "流量已用尽", "流量不足", "余额不足", "欠费",
+                       "账号已到期", "帐号已到期", "账户已到期", "已停机")),
+    (ACCOUNT_IN_USE, ("已在线", "已经在线", "已在其他设备登录", "已在其它设备登录", "终端数", "设备数已达",
+                      "在线数已达", "过于频繁")),
+    (PORTAL_DOWN, ("系统繁忙", "服务不可用", "系统维护", "正在维护")),
+    (TIMEOUT, ("超时",)),
+]
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def classify_failure(message):
+    """根据门户页面上的错误提示判断失败类别（异常用 classify_exception）"""
+    text = (message or "").lower()
+    for failure_class, keywords in _KEYWORDS:
+        if any(keyword.lower() in text for keyword in keywords):
+            return failure_class
+    return UNKNOWN
+
+
+def classify_exception(error):
+    """根据异常类型判断失败类别，不匹配异常文本中的关键字（调用日志里有选择器、地址等无关内容）"""
+    # playwright 的 TimeoutError 不是内置 TimeoutError 的子类，按类名判断，不依赖 playwright
+    if isinstance(error, TimeoutError) or type(error).__name__ == "TimeoutError":
+        return TIMEOUT
+    if isinstance(error, ConnectionError) or "net::ERR_" in str(error):
+        return PORTAL_DOWN
+    return UNKNOWN
+
+
+class LoginOutcome:
+    """一次登录的结果，可直接当作 bool 使用"""
+
+    def __init__(self, success, failure_class=None, message=""):
+        self.success = success
+        self.failure_class = None if success else (failure_class or UNKNOWN)
+        self.message = message
+
+    def __bool__(self):
+        return self.success
+
+    @property
+    def label(self):
+        if self.success:
+            return "登录成功"
+        return FAILURE_LABELS[self.failure_class]
+
+    def to_dict(self):
+        return {'success': self.success, 'failure_class': self.failure_class, 'message': self.message}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(bool(data.get('success')), data.get('failure_class'), data.get('message', ""))
+
+
+def credential_fingerprint(username, password):
+    """账号密码指纹，用于在修改配置后重置熔断（不保存明文）"""
+    return hashlib.sha256(f"{username}\0{password}".encode('utf-8')).hexdigest()[:16]
+
+
+class LoginCircuitBreaker:
+    """登录熔断器
+
+    状态保存在 state_file 中，工作进程重启或 main.py 重启后仍然生效。
+    """
+
+    def __init__(self, state_file=None, backoff_base=30, backoff_max=1800,
+                 quota_cooldown=3600, timeout_retries=1):
+        self.state_file = state_file
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.quota_cooldown = quota_cooldown
+        self.timeout_retries = timeout_retries
+
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failure_class = None
+        self.consecutive_failures = 0
+        self.retry_at = 0.0  # time.time()，None 表示需要人工处理
+        self.fingerprint = None
+        self._load()
+
+    @classmethod
+    def from_env(cls, state_file=None):
+        """按 .env 配置创建熔断器"""
+        return cls(
+            state_file=state_file,
+            backoff_base=int(os.getenv("LOGIN_BACKOFF_BASE_SECONDS", "30")),
+            backoff_max=int(os.getenv("LOGIN_BACKOFF_MAX_SECONDS", "1800")),
+            quota_cooldown=int(os.getenv("LOGIN_QUOTA_COOLDOWN_SECONDS", "3600")),
+        )
+
+    def bind_credentials(self, username, password):
+        """绑定当前账号密码，账号密码变化时重置熔断"""
+        fingerprint = credential_fingerprint(username, password)
+        with self.lock:
+            if self.fingerprint != fingerprint:
+                if self.fingerprint is not None:
+                    self._reset()
+                self.fingerprint = fingerprint
+                self._save()
+
+    def allow(self):
+        """是否允许发起自动登录
+
+        Returns:
+            tuple[bool, str]: (是否允许, 原因说明)
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return True, ""
+            if self.retry_at is None:
+                return False, self.describe()
+            if time.time() >= self.retry_at:
+                self.state = HALF_OPEN
+                return True, "熔断冷却结束，尝试登录"
+            return False, self.describe()
+
+    def record(self, outcome):
+        """记录一次登录结果"""
+        with self.lock:
+            if outcome.success:
+                self._reset()
+                self._save()
+                return
+
+            failure_class = outcome.failure_class or UNKNOWN
+            if failure_class != self.failure_class:
+                self.consecutive_failures = 0
+            self.failure_class = failure_class
+            self.consecutive_failures += 1
+
+            if failure_class == BAD_CREDENTIALS:
+                self.state = OPEN
+                self.retry_at = None
+            elif failure_class == QUOTA_EXHAUSTED:
+                self.state = OPEN
+                self.retry_at = time.time() + self.quota_cooldown
+            elif failure_class == TIMEOUT and self.consecutive_failures <= self.timeout_retries:
+                # 偶发超时：立即重试
+                self.state = CLOSED
+                self.retry_at = 0.0
+            else:
+                self.state = OPEN
+                self.retry_at = time.time() + self._backoff()
+            self._save()
+
+    def reset(self):
+        """手动重置熔断（例如用户点击测试登录）"""
+        with self.lock:
+            self._reset()
+            self._save()
+
+    def _reset(self):
+        self.state = CLOSED
+        self.failure_class = None
+        self.consecutive_failures = 0
+        self.retry_at = 0.0
+
+    def _backoff(self):
+        """指数退避 + 全抖动"""
+        exponent = max(0, self.consecutive_failures - 1 - (self.timeout_retries if self.failure_class == TIMEOUT else 0))
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** exponent))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def describe(self):
+        """熔断状态说明，用于 GUI 状态栏和日志"""
+        if self.state == CLOSED:
+            return "熔断器正常"
+        label = FAILURE_LABELS.get(self.failure_class, "未知错误")
+        if self.retry_at is None:
+            return f"登录熔断：{label}，请检查配置后手动登录"
+        if self.state == HALF_OPEN:
+            return f"登录熔断：{label}，正在试探"
+        remaining = max(0, int(self.retry_at - time.time()))
+        return f"登录熔断：{label}，{remaining} 秒后重试"
+
+    def _save(self):
+        if not self.state_file:
+            return
+        data = {
+            'state': self.state,
+            'failure_class': self.failure_class,
+            'consecutive_failures': self.consecutive_failures,
+            'retry_at': self.retry_at,
+            'fingerprint': self.fingerprint,
+        }
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except OSError:
+            pass
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.state = data.get('state', CLOSED)
+        self.failure_class = data.get('failure_class')
+        self.consecutive_failures = data.get('consecutive_failures', 0)
+        self.retry_at = data.get('retry_at', 0.0)
+        self.fingerprint = data.get('fingerprint')
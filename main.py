@@ -1,11 +1,40 @@
 import os
 import time
+import queue
 import logging
-import schedule
+import argparse
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
 
+import connectivity_probe
+import http_pool
+from connectivity_probe import PROBE_ONLINE
+from connection_state import (
+    ConnectionStateMachine, STATE_LABELS, ONLINE, SUSPECT, LOCKED_OUT,
+    PORTAL_LOGGED_IN, PORTAL_LOGGED_OUT, PORTAL_UNKNOWN,
+)
+from login_coordinator import LoginCoordinator, InterProcessLock
+from login_policy import LoginOutcome, LoginCircuitBreaker, BAD_CREDENTIALS, TIMEOUT, classify_exception, classify_failure
+from cycle_watchdog import Watchdog, reap_orphans
+from resource_monitor import ResourceMonitor, load_samples, format_report
+from browser_profile import BrowserProfile, load_memory_samples, format_memory_report
+from bandwidth import BandwidthLedger
+from recovery_slo import RecoveryTracker
+from control_server import ControlServer
+from event_log import EventLog
+from failure_capture import FailureCapture, link_text
+from cycle_profiler import CycleProfiler
+from check_scheduler import CheckScheduler, Wakeup, DUE, RESUMED, WOKEN
+from idle_meter import IdleMeter
+from session_keepalive import SessionKeepalive
+from expiry_predictor import ExpiryPredictor
+from portal_endpoints import EndpointSelector, PortalPrecheck
+from interface_monitor import InterfaceMonitors
+from dns_cache import DnsCache
+import history_store
+
 # 加载环境变量（必须在最前面）
 load_dotenv('.env', override=True)
 
@@ -43,6 +72,128 @@ class CampusNetworkLogin:
         self.username = username
         self.password = password
         self.login_url = LOGIN_URL
+        self.check_interval = CHECK_INTERVAL_SECONDS
+        # 门户地址：LOGIN_URL 和备用地址按健康分排序，打不开时切换（与 GUI 共用 logs/endpoints.json）
+        self.endpoints = EndpointSelector.from_env(
+            self.login_url,
+            state_file=os.path.join('logs', 'endpoints.json'),
+            on_log=logger.info
+        )
+        # 门户预检：页面未变化且外网可达时不打开浏览器
+        self.precheck = PortalPrecheck.from_env()
+        # 流量统计：超出每日预算时延长检查间隔（连通性探测、保活和 DNS 查询也计入）
+        self.bandwidth = BandwidthLedger.from_env(
+            state_file=os.path.join('logs', 'bandwidth.json'),
+            on_log=logger.warning
+        )
+        http_pool.shared().on_traffic = self.bandwidth.record
+        # DNS 缓存：门户和探测主机的解析结果按 TTL 缓存，确认在线时的结果固定到浏览器和探测
+        self.dns = self._create_dns()
+        # 与 GUI 共用 logs 目录下的锁文件，避免同时打开多个登录浏览器
+        self.coordinator = LoginCoordinator('logs', on_log=logger.info)
+        # 检查、登录和状态转换历史（与 GUI 共用 logs/history.db）
+        self.history = history_store.open_store('logs', 'cli')
+        # 结构化事件日志（logs/events.jsonl），每次检查/登录带周期 ID
+        self.events = EventLog.from_env('logs', 'cli')
+        self.last_check_cycle = None
+        self.last_login_cycle = None
+        self.last_error = None  # 最近一次检查出错的类别
+        # 登录失败时保存截图、DOM、网络记录到 logs/failures（与 GUI 共用）
+        self.capture = FailureCapture.from_env(
+            root=os.path.join('logs', 'failures'),
+            on_log=logger.info
+        )
+        # 性能剖析：PROFILE_CYCLES 或 run --profile 指定剖析的周期数，保存到 logs/profiles
+        self.profiler = CycleProfiler.from_env(os.path.join('logs', 'profiles'), on_log=logger.info)
+        # 掉线恢复耗时：从第一次检查失败到确认联网（与 GUI 共用 logs/recovery.jsonl）
+        self.recovery = RecoveryTracker.from_env(
+            record_file=os.path.join('logs', 'recovery.jsonl'),
+            on_log=logger.info,
+            on_update=lambda incident, summary, alert: self.events.emit(
+                'recovery', duration=incident['total'], stages=incident['stages'],
+                login=incident['login'], alert=alert
+            )
+        )
+        # 连接状态机：多次确认掉线后才登录
+        self.state = ConnectionStateMachine.from_env(
+            transition_log=os.path.join('logs', 'state_transitions.jsonl'),
+            on_transition=self.on_state_transition
+        )
+        # 登录熔断器：按失败类型决定重试时机，状态保存在 logs 目录（与 GUI 共用）
+        self.breaker = LoginCircuitBreaker.from_env(
+            state_file=os.path.join('logs', 'login_breaker.json')
+        )
+        self.breaker.bind_credentials(username, password)
+        # 看门狗：检查/登录超时后结束本进程启动的浏览器和驱动
+        self.watchdog = Watchdog.from_env(
+            record_file=os.path.join('logs', 'watchdog.jsonl'),
+            on_log=logger.warning
+        )
+        # 浏览器启动配置（低内存参数），记录每次检查/登录的浏览器内存
+        self.profile = BrowserProfile.from_env(
+            memory_file=os.path.join('logs', 'browser_memory.jsonl'),
+            on_log=logger.warning,
+            resolver=self.dns
+        )
+        # 检查调度：按包含休眠时间的时钟计时，休眠唤醒后立即检查
+        self.scheduler = CheckScheduler.from_env(on_log=logger.info)
+        self.next_check_at = 0.0
+        # 会话保活：在门户空闲超时前发送一个最小的请求（与 GUI 共用 logs/keepalive.json）
+        self.keepalive = SessionKeepalive.from_env(
+            state_file=os.path.join('logs', 'keepalive.json'),
+            on_log=logger.info
+        )
+        # 会话到期预测：按学到的强制注销规律在到期前密集检查（与 GUI 共用 logs/expiry.json）
+        self.predictor = ExpiryPredictor.from_env(
+            state_file=os.path.join('logs', 'expiry.json'),
+            on_log=logger.info
+        )
+        # 空闲测量：IDLE_MEASURE=true 时统计两次检查之间的唤醒次数和 CPU
+        self.idle_meter = IdleMeter.from_env(
+            {'cli': (os.getpid(), 'self'), 'browser': (os.getpid(), 'children')},
+            on_log=logger.info,
+            on_measure=lambda seconds, result: self.events.emit('idle', seconds=seconds, **result)
+        )
+        # 多网卡监控：INTERFACES 中的每个网卡按源地址独立探测和登录，各自运行在一个线程中
+        self.interfaces = InterfaceMonitors.from_env(
+            username, password, self.check_interval, 'logs',
+            on_log=logger.info,
+            events=self.events
+        )
+        # 资源采样：每次检查/登录前后记录进程树占用，持续增长时告警
+        self.resources = ResourceMonitor.from_env(
+            record_file=os.path.join('logs', 'resources.jsonl'),
+            on_log=logger.warning
+        )
+        
+        # 控制接口：操作请求在主线程中依次执行，避免与定时检查并发
+        self.paused = False
+        self.requests = queue.Queue()
+        self.wake = Wakeup()
+        self.stats_lock = threading.Lock()
+        self.check_counts = {}  # 门户检查结果 -> 次数
+        self.login_counts = {}  # 登录结果（success 或失败类别）-> 次数
+        self.last_check = None
+        self.last_login = None
+        self.control = ControlServer.from_env(
+            self.collect_status, self.collect_metrics,
+            {
+                'check': lambda: self.request('check', "已安排立即检查"),
+                'login': lambda: self.request('login', "已安排立即登录"),
+                'pause': self.pause,
+                'resume': self.resume,
+                'reload': lambda: self.request('reload', "已安排重新加载配置"),
+            },
+            on_log=logger.info
+        )
+    
+    def on_state_transition(self, old_state, new_state, reason):
+        """连接状态变化时记录日志和历史"""
+        logger.info(f"连接状态: {STATE_LABELS[old_state]} -> {STATE_LABELS[new_state]}（{reason}）")
+        if self.history:
+            self.history.record_transition(old_state, new_state, reason)
+        self.events.emit('transition', **{'from': old_state, 'to': new_state, 'reason': reason})
+        self.recovery.on_transition(old_state, new_state, reason)
     
     def check_network_status(self) -> bool:
         """检查网络连接状态
@@ -50,14 +201,31 @@ class CampusNetworkLogin:
         Returns:
             bool: True表示已登录，False表示未登录
         """
+        return self.check_portal_status() == PORTAL_LOGGED_IN
+    
+    def check_portal_status(self) -> str:
+        """检查门户页面的登录状态（先用连接池预检，门户页面有变化时才打开浏览器）
+        
+        Returns:
+            str: PORTAL_LOGGED_IN 已登录，PORTAL_LOGGED_OUT 未登录，PORTAL_UNKNOWN 出错或无法判断
+        """
+        if self.precheck.unchanged(self.endpoints.ranked()[0]):
+            logger.info("网络已登录（门户页面未变化，外网可达），无需重新登录")
+            return PORTAL_LOGGED_IN
+        portal = self._check_portal_page()
+        self.precheck.record(portal)
+        return portal
+    
+    def _check_portal_page(self) -> str:
+        """用浏览器打开门户页面，按注销和登录按钮判断登录状态"""
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(ignore_https_errors=True)
+            with sync_playwright() as p, self.profile.browser(p, 'check') as browser, \
+                    self.bandwidth.measure('check') as meter:
+                context = self.profile.new_context(browser, probe=True, meter=meter, ignore_https_errors=True)
                 page = context.new_page()
                 
                 logger.info("正在检查网络状态...")
-                page.goto(self.login_url, timeout=10000)
+                self.endpoints.open(page, timeout=10000)
                 time.sleep(2)
                 
                 # 检查是否已经登录（页面显示"注销下线"按钮表示已登录）
@@ -65,8 +233,7 @@ class CampusNetworkLogin:
                     logout_button = page.locator("button.loggoff")
                     if logout_button.is_visible(timeout=3000):
                         logger.info("网络已登录，无需重新登录")
-                        browser.close()
-                        return True
+                        return PORTAL_LOGGED_IN
                 except:
                     pass
                 
@@ -75,129 +242,547 @@ class CampusNetworkLogin:
                     login_button = page.locator("div.tab-group.account button.btn")
                     if login_button.is_visible(timeout=3000):
                         logger.info("检测到未登录状态")
-                        browser.close()
-                        return False
+                        return PORTAL_LOGGED_OUT
                 except:
                     pass
                 
-                browser.close()
-                return False
+                return PORTAL_UNKNOWN
                 
         except Exception as e:
             logger.error(f"检查网络状态时出错: {str(e)}")
-            return False
+            self.last_error = TIMEOUT if isinstance(e, PlaywrightTimeout) else type(e).__name__
+            return PORTAL_UNKNOWN
+    
+    def observe_once(self):
+        """检查一次门户状态和连通性，并输入状态机"""
+        if self.profiler.wants('check'):
+            with self.profiler.profile('check'):
+                return self._observe_cycle()
+        return self._observe_cycle()
+    
+    def _observe_cycle(self):
+        with self.events.cycle('check') as event_cycle:
+            self.last_check_cycle = event_cycle.id
+            return self._observe(event_cycle)
     
-    def login(self) -> bool:
+    def _observe(self, event_cycle):
+        started = time.monotonic()
+        self.last_error = None
+        self.recovery.cycle_started()
+        if self.predictor.expects_logout():
+            self.state.expect_logout()
+        dns = self.dns.prefetch()
+        with self.resources.around('cli', 'check'):
+            with self.watchdog.guard('check') as cycle:
+                portal = self.check_portal_status()
+            if cycle.expired:
+                portal = PORTAL_UNKNOWN
+                self.last_error = TIMEOUT
+            probe = None
+            if portal != PORTAL_LOGGED_IN:
+                probe = connectivity_probe.probe()
+        state = self.state.observe(portal, probe)
+        self.recovery.observe(portal, probe)
+        self.keepalive.observe(portal)
+        self.dns.observe(portal == PORTAL_LOGGED_IN or probe == PROBE_ONLINE)
+        expiry = self.predictor.observe(portal, self.state.confirmation_delay())
+        if expiry:
+            self.events.emit('expiry', **expiry)
+        elapsed = time.monotonic() - started
+        event_cycle.outcome = portal
+        event_cycle.error = self.last_error
+        event_cycle.fields.update(probe=probe, state=state, dns=dns)
+        if self.history:
+            self.history.record_check(portal, probe, state, elapsed)
+        with self.stats_lock:
+            self.check_counts[portal] = self.check_counts.get(portal, 0) + 1
+            self.last_check = {'portal': portal, 'probe': probe, 'state': state, 'dns': dns,
+                               'seconds': round(elapsed, 3), 'time': time.time()}
+        return state
+    
+    def login(self) -> LoginOutcome:
         """执行自动登录
         
         Returns:
-            bool: 登录成功返回True，失败返回False
+            LoginOutcome: 登录结果，可当作 bool 使用，失败时带有失败分类
         """
         if not self.username or not self.password:
             logger.error("用户名或密码未设置，请配置环境变量 CAMPUS_USERNAME 和 CAMPUS_PASSWORD")
-            return False
+            return LoginOutcome(False, BAD_CREDENTIALS, "用户名或密码未设置")
         
+        capture_path = None
         try:
-            with sync_playwright() as p:
-                # 启动浏览器（可见模式，方便调试）
-                browser = p.chromium.launch(
-                    headless=False,  # 设置为True可后台运行
-                    slow_mo=500  # 放慢操作速度，模拟人工操作
-                )
-                context = browser.new_context(
+            # 启动浏览器（可见模式，方便调试），结束时自动关闭
+            with sync_playwright() as p, self.profile.browser(
+                p, 'login',
+                headless=False,  # 设置为True可后台运行
+                slow_mo=500  # 放慢操作速度，模拟人工操作
+            ) as browser, self.bandwidth.measure('login') as meter:
+                context = self.profile.new_context(
+                    browser,
+                    meter=meter,
                     viewport={'width': 1280, 'height': 720},
                     user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
                     ignore_https_errors=True
                 )
+                tracing = self.capture.start_trace(context)
                 page = context.new_page()
                 
-                logger.info(f"正在打开登录页面: {self.login_url}")
-                page.goto(self.login_url, wait_until='networkidle')
-                time.sleep(2)
-                
-                # 检查是否已经登录
+                # 只在失败时保存诊断信息（需在浏览器关闭前），成功路径没有额外开销
                 try:
-                    logout_button = page.locator("button.loggoff")
-                    if logout_button.is_visible(timeout=2000):
-                        logger.info("已处于登录状态，无需重新登录")
-                        browser.close()
-                        return True
-                except:
-                    pass
-                
-                # 确保在账号登录标签页
-                account_tab = page.locator("div.tab-group.account")
-                if not account_tab.is_visible():
-                    # 点击"帐号登录"选项卡
-                    account_login_link = page.locator('a:has-text("帐号登录")')
-                    if account_login_link.is_visible():
-                        account_login_link.click()
-                        time.sleep(1)
-                
-                # 填写用户名
-                logger.info("正在填写用户名...")
-                username_input = page.locator('input#user')
-                username_input.clear()
-                username_input.fill(self.username, timeout=5000)
-                time.sleep(0.5)
-                
-                # 填写密码
-                logger.info("正在填写密码...")
-                password_input = page.locator('input#pass')
-                password_input.clear()
-                password_input.fill(self.password, timeout=5000)
-                time.sleep(0.5)
-                
-                # 点击登录按钮
-                logger.info("正在点击登录按钮...")
-                login_button = page.locator("div.tab-group.account button.btn")
-                login_button.click()
-                
-                # 等待登录完成
-                time.sleep(3)
-                
-                # 验证登录是否成功
-                try:
-                    # 检查是否出现"注销下线"按钮
-                    logout_button = page.locator("button.loggoff")
-                    if logout_button.is_visible(timeout=5000):
-                        logger.info("✓ 登录成功！")
-                        time.sleep(2)
-                        browser.close()
-                        return True
-                    else:
-                        # 检查是否有错误提示
-                        msg_zone = page.locator("div.msg-zone")
-                        error_msg = msg_zone.inner_text() if msg_zone.is_visible() else "未知错误"
-                        logger.error(f"✗ 登录失败: {error_msg}")
-                        browser.close()
-                        return False
-                except PlaywrightTimeout:
-                    logger.error("✗ 登录超时，请检查账号密码是否正确")
-                    browser.close()
-                    return False
+                    outcome = self._submit(page)
+                except Exception as e:
+                    capture_path = self.capture.save(page, 'login', error=e, meter=meter,
+                                                     tracing=tracing, cycle=self.last_login_cycle)
+                    raise
+                if outcome:
+                    self.capture.discard_trace(context, tracing)
+                else:
+                    capture_path = self.capture.save(page, 'login', outcome, meter=meter,
+                                                     tracing=tracing, cycle=self.last_login_cycle)
+                    logger.error(f"✗ 登录失败: {outcome.message}（{outcome.label}）{link_text(capture_path)}")
+                return outcome
                     
         except Exception as e:
-            logger.error(f"登录过程中出错: {str(e)}")
-            return False
+            logger.error(f"登录过程中出错: {str(e)}{link_text(capture_path)}")
+            return LoginOutcome(False, classify_exception(e), str(e))
     
-    def auto_check_and_login(self):
-        """自动检查并登录"""
+    def _submit(self, page) -> LoginOutcome:
+        """打开登录页面并提交账号密码"""
+        logger.info(f"正在打开登录页面: {self.endpoints.ranked()[0]}")
+        self.endpoints.open(page, wait_until='networkidle')
+        time.sleep(2)
+        
+        # 检查是否已经登录
+        try:
+            logout_button = page.locator("button.loggoff")
+            if logout_button.is_visible(timeout=2000):
+                logger.info("已处于登录状态，无需重新登录")
+                return LoginOutcome(True)
+        except:
+            pass
+        
+        # 确保在账号登录标签页
+        account_tab = page.locator("div.tab-group.account")
+        if not account_tab.is_visible():
+            # 点击"帐号登录"选项卡
+            account_login_link = page.locator('a:has-text("帐号登录")')
+            if account_login_link.is_visible():
+                account_login_link.click()
+                time.sleep(1)
+        
+        # 填写用户名
+        logger.info("正在填写用户名...")
+        username_input = page.locator('input#user')
+        username_input.clear()
+        username_input.fill(self.username, timeout=5000)
+        time.sleep(0.5)
+        
+        # 填写密码
+        logger.info("正在填写密码...")
+        password_input = page.locator('input#pass')
+        password_input.clear()
+        password_input.fill(self.password, timeout=5000)
+        time.sleep(0.5)
+        
+        # 点击登录按钮
+        logger.info("正在点击登录按钮...")
+        login_button = page.locator("div.tab-group.account button.btn")
+        login_button.click()
+        
+        # 等待登录完成
+        time.sleep(3)
+        
+        # 验证登录是否成功
+        try:
+            # 检查是否出现"注销下线"按钮
+            logout_button = page.locator("button.loggoff")
+            if logout_button.is_visible(timeout=5000):
+                logger.info("✓ 登录成功！")
+                time.sleep(2)
+                return LoginOutcome(True)
+            else:
+                # 检查是否有错误提示
+                msg_zone = page.locator("div.msg-zone")
+                error_msg = msg_zone.inner_text() if msg_zone.is_visible() else "未知错误"
+                return LoginOutcome(False, classify_failure(error_msg), error_msg)
+        except PlaywrightTimeout:
+            return LoginOutcome(False, TIMEOUT, "登录超时，请检查账号密码是否正确")
+    
+    def login_with_deadline(self, job='auto_login', parent=None) -> LoginOutcome:
+        """在看门狗截止时间内执行登录
+        
+        Args:
+            parent: 触发本次登录的检查周期 ID
+        """
+        if self.profiler.wants('login'):
+            with self.profiler.profile('login'):
+                return self._login_cycle(job, parent)
+        return self._login_cycle(job, parent)
+    
+    def _login_cycle(self, job, parent):
+        with self.events.cycle('login', parent=parent, job=job) as event_cycle:
+            self.last_login_cycle = event_cycle.id
+            outcome = self._login_with_deadline(job)
+            event_cycle.outcome = 'success' if outcome else 'failure'
+            event_cycle.error = outcome.failure_class
+            event_cycle.fields['message'] = outcome.message or None
+        return outcome
+    
+    def _login_with_deadline(self, job):
+        started = time.monotonic()
+        with self.resources.around('cli', 'login'), self.watchdog.guard('login') as cycle:
+            outcome = self.login()
+        if cycle.expired:
+            outcome = LoginOutcome(False, TIMEOUT, f"登录超过 {cycle.deadline} 秒未完成")
+        elapsed = time.monotonic() - started
+        if outcome:
+            self.keepalive.logged_in()
+            self.predictor.logged_in()
+        if self.history:
+            self.history.record_login(job, outcome, elapsed)
+        result = 'success' if outcome else outcome.failure_class
+        with self.stats_lock:
+            self.login_counts[result] = self.login_counts.get(result, 0) + 1
+            self.last_login = {'job': job, 'result': result, 'message': outcome.message,
+                               'seconds': round(elapsed, 3), 'time': time.time()}
+        return outcome
+    
+    def auto_check_and_login(self, force=False):
+        """自动检查并登录
+        
+        Args:
+            force: 控制接口要求的立即检查，不受暂停和流量预算限制
+        """
+        if not force:
+            if self.paused:
+                return
+        
         logger.info("="*50)
         logger.info(f"开始执行自动检查 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]")
         
-        if not self.check_network_status():
-            logger.info("需要登录，开始自动登录流程...")
-            self.login()
+        # 其他进程正在登录时推迟检查（最多 180 秒），控制接口的操作可以打断等待
+        if self.coordinator.is_busy():
+            logger.info("登录进行中，推迟本次检查...")
+            deadline = time.monotonic() + 180
+            while not self.coordinator.wait_idle(timeout=1):
+                if self.wake.is_set():
+                    logger.info("收到控制接口操作，本次检查取消")
+                    return
+                if time.monotonic() >= deadline:
+                    break
+        
+        self.observe_once()
+        
+        # 疑似掉线时快速复查，直到确认在线或确认掉线；控制接口的操作打断复查，由下一次检查继续
+        for _ in range(self.state.offline_confirmations):
+            if self.state.state != SUSPECT:
+                break
+            reason = self.scheduler.wait(self.state.next_check_delay(self.check_interval), self.wake)
+            if reason == WOKEN:
+                logger.info("收到控制接口操作，暂停复查")
+                return
+            if reason == RESUMED:
+                self.events.emit('resume', asleep=round(self.scheduler.last_sleep, 1))
+                self.state.resumed()
+            self.observe_once()
+        
+        if self.state.should_login(self.breaker):
+            logger.info("确认掉线，开始自动登录流程...")
+            parent = self.last_check_cycle
+            with self.events.resume(parent):
+                self.state.begin_login()
+            outcome = self.coordinator.run(lambda: self.login_with_deadline('auto_login', parent))
+            # 登录结束后的状态转换记在登录周期下
+            with self.events.resume(self.last_login_cycle):
+                self.breaker.record(outcome)
+                self.state.login_finished(outcome)
+                if not outcome:
+                    logger.warning(self.breaker.describe())
+                elif self.recovery.pending_confirmation() and connectivity_probe.probe() == PROBE_ONLINE:
+                    # 确认已联网才算恢复，探测失败时由下一次检查确认
+                    self.recovery.confirm()
+        elif self.state.state == LOCKED_OUT:
+            logger.warning(f"当前状态: {self.state.label}，{self.breaker.describe()}")
         else:
-            logger.info("当前已登录，无需操作")
+            logger.info(f"当前状态: {self.state.label}，无需登录")
+    
+    def login_now(self):
+        """控制接口要求的立即登录（视为手动登录，解除熔断）
+
+        已登录时不改变连接状态：手动登录不代表掉线，否则会记下一次并不存在的断网（影响恢复时间和可用率统计）
+        """
+        logger.info("控制接口要求立即登录...")
+        self.breaker.reset()
+        track_state = self.state.state != ONLINE
+        if track_state:
+            self.state.begin_login("手动登录")
+        outcome = self.coordinator.run(lambda: self.login_with_deadline('manual_login'))
+        with self.events.resume(self.last_login_cycle):
+            self.breaker.record(outcome)
+            if track_state:
+                self.state.login_finished(outcome)
+            if not outcome:
+                logger.warning(self.breaker.describe())
+    
+    def run(self):
+        """持续监控：按检查间隔检查（超出流量预算时延长），控制接口的操作随时处理
+        
+        休眠唤醒后立即检查，休眠期间错过的检查只补一次
+        """
+        logger.info(f"每 {self.check_interval} 秒检查一次")
+        while True:
+            self.auto_check_and_login()
+            # 预测的会话到期前后密集检查
+            interval = self.predictor.next_check_delay(self.bandwidth.check_interval(self.check_interval))
+            self.next_check_at = self.scheduler.now() + interval
+            first = True
+            while True:
+                # 等待期间没有任何定时唤醒，控制接口的操作通过 wake 唤醒
+                self.idle_meter.idle_started()
+                reason = self._wait(first)
+                first = False
+                self.wake.clear()
+                self.idle_meter.idle_finished()
+                self.process_requests()
+                if reason == RESUMED:
+                    self.events.emit('resume', asleep=round(self.scheduler.last_sleep, 1))
+                    self.state.resumed()
+                if reason in (DUE, RESUMED):
+                    break
+    
+    def _wait(self, first):
+        """等待到下次检查，期间到期的保活在等待中完成
+        
+        下次检查之前就会到期的保活在检查之后立即发送（first），不单独唤醒
+        """
+        while True:
+            due_in = self.keepalive.due_in()
+            if due_in is None or self.scheduler.now() + due_in >= self.next_check_at:
+                return self.scheduler.wait_until(self.next_check_at, self.wake)
+            if not first:
+                reason = self.scheduler.wait(max(0.0, due_in), self.wake)
+                if reason != DUE:
+                    return reason
+            first = False
+            self.events.emit('keepalive', ok=self.keepalive.refresh())
+    
+    def reload_config(self):
+        """重新读取 .env 中的账号、密码、登录地址和检查间隔"""
+        load_dotenv('.env', override=True)
+        self.username = os.getenv("CAMPUS_USERNAME", "")
+        self.password = os.getenv("CAMPUS_PASSWORD", "")
+        self.login_url = os.getenv("LOGIN_URL", "https://raas.hzu.edu.cn/")
+        self.endpoints = EndpointSelector.from_env(
+            self.login_url,
+            state_file=os.path.join('logs', 'endpoints.json'),
+            on_log=logger.info
+        )
+        self.dns = self._create_dns()
+        self.profile.resolver = self.dns
+        self.breaker.bind_credentials(self.username, self.password)
+        self.interfaces.update_credentials(self.username, self.password)
+        interval = int(os.getenv("CHECK_INTERVAL_SECONDS", "30"))
+        if interval != self.check_interval:
+            self.check_interval = interval
+            # 间隔缩短时提前下一次检查
+            self.next_check_at = min(self.next_check_at, self.scheduler.now() + interval)
+            logger.info(f"检查间隔已改为 {interval} 秒")
+        logger.info("配置已重新加载")
+    
+    def _create_dns(self):
+        """门户地址和探测地址的 DNS 缓存，HTTP 探测同时改为连接可信地址"""
+        dns = DnsCache.from_env(
+            self.endpoints.urls + [os.getenv("PROBE_URL", connectivity_probe.DEFAULT_PROBE_URL)],
+            state_file=os.path.join('logs', 'dns.json'),
+            on_log=logger.info,
+            on_traffic=self.bandwidth.record
+        )
+        http_pool.shared().resolver = dns
+        return dns
+    
+    def request(self, action, message):
+        """把控制接口的操作交给主线程执行"""
+        self.requests.put(action)
+        self.wake.set()
+        return True, message
+    
+    def pause(self):
+        if self.paused:
+            return False, "监控已处于暂停状态"
+        self.paused = True
+        logger.info("监控已暂停（控制接口）")
+        return True, "监控已暂停"
+    
+    def resume(self):
+        if not self.paused:
+            return False, "监控未暂停"
+        self.paused = False
+        logger.info("监控已恢复（控制接口）")
+        return True, "监控已恢复"
+    
+    def process_requests(self):
+        """执行控制接口排队的操作"""
+        while True:
+            try:
+                action = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if action == 'check':
+                self.auto_check_and_login(force=True)
+            elif action == 'login':
+                self.login_now()
+            elif action == 'reload':
+                self.reload_config()
+    
+    def collect_status(self):
+        """控制接口 /status 的内容"""
+        with self.stats_lock:
+            status = {
+                'state': self.state.state,
+                'label': self.state.label,
+                'state_since': self.state.entered_at,
+                'paused': self.paused,
+                'check_interval': self.check_interval,
+                'last_check': self.last_check,
+                'last_login': self.last_login,
+                'checks': dict(self.check_counts),
+                'logins': dict(self.login_counts),
+            }
+        status['breaker'] = self.breaker.describe()
+        status['bandwidth'] = self.bandwidth.summary()
+        status['recovery'] = self.recovery.summary()
+        status['keepalive'] = self.keepalive.summary()
+        status['expiry'] = self.predictor.summary()
+        status['endpoints'] = self.endpoints.ranked()
+        status['dns'] = {host: self.dns.pinned(host) for host in self.dns.hosts}
+        status['http'] = http_pool.shared().summary()
+        status['precheck'] = self.precheck.summary()
+        if self.interfaces:
+            status['interfaces'] = self.interfaces.status()
+        return status
+    
+    def collect_metrics(self):
+        """控制接口 /metrics 的内容"""
+        with self.stats_lock:
+            check_counts = dict(self.check_counts)
+            login_counts = dict(self.login_counts)
+            last_check = self.last_check
+            last_login = self.last_login
+        recovery = self.recovery.percentiles()['total']
+        latest = self.resources.latest('cli')
+        http = http_pool.shared()
+        return self.interfaces.metrics() + [
+            ('campus_login_state', 'gauge', "当前连接状态（对应状态为 1）",
+             [({'state': state}, int(state == self.state.state)) for state in STATE_LABELS]),
+            ('campus_login_state_duration_seconds', 'gauge', "处于当前状态的时长",
+             [({}, time.time() - self.state.entered_at)]),
+            ('campus_login_paused', 'gauge', "监控是否已暂停", [({}, int(self.paused))]),
+            ('campus_login_checks_total', 'counter', "门户检查次数（按结果）",
+             [({'portal': portal}, count) for portal, count in check_counts.items()]),
+            ('campus_login_logins_total', 'counter', "登录次数（按结果）",
+             [({'result': result}, count) for result, count in login_counts.items()]),
+            ('campus_login_last_check_duration_seconds', 'gauge', "最近一次检查耗时",
+             [({}, last_check and last_check['seconds'])]),
+            ('campus_login_last_check_timestamp_seconds', 'gauge', "最近一次检查完成时间",
+             [({}, last_check and last_check['time'])]),
+            ('campus_login_last_login_duration_seconds', 'gauge', "最近一次登录耗时",
+             [({}, last_login and last_login['seconds'])]),
+            ('campus_login_recovery_seconds', 'gauge', "掉线恢复耗时百分位数",
+             [({'quantile': f"{p / 100:g}"}, value) for p, value in recovery.items()]),
+            ('campus_login_keepalive_total', 'counter', "会话保活次数（按结果）",
+             [({'result': 'ok'}, self.keepalive.data['ok']), ({'result': 'failed'}, self.keepalive.data['failed'])]),
+            ('campus_login_keepalive_interval_seconds', 'gauge', "会话保活间隔（配置或学习的空闲超时 × 比例）",
+             [({}, self.keepalive.interval)]),
+            ('campus_login_expiry_predictions_total', 'counter', "会话到期预测结果（命中/未命中/未预测到的注销）",
+             [({'result': result}, self.predictor.data[key])
+              for result, key in (('hit', 'hits'), ('miss', 'misses'), ('reactive', 'reactive'))]),
+            ('campus_login_expiry_avoided_seconds_total', 'counter', "按预测提前发现会话到期减少的掉线时间",
+             [({}, self.predictor.data['avoided'])]),
+            ('campus_login_endpoint_latency_seconds', 'gauge', "各门户地址打开页面耗时（滑动平均）",
+             [({'url': url}, health['latency']) for url, health in self.endpoints.health.items()]),
+            ('campus_login_endpoint_failures_total', 'counter', "各门户地址打开失败次数",
+             [({'url': url}, health['failed']) for url, health in self.endpoints.health.items()]),
+            ('campus_login_dns_lookup_seconds', 'gauge', "最近一次检查前等待 DNS 解析的时间（命中缓存时为 0）",
+             [({}, self.dns.last_lookup)]),
+            ('campus_login_http_requests_total', 'counter', "探测/保活/表单登录的 HTTP 请求（按连接是新建还是复用）",
+             [({'connection': 'opened'}, http.stats['opened']), ({'connection': 'reused'}, http.stats['reused'])]),
+            ('campus_login_http_tls_resumed_total', 'counter', "新建 HTTPS 连接中恢复 TLS 会话的次数",
+             [({}, http.stats['resumed'])]),
+            ('campus_login_http_not_modified_total', 'counter', "条件请求返回 304（页面未变化）的次数",
+             [({}, http.stats['not_modified'])]),
+            ('campus_login_bandwidth_today_bytes', 'gauge', "今日检查/登录流量", [({}, self.bandwidth.today())]),
+            ('campus_login_resident_memory_bytes', 'gauge', "最近一次采样的进程树内存",
+             [({}, latest and latest['rss_mb'] * 1024 * 1024)]),
+        ]
 
 
-def main():
+def diagnose(limit):
+    """显示资源采样、浏览器内存和流量统计"""
+    samples = load_samples(os.path.join('logs', 'resources.jsonl'), limit)
+    print(format_report(samples))
+    print("== 浏览器内存（按启动配置）==")
+    print(format_memory_report(load_memory_samples(os.path.join('logs', 'browser_memory.jsonl'))))
+    print()
+    print("== 流量统计 ==")
+    print(BandwidthLedger(state_file=os.path.join('logs', 'bandwidth.json')).report())
+
+
+def report():
+    """显示可用率、掉线和登录历史"""
+    started = time.perf_counter()
+    store = history_store.open_store('logs', 'cli')
+    if store is None:
+        print("无法打开 logs/history.db")
+        return
+    text = store.report()
+    store.close()
+    print("== 可用率 ==")
+    print(text)
+    print()
+    print("== 掉线恢复耗时 ==")
+    print(RecoveryTracker.from_env(record_file=os.path.join('logs', 'recovery.jsonl')).report())
+    print()
+    print("== 会话保活 ==")
+    print(SessionKeepalive.from_env(state_file=os.path.join('logs', 'keepalive.json')).summary())
+    print()
+    print("== 会话到期预测 ==")
+    print(ExpiryPredictor.from_env(state_file=os.path.join('logs', 'expiry.json')).summary())
+    print()
+    print("== 门户地址 ==")
+    print(EndpointSelector.from_env(LOGIN_URL, state_file=os.path.join('logs', 'endpoints.json')).summary())
+    print()
+    print("== DNS 缓存 ==")
+    urls = EndpointSelector.from_env(LOGIN_URL).urls + [os.getenv("PROBE_URL", connectivity_probe.DEFAULT_PROBE_URL)]
+    print(DnsCache.from_env(urls, state_file=os.path.join('logs', 'dns.json')).summary())
+    print(f"\n（查询耗时 {(time.perf_counter() - started) * 1000:.1f} 毫秒）")
+
+
+def main(argv=None):
     """主函数"""
+    parser = argparse.ArgumentParser(description="校园网自动登录（命令行版本）")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="持续监控，掉线时自动登录（默认）")
+    run_parser.add_argument('--profile', type=int, metavar="N",
+                            help="用 cProfile 剖析前 N 次检查/登录（覆盖 PROFILE_CYCLES）")
+    diagnose_parser = subparsers.add_parser('diagnose', help="显示资源采样、浏览器内存和流量统计")
+    diagnose_parser.add_argument('--limit', type=int, default=200, help="读取最近多少条采样（默认 200）")
+    subparsers.add_parser('report', help="显示可用率、掉线次数、MTTR 和掉线恢复耗时分布")
+    args = parser.parse_args(argv)
+    
     # 创建logs目录
     os.makedirs('logs', exist_ok=True)
     
+    if args.command == 'diagnose':
+        diagnose(args.limit)
+        return
+    if args.command == 'report':
+        report()
+        return
+    
+    if getattr(args, 'profile', None) is not None:
+        os.environ["PROFILE_CYCLES"] = str(args.profile)
+    
     # 检查账号密码配置
     username = os.getenv("CAMPUS_USERNAME", "")
     password = os.getenv("CAMPUS_PASSWORD", "")
@@ -211,26 +796,36 @@ def main():
         logger.error("=" * 60)
         return
     
+    # 单实例锁：同一时刻只允许一个实例监控
+    instance_lock = InterProcessLock(os.path.join('logs', 'monitor.lock'))
+    if not instance_lock.acquire():
+        logger.error("另一个实例正在监控（GUI 或 main.py），程序退出")
+        return
+    
+    # 清理上次运行中断后遗留的浏览器进程
+    reaped = reap_orphans(BROWSERS_PATH)
+    if reaped:
+        logger.info(f"已清理 {reaped} 个遗留的浏览器/驱动进程")
+    
     # 创建登录实例
     campus_login = CampusNetworkLogin(username, password)
     
-    # 首次立即执行
-    logger.info("程序启动，立即执行首次检查...")
-    campus_login.auto_check_and_login()
-    
-    # 设置定时任务
-    schedule.every(CHECK_INTERVAL_SECONDS).seconds.do(campus_login.auto_check_and_login)
+    # 本地控制接口（未配置 CONTROL_PORT / CONTROL_SOCKET 时不启动）
+    campus_login.control.start()
+    # 各网卡的监控线程（未配置 INTERFACES 时不启动）
+    campus_login.interfaces.start()
     
-    logger.info(f"定时任务已设置，每 {CHECK_INTERVAL_SECONDS} 秒检查一次")
+    # 首次立即执行，之后按检查间隔持续运行
+    logger.info("程序启动，立即执行首次检查...")
     logger.info("按 Ctrl+C 停止程序")
-    
-    # 持续运行
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # 每分钟检查一次是否有待执行的任务
+        campus_login.run()
     except KeyboardInterrupt:
         logger.info("程序已停止")
+    finally:
+        logger.info(f"🔗 HTTP 连接: {http_pool.shared().summary()}")
+        campus_login.interfaces.stop()
+        campus_login.control.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+"""
+门户地址选择 - LOGIN_URL 之外可配置多个等价的门户地址（其他主机名、IP、http/https），按滚动的健康分排序
+检查和登录打开排名最前的地址，打不开时依次切换到下一个；排名最前的地址响应慢或健康状况未知时，
+先用轻量 HTTP 请求对冲（间隔一小段时间依次向后续地址发出，取最先响应的那个），不必等满页面加载超时。
+GUI 工作进程和 main.py 共用同一套选择逻辑和 logs/endpoints.json 中的健康记录；只配置一个地址时行为与原来相同。
+PortalPrecheck 在打开浏览器之前先用连接池发一个条件请求，门户页面未变化且外网可达时沿用上次的“已登录”结果
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+import connectivity_probe
+import http_pool
+from check_scheduler import suspend_clock
+from connection_state import PORTAL_LOGGED_IN
+from connectivity_probe import PROBE_ONLINE
+
+
+class EndpointSelector:
+    """门户地址选择
+
+    用法:
+        url = endpoints.open(page, timeout=10000)   # 代替 page.goto(LOGIN_URL, ...)
+
+    健康分：页面打开耗时的指数滑动平均（越小越靠前），打开失败后冷却 cooldown 秒内排到最后
+    """
+
+    def __init__(self, urls, hedge_delay=1.5, slow=3.0, cooldown=300, alpha=0.3, state_file=None, on_log=None):
+        self.urls = list(dict.fromkeys(url for url in urls if url))  # 去重，保持配置顺序
+        self.hedge_delay = hedge_delay
+        self.slow = slow
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.state_file = state_file if len(self.urls) > 1 else None
+        self.on_log = on_log or (lambda message: None)
+        self.lock = threading.Lock()
+        self.health = {url: {'latency': None, 'ok': 0, 'failed': 0, 'failed_at': None} for url in self.urls}
+        self._load()
+
+    @classmethod
+    def from_env(cls, primary, state_file=None, on_log=None):
+        """按 .env 配置创建，primary 为 LOGIN_URL（GUI 中填写的登录地址），LOGIN_URL_FALLBACKS 为逗号分隔的备用地址"""
+        fallbacks = os.getenv("LOGIN_URL_FALLBACKS", "")
+        return cls(
+            [primary] + [url.strip() for url in fallbacks.split(",") if url.strip()],
+            hedge_delay=float(os.getenv("ENDPOINT_HEDGE_SECONDS", "1.5")),
+            slow=float(os.getenv("ENDPOINT_SLOW_SECONDS", "3")),
+            cooldown=int(os.getenv("ENDPOINT_COOLDOWN_SECONDS", "300")),
+            state_file=state_file,
+            on_log=on_log,
+        )
+
+    @property
+    def primary(self):
+        return self.urls[0]
+
+    def ranked(self):
+        """按健康分排序的地址：冷却中的排最后，其余按打开耗时，未测过的按配置顺序排在已测过的之后"""
+        now = time.time()
+        with self.lock:
+            def key(url):
+                health = self.health[url]
+                cooling = health['failed_at'] is not None and now - health['failed_at'] < self.cooldown
+                latency = health['latency']
+                return (cooling, latency is None, latency or 0.0, self.urls.index(url))
+            return sorted(self.urls, key=key)
+
+    def record(self, url, seconds, ok):
+        """记录一次打开门户页面的结果"""
+        with self.lock:
+            health = self.health[url]
+            if ok:
+                health['ok'] += 1
+                health['failed_at'] = None
+                latency = health['latency']
+                health['latency'] = round(seconds if latency is None else
+                                          latency + self.alpha * (seconds - latency), 3)
+            else:
+                health['failed'] += 1
+                health['failed_at'] = time.time()
+            self._save()
+
+    def open(self, page, timeout=None, **kwargs):
+        """按排名打开门户页面，打不开时切换到下一个地址
+
+        Args:
+            timeout: 每个地址的 page.goto 超时（毫秒），None 为 Playwright 默认值
+            kwargs: 传给 page.goto 的其他参数（wait_until 等）
+
+        Returns:
+            str: 实际打开的地址
+
+        Raises:
+            所有地址都打不开时抛出最后一个地址的异常
+        """
+        order = self.ranked()
+        if len(order) > 1 and self._needs_hedge(order[0]):
+            winner = self.hedge(order)
+            if winner and winner != order[0]:
+                self.on_log(f"🔀 门户地址 {order[0]} 响应慢，改用 {winner}")
+                order.remove(winner)
+                order.insert(0, winner)
+        error = None
+        for url in order:
+            if error is not None:
+                self.on_log(f"🔀 门户地址打不开（{type(error).__name__}），切换到 {url}")
+            started = time.monotonic()
+            try:
+                if timeout is None:
+                    page.goto(url, **kwargs)
+                else:
+                    page.goto(url, timeout=timeout, **kwargs)
+            except Exception as e:
+                self.record(url, time.monotonic() - started, False)
+                error = e
+                if len(order) == 1:
+                    raise
+                continue
+            self.record(url, time.monotonic() - started, True)
+            return url
+        raise error
+
+    def _needs_hedge(self, url):
+        with self.lock:
+            health = self.health[url]
+            return health['latency'] is None or health['latency'] > self.slow or health['failed_at'] is not None
+
+    def hedge(self, order, timeout=10):
+        """对冲请求：先请求第一个地址，每隔 hedge_delay 秒未响应就再请求下一个，返回最先响应的地址
+
+        Returns:
+            str | None: 最先响应的地址，都未响应时为 None
+        """
+        results = queue.Queue()
+        deadline = time.monotonic() + timeout
+        pending = 0
+        for index, url in enumerate(order):
+            threading.Thread(target=_ping, args=(url, timeout, results), daemon=True).start()
+            pending += 1
+            last = index == len(order) - 1
+            while pending:
+                wait = deadline - time.monotonic() if last else self.hedge_delay
+                try:
+                    responded, ok, seconds = results.get(timeout=max(0.0, wait))
+                except queue.Empty:
+                    break
+                pending -= 1
+                if ok:
+                    return responded
+                self.record(responded, seconds, False)
+                if not last:
+                    break  # 已失败，立即请求下一个
+        return None
+
+    def summary(self):
+        """各地址的健康状况"""
+        now = time.time()
+        lines = []
+        for url in self.ranked():
+            with self.lock:
+                health = dict(self.health[url])
+            latency = "-" if health['latency'] is None else f"{health['latency']:.2f} 秒"
+            text = f"  {url}  打开耗时 {latency}，成功 {health['ok']} / 失败 {health['failed']}"
+            if health['failed_at'] is not None and now - health['failed_at'] < self.cooldown:
+                text += "（冷却中）"
+            lines.append(text)
+        return "\n".join(lines)
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.health, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError:
+            pass
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for url in self.urls:
+            if isinstance(data.get(url), dict):
+                self.health[url].update(data[url])
+
+
+class PortalPrecheck:
+    """门户页面预检：浏览器检查之前先用连接池请求一次门户页面（带 ETag / Last-Modified）
+
+    用法:
+        if precheck.unchanged(url):     # 沿用上次的“已登录”
+            return PORTAL_LOGGED_IN
+        portal = ...                    # 浏览器检查
+        precheck.record(portal)
+
+    只有同时满足以下条件才跳过浏览器：上次浏览器检查为已登录、门户页面（状态码和正文）与那次相同、
+    连通性探测显示外网可达、距那次浏览器检查不超过 max_age 秒。注销按钮只有浏览器能看到，
+    因此未登录、无法判断或页面有变化时都交给浏览器
+    """
+
+    def __init__(self, max_age=300, enabled=True, timeout=3):
+        self.max_age = max_age
+        self.enabled = enabled and max_age > 0
+        self.timeout = timeout
+        self.clock = suspend_clock() or time.monotonic  # 休眠时间计入 max_age
+        self.lock = threading.Lock()
+        self.pending = None  # 本次预检的页面指纹，浏览器检查后由 record() 记下
+        self.last = None  # 上次浏览器检查为已登录时的 {'fingerprint', 'at'}
+        self.counts = {'reused': 0, 'browser': 0}
+
+    @classmethod
+    def from_env(cls):
+        """按 .env 配置创建，PORTAL_PRECHECK=false 时每次检查都打开浏览器"""
+        return cls(
+            max_age=int(os.getenv("PORTAL_PRECHECK_MAX_SECONDS", "300")),
+            enabled=os.getenv("PORTAL_PRECHECK", "true").lower() in ("1", "true", "yes"),
+        )
+
+    def unchanged(self, url):
+        """请求门户页面，判断能否沿用上次的“已登录”
+
+        Returns:
+            bool: True 表示不必打开浏览器
+        """
+        if not self.enabled:
+            return False
+        try:
+            response = http_pool.shared().request('GET', url, timeout=self.timeout, verify=False,
+                                                  conditional=True, phase='check')
+            fingerprint = (url, response.status, hashlib.sha256(response.body).hexdigest())
+        except (OSError, ValueError):
+            fingerprint = None
+        with self.lock:
+            self.pending = fingerprint
+            last = self.last
+        if fingerprint is None or last is None or last['fingerprint'] != fingerprint:
+            return False
+        if self.clock() - last['at'] > self.max_age:
+            return False
+        # 页面相同不代表会话仍在（门户页面多由脚本渲染），外网可达才沿用
+        if connectivity_probe.probe() != PROBE_ONLINE:
+            return False
+        with self.lock:
+            self.counts['reused'] += 1
+        return True
+
+    def record(self, portal):
+        """记下浏览器检查的结果，只有已登录会在之后的检查中沿用"""
+        with self.lock:
+            self.counts['browser'] += 1
+            if portal == PORTAL_LOGGED_IN and self.pending is not None:
+                self.last = {'fingerprint': self.pending, 'at': self.clock()}
+            else:
+                self.last = None
+            self.pending = None
+
+    def summary(self):
+        """预检沿用次数和浏览器检查次数"""
+        if not self.enabled:
+            return "门户预检: 未启用"
+        with self.lock:
+            counts = dict(self.counts)
+        return f"门户预检: 沿用 {counts['reused']} 次，浏览器检查 {counts['browser']} 次"
+
+
+def _ping(url, timeout, results):
+    """请求一次门户首页，任何 HTTP 响应（包括重定向和错误页）都说明前端在响应
+
+    只判断门户前端是否响应，不校验证书（与检查时的 ignore_https_errors 一致）；页面未变化时门户只返回 304
+    """
+    started = time.monotonic()
+    try:
+        http_pool.shared().request('GET', url, timeout=timeout, verify=False, conditional=True, phase='endpoint')
+        ok = True
+    except (OSError, ValueError):
+        ok = False
+    results.put((url, ok, time.monotonic() - started))
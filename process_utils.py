@@ -0,0 +1,322 @@
+"""
+进程工具 - 进程树查询、内存统计与强制结束
+只依赖标准库：Linux 读取 /proc，Windows 通过 ctypes 调用 Win32 API
+"""
+import os
+import sys
+import signal
+from dataclasses import dataclass
+
+
+@dataclass
+class ProcessInfo:
+    """进程快照信息"""
+    pid: int
+    ppid: int
+    name: str
+    threads: int = 0
+
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    _TH32CS_SNAPPROCESS = 0x00000002
+    _PROCESS_TERMINATE = 0x0001
+    _PROCESS_VM_READ = 0x0010
+    _PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    _INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+    class _PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD),
+            ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD),
+            ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", wintypes.DWORD),
+            ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD),
+            ("pcPriClassBase", ctypes.c_long),
+            ("dwFlags", wintypes.DWORD),
+            ("szExeFile", ctypes.c_wchar * 260),
+        ]
+
+    class _PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    _kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+
+    def _open_process(pid, access):
+        return _kernel32.OpenProcess(access, False, pid)
+
+    def list_processes():
+        """列出系统中所有进程
+
+        Returns:
+            dict[int, ProcessInfo]: pid -> 进程信息
+        """
+        result = {}
+        snapshot = _kernel32.CreateToolhelp32Snapshot(_TH32CS_SNAPPROCESS, 0)
+        if not snapshot or snapshot == _INVALID_HANDLE_VALUE:
+            return result
+        try:
+            entry = _PROCESSENTRY32W()
+            entry.dwSize = ctypes.sizeof(_PROCESSENTRY32W)
+            ok = _kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+            while ok:
+                result[entry.th32ProcessID] = ProcessInfo(
+                    entry.th32ProcessID, entry.th32ParentProcessID, entry.szExeFile, entry.cntThreads
+                )
+                ok = _kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+        finally:
+            _kernel32.CloseHandle(snapshot)
+        return result
+
+    def get_rss(pid):
+        """获取进程常驻内存（工作集），单位字节，获取失败返回 0"""
+        handle = _open_process(pid, _PROCESS_QUERY_LIMITED_INFORMATION | _PROCESS_VM_READ)
+        if not handle:
+            return 0
+        try:
+            counters = _PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(_PROCESS_MEMORY_COUNTERS)
+            if _kernel32.K32GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return 0
+        finally:
+            _kernel32.CloseHandle(handle)
+
+    def get_exe(pid):
+        """获取进程可执行文件的完整路径，获取失败返回 None"""
+        handle = _open_process(pid, _PROCESS_QUERY_LIMITED_INFORMATION)
+        if not handle:
+            return None
+        try:
+            buffer = ctypes.create_unicode_buffer(32768)
+            size = wintypes.DWORD(len(buffer))
+            if _kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+                return buffer.value
+            return None
+        finally:
+            _kernel32.CloseHandle(handle)
+
+    def get_handle_count(pid):
+        """获取进程打开的句柄数量，获取失败返回 0"""
+        handle = _open_process(pid, _PROCESS_QUERY_LIMITED_INFORMATION)
+        if not handle:
+            return 0
+        try:
+            count = wintypes.DWORD()
+            if _kernel32.GetProcessHandleCount(handle, ctypes.byref(count)):
+                return count.value
+            return 0
+        finally:
+            _kernel32.CloseHandle(handle)
+
+    def get_cpu_time(pid):
+        """获取进程累计 CPU 时间（用户态 + 内核态），单位秒，获取失败返回 0"""
+        handle = _open_process(pid, _PROCESS_QUERY_LIMITED_INFORMATION)
+        if not handle:
+            return 0.0
+        try:
+            times = [wintypes.FILETIME() for _ in range(4)]  # 创建、退出、内核态、用户态
+            if not _kernel32.GetProcessTimes(handle, *(ctypes.byref(t) for t in times)):
+                return 0.0
+            return sum((t.dwHighDateTime << 32 | t.dwLowDateTime) for t in times[2:]) / 1e7
+        finally:
+            _kernel32.CloseHandle(handle)
+
+    def get_context_switches(pid):
+        """Windows 上没有按进程统计的上下文切换次数，返回 None"""
+        return None
+
+    def _kill(pid):
+        handle = _open_process(pid, _PROCESS_TERMINATE)
+        if not handle:
+            return False
+        try:
+            return bool(_kernel32.TerminateProcess(handle, 1))
+        finally:
+            _kernel32.CloseHandle(handle)
+
+    def is_supported():
+        """当前平台是否支持进程树统计"""
+        return True
+
+elif sys.platform.startswith("linux"):
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+    def _read_stat(pid):
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read().decode("utf-8", "replace")
+        # comm 字段可能包含空格和括号，以最后一个 ')' 为界
+        name = data[data.find("(") + 1:data.rfind(")")]
+        fields = data[data.rfind(")") + 2:].split()
+        return name, fields
+
+    def list_processes():
+        """列出系统中所有进程
+
+        Returns:
+            dict[int, ProcessInfo]: pid -> 进程信息
+        """
+        result = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            try:
+                name, fields = _read_stat(pid)
+            except OSError:
+                continue
+            result[pid] = ProcessInfo(pid, int(fields[1]), name, int(fields[17]))
+        return result
+
+    def get_rss(pid):
+        """获取进程常驻内存，单位字节，获取失败返回 0"""
+        try:
+            with open(f"/proc/{pid}/statm", "rb") as f:
+                return int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            return 0
+
+    def get_exe(pid):
+        """获取进程可执行文件的完整路径，获取失败返回 None"""
+        try:
+            return os.readlink(f"/proc/{pid}/exe")
+        except OSError:
+            return None
+
+    def get_handle_count(pid):
+        """获取进程打开的文件描述符数量，获取失败返回 0"""
+        try:
+            return len(os.listdir(f"/proc/{pid}/fd"))
+        except OSError:
+            return 0
+
+    def get_cpu_time(pid):
+        """获取进程累计 CPU 时间（用户态 + 内核态），单位秒，获取失败返回 0"""
+        try:
+            _, fields = _read_stat(pid)
+            return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+        except (OSError, ValueError, IndexError):
+            return 0.0
+
+    def get_context_switches(pid):
+        """获取进程所有线程的自愿上下文切换次数（即线程阻塞后被唤醒的次数），获取失败返回 None"""
+        try:
+            tasks = os.listdir(f"/proc/{pid}/task")
+        except OSError:
+            return None
+        total = 0
+        for tid in tasks:
+            try:
+                with open(f"/proc/{pid}/task/{tid}/status", "rb") as f:
+                    for line in f:
+                        if line.startswith(b"voluntary_ctxt_switches"):
+                            total += int(line.split()[1])
+                            break
+            except (OSError, ValueError, IndexError):
+                continue
+        return total
+
+    def _kill(pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+            return True
+        except OSError:
+            return False
+
+    def is_supported():
+        """当前平台是否支持进程树统计"""
+        return True
+
+else:
+    def list_processes():
+        """当前平台不支持，返回空结果"""
+        return {}
+
+    def get_rss(pid):
+        """当前平台不支持，返回 0"""
+        return 0
+
+    def get_exe(pid):
+        """当前平台不支持，返回 None"""
+        return None
+
+    def get_handle_count(pid):
+        """当前平台不支持，返回 0"""
+        return 0
+
+    def get_cpu_time(pid):
+        """当前平台不支持，返回 0"""
+        return 0.0
+
+    def get_context_switches(pid):
+        """当前平台不支持，返回 None"""
+        return None
+
+    def _kill(pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+            return True
+        except OSError:
+            return False
+
+    def is_supported():
+        """当前平台是否支持进程树统计"""
+        return False
+
+
+def get_descendants(pid, processes=None):
+    """获取某进程的全部子孙进程 pid（广度优先，父在前子在后）"""
+    if processes is None:
+        processes = list_processes()
+    children = {}
+    for info in processes.values():
+        children.setdefault(info.ppid, []).append(info.pid)
+
+    result = []
+    queue = [pid]
+    while queue:
+        current = queue.pop(0)
+        for child in children.get(current, []):
+            if child != pid and child not in result:
+                result.append(child)
+                queue.append(child)
+    return result
+
+
+def get_tree_rss(pid, include_self=True):
+    """获取进程树的常驻内存总和，单位字节"""
+    pids = get_descendants(pid)
+    if include_self:
+        pids.insert(0, pid)
+    return sum(get_rss(p) for p in pids)
+
+
+def kill_tree(pid, include_self=True):
+    """强制结束进程树（先结束子孙进程，避免其被重新挂到其他父进程下）
+
+    Returns:
+        int: 成功结束的进程数量
+    """
+    pids = list(reversed(get_descendants(pid)))
+    if include_self:
+        pids.append(pid)
+    return sum(1 for p in pids if _kill(p))
@@ -0,0 +1,233 @@
+"""
+恢复耗时统计 - 记录每次掉线从第一次检查失败到确认恢复联网的端到端耗时
+按阶段（发现、排队、登录、确认）拆分，计算 p50/p95/p99，超过目标时告警，记录保存在 logs/recovery.jsonl
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from connection_state import ONLINE, SUSPECT, OFFLINE, LOGGING_IN, PORTAL_LOGGED_IN
+from connectivity_probe import PROBE_ONLINE
+
+
+# 阶段：(名称, 开始标记, 结束标记, 显示名称)
+STAGES = [
+    ('detect', 'failed', 'detected', "发现"),
+    ('queue', 'detected', 'login_started', "排队"),
+    ('login', 'login_started', 'logged_in', "登录"),
+    ('confirm', 'logged_in', 'confirmed', "确认"),
+]
+
+PERCENTILES = (50, 95, 99)
+
+MAX_RECORD_BYTES = 2 * 1024 * 1024
+
+
+def percentile(values, p):
+    """最近秩法百分位数，values 需已排序"""
+    if not values:
+        return None
+    index = min(len(values), max(1, math.ceil(p / 100 * len(values)))) - 1
+    return values[index]
+
+
+class RecoveryTracker:
+    """掉线恢复耗时跟踪
+
+    由连接状态机的状态转换驱动：
+        已登录 -> 疑似掉线/已掉线   开始一次掉线（起点为这次失败检查开始的时间）
+        -> 已掉线                   发现
+        -> 正在登录                 开始登录
+        正在登录 -> 已登录          登录成功，等待 confirm() 确认联网
+        已掉线 -> 已登录            未登录就恢复（检查已确认在线）
+        疑似掉线 -> 已登录          误报，不计入统计
+    """
+
+    def __init__(self, record_file=None, target=120, window=200, on_log=None, on_update=None):
+        self.record_file = record_file
+        self.target = target
+        self.on_log = on_log or (lambda message: None)
+        self.on_update = on_update
+        self.lock = threading.Lock()
+        self.incidents = deque(load_incidents(record_file, window) if record_file else [], maxlen=window)
+        self.current = None  # 进行中的掉线：标记 -> 时间戳
+        self.cycle_started_at = None
+        p95 = self.percentiles()['total'][95]
+        self.slo_breached = target > 0 and p95 is not None and p95 > target
+
+    @classmethod
+    def from_env(cls, record_file=None, on_log=None, on_update=None):
+        """按 .env 中的恢复目标配置创建"""
+        return cls(
+            record_file=record_file,
+            target=int(os.getenv("RECOVERY_SLO_SECONDS", "120")),
+            on_log=on_log,
+            on_update=on_update,
+        )
+
+    def cycle_started(self):
+        """一次检查开始（掉线起点取第一次失败检查的开始时间）"""
+        self.cycle_started_at = time.time()
+
+    def on_transition(self, old_state, new_state, reason=""):
+        """输入连接状态转换"""
+        now = time.time()
+        finished = None
+        with self.lock:
+            if self.current is None:
+                if old_state == ONLINE and new_state != ONLINE:
+                    start = self.cycle_started_at or now
+                    self.current = {'failed': min(start, now)}
+                    if new_state == OFFLINE:
+                        self.current['detected'] = now
+                return
+            marks = self.current
+            if new_state == OFFLINE:
+                marks.setdefault('detected', now)
+            elif new_state == LOGGING_IN:
+                marks.setdefault('detected', now)
+                marks.setdefault('login_started', now)
+            elif new_state == ONLINE:
+                if old_state == SUSPECT and 'detected' not in marks:
+                    # 误报：未确认掉线就恢复
+                    self.current = None
+                elif old_state == LOGGING_IN:
+                    marks['logged_in'] = now
+                else:
+                    # 检查已确认在线，无需再次确认
+                    marks['confirmed'] = now
+                    finished = self._finish()
+        if finished:
+            self._report(finished)
+
+    def observe(self, portal, probe=None):
+        """登录成功后，下一次检查显示在线时确认恢复（confirm() 探测失败时的兜底）"""
+        if portal == PORTAL_LOGGED_IN or probe == PROBE_ONLINE:
+            self.confirm()
+
+    def confirm(self):
+        """登录成功后确认已联网，结束本次掉线"""
+        with self.lock:
+            if self.current is None or 'logged_in' not in self.current:
+                return
+            self.current['confirmed'] = time.time()
+            finished = self._finish()
+        self._report(finished)
+
+    def pending_confirmation(self):
+        with self.lock:
+            return self.current is not None and 'logged_in' in self.current
+
+    def _finish(self):
+        marks = self.current
+        self.current = None
+        stages = {}
+        for name, begin, end, _ in STAGES:
+            if begin in marks and end in marks:
+                stages[name] = round(marks[end] - marks[begin], 1)
+        incident = {
+            'time': datetime.fromtimestamp(marks['failed']).strftime('%Y-%m-%d %H:%M:%S'),
+            'total': round(marks['confirmed'] - marks['failed'], 1),
+            'stages': stages,
+            'login': 'logged_in' in marks,
+        }
+        self.incidents.append(incident)
+        return incident
+
+    def _report(self, incident):
+        self._record(incident)
+        detail = "，".join(f"{label} {incident['stages'][name]}秒"
+                          for name, _, _, label in STAGES if name in incident['stages'])
+        self.on_log(f"⏱ 掉线恢复耗时 {incident['total']} 秒（{detail}）")
+        alert = None
+        if self.target > 0 and incident['total'] > self.target:
+            alert = f"本次恢复耗时 {incident['total']} 秒，超过目标 {self.target} 秒"
+            self.on_log(f"⚠️ {alert}")
+        p95 = self.percentiles()['total'][95]
+        breached = self.target > 0 and p95 is not None and p95 > self.target
+        if breached and not self.slo_breached:
+            alert = f"恢复耗时 p95 {p95} 秒，超过目标 {self.target} 秒"
+            self.on_log(f"⚠️ {alert}")
+        elif not breached and self.slo_breached:
+            self.on_log(f"✓ 恢复耗时 p95 {p95} 秒，已回到目标 {self.target} 秒以内")
+        self.slo_breached = breached
+        if self.on_update:
+            self.on_update(incident, self.summary(), alert)
+
+    def percentiles(self):
+        """总耗时和各阶段的 p50/p95/p99
+
+        Returns:
+            dict: {'total' 或阶段名: {50: 秒, 95: 秒, 99: 秒}}
+        """
+        with self.lock:
+            incidents = list(self.incidents)
+        series = {'total': sorted(i['total'] for i in incidents)}
+        for name, _, _, _ in STAGES:
+            series[name] = sorted(i['stages'][name] for i in incidents if name in i['stages'])
+        return {key: {p: percentile(values, p) for p in PERCENTILES} for key, values in series.items()}
+
+    def summary(self):
+        """托盘提示和 GUI 状态栏显示的简短统计"""
+        total = self.percentiles()['total']
+        if total[50] is None:
+            return "恢复耗时: 暂无记录"
+        text = f"恢复耗时: p50 {total[50]}秒 | p95 {total[95]}秒 | p99 {total[99]}秒"
+        if self.slo_breached:
+            text += f"（超过目标 {self.target}秒）"
+        return text
+
+    def report(self, recent=10):
+        """各阶段百分位数和最近的掉线，供诊断窗口和命令行使用"""
+        with self.lock:
+            incidents = list(self.incidents)
+        if not incidents:
+            return "暂无掉线恢复记录"
+        stats = self.percentiles()
+        lines = [f"  共 {len(incidents)} 次掉线，恢复目标 {self.target} 秒"]
+        lines.append(f"  {'阶段':<6} {'次数':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+        rows = [('total', "总计")] + [(name, label) for name, _, _, label in STAGES]
+        for key, label in rows:
+            count = len(incidents) if key == 'total' else sum(1 for i in incidents if key in i['stages'])
+            values = ["-" if stats[key][p] is None else f"{stats[key][p]}秒" for p in PERCENTILES]
+            lines.append(f"  {label:<6} {count:>6} {values[0]:>8} {values[1]:>8} {values[2]:>8}")
+        lines.append("")
+        lines.append("  -- 最近的掉线 --")
+        for incident in reversed(incidents[-recent:]):
+            detail = " ".join(f"{label}{incident['stages'][name]}"
+                              for name, _, _, label in STAGES if name in incident['stages'])
+            if not incident['login']:
+                detail += " （未登录，自行恢复）"
+            flag = " ⚠️" if self.target > 0 and incident['total'] > self.target else ""
+            lines.append(f"  {incident['time']}  {incident['total']:>7}秒  {detail}{flag}")
+        return "\n".join(lines)
+
+    def _record(self, incident):
+        if not self.record_file:
+            return
+        try:
+            if os.path.exists(self.record_file) and os.path.getsize(self.record_file) > MAX_RECORD_BYTES:
+                os.replace(self.record_file, self.record_file + ".1")
+            with open(self.record_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(incident, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def load_incidents(record_file, limit=200):
+    """读取最近的掉线恢复记录"""
+    incidents = deque(maxlen=limit)
+    try:
+        with open(record_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    incidents.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return list(incidents)
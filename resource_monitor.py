@@ -0,0 +1,206 @@
+"""
+资源统计 - 在每次检查/登录前后采样进程树（子进程数、内存、句柄、线程）
+发现某项指标持续单调增长时给出泄漏警告，采样记录保存在 logs/resources.jsonl
+"""
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import process_utils
+
+
+# 采样指标：(字段, 显示名称, 判定为增长所需的最小增量)
+METRICS = [
+    ('children', "子进程", 1),
+    ('rss_mb', "内存(MB)", 5.0),
+    ('handles', "句柄", 1),
+    ('threads', "线程", 1),
+]
+
+SCOPE_LABELS = {'worker': "工作进程", 'gui': "GUI 进程", 'cli': "命令行"}
+
+MAX_RECORD_BYTES = 5 * 1024 * 1024
+
+
+def sample_tree(pid=None, include_children=True):
+    """采样进程树的资源占用
+
+    Returns:
+        dict: children / rss_mb / handles / threads
+    """
+    pid = pid or os.getpid()
+    processes = process_utils.list_processes()
+    children = process_utils.get_descendants(pid, processes) if include_children else []
+    pids = [pid] + children
+    return {
+        'pid': pid,
+        'children': len(children),
+        'rss_mb': round(sum(process_utils.get_rss(p) for p in pids) / 1024 / 1024, 1),
+        'handles': sum(process_utils.get_handle_count(p) for p in pids),
+        'threads': sum(processes[p].threads for p in pids if p in processes),
+    }
+
+
+class ResourceMonitor:
+    """资源采样与泄漏检测
+
+    用法:
+        with monitor.around('worker', 'check'):
+            ...
+    """
+
+    def __init__(self, record_file=None, window=10, history=500, on_log=None, on_sample=None):
+        self.record_file = record_file
+        self.window = max(3, window)
+        self.on_log = on_log or (lambda message: None)
+        self.on_sample = on_sample
+        self.samples = deque(maxlen=history)
+        self.flagged = set()  # 已告警的 (scope, metric)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, record_file=None, on_log=None, on_sample=None):
+        """按 .env 中的检测窗口配置创建"""
+        return cls(
+            record_file=record_file,
+            window=int(os.getenv("LEAK_DETECT_WINDOW", "10")),
+            on_log=on_log,
+            on_sample=on_sample,
+        )
+
+    @contextmanager
+    def around(self, scope, phase, pid=None):
+        """在一次检查/登录前后各采样一次"""
+        self.sample(scope, phase, 'before', pid)
+        try:
+            yield
+        finally:
+            self.sample(scope, phase, 'after', pid)
+
+    def sample(self, scope, phase, when='after', pid=None, include_children=True):
+        """采样一次并记录，采样失败时返回 None"""
+        try:
+            sample = sample_tree(pid, include_children)
+        except Exception:
+            return None
+        sample.update({
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'scope': scope,
+            'phase': phase,
+            'when': when,
+        })
+        self.add(sample)
+        return sample
+
+    def add(self, sample, remote=False):
+        """加入一条采样
+
+        Args:
+            remote: 其他进程发来的采样（已由对方检测和记录），只加入序列
+        """
+        with self.lock:
+            self.samples.append(sample)
+            if remote:
+                return
+            growing = self._detect_growth(sample['scope']) if sample['when'] == 'after' else None
+        sample['growing'] = growing or []
+        self._record(sample)
+        if self.on_sample:
+            self.on_sample(sample)
+
+    def _detect_growth(self, scope):
+        """检查某个范围最近 window 次周期结束后的采样是否单调增长"""
+        series = [s for s in self.samples if s['scope'] == scope and s['when'] == 'after'][-self.window:]
+        if len(series) < self.window:
+            return []
+        growing = []
+        for key, label, min_delta in METRICS:
+            values = [s[key] for s in series]
+            monotonic = all(b >= a for a, b in zip(values, values[1:]))
+            flag = (scope, key)
+            if monotonic and values[-1] - values[0] >= min_delta:
+                growing.append(key)
+                if flag not in self.flagged:
+                    self.flagged.add(flag)
+                    self.on_log(
+                        f"⚠️ 疑似资源泄漏: {SCOPE_LABELS.get(scope, scope)}{label}在最近 {self.window} 次周期中"
+                        f"持续增长（{values[0]} → {values[-1]}）"
+                    )
+            else:
+                self.flagged.discard(flag)
+        return growing
+
+    def latest(self, scope):
+        """某个范围最近一次采样，没有返回 None"""
+        with self.lock:
+            for sample in reversed(self.samples):
+                if sample['scope'] == scope:
+                    return sample
+        return None
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.samples)
+
+    def _record(self, sample):
+        if not self.record_file:
+            return
+        try:
+            if os.path.exists(self.record_file) and os.path.getsize(self.record_file) > MAX_RECORD_BYTES:
+                os.replace(self.record_file, self.record_file + ".1")
+            with open(self.record_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def load_samples(record_file, limit=200):
+    """读取采样记录文件中最近的采样"""
+    samples = deque(maxlen=limit)
+    try:
+        with open(record_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    samples.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return list(samples)
+
+
+def format_sample(sample):
+    """单条采样的简短描述"""
+    return (f"子进程 {sample['children']} | 内存 {sample['rss_mb']} MB | "
+            f"句柄 {sample['handles']} | 线程 {sample['threads']}")
+
+
+def format_report(samples, rows=20):
+    """按范围汇总采样，供 GUI 诊断窗口和命令行使用"""
+    if not samples:
+        return "暂无资源采样记录"
+    lines = []
+    scopes = []
+    for sample in samples:
+        if sample['scope'] not in scopes:
+            scopes.append(sample['scope'])
+    for scope in scopes:
+        series = [s for s in samples if s['scope'] == scope]
+        after = [s for s in series if s['when'] == 'after'] or series
+        lines.append(f"== {SCOPE_LABELS.get(scope, scope)}（{len(series)} 条采样）==")
+        for key, label, _ in METRICS:
+            values = [s[key] for s in after]
+            lines.append(f"  {label:<8} 最小 {min(values):<8} 最大 {max(values):<8} 最新 {values[-1]}")
+        growing = series[-1].get('growing') or after[-1].get('growing')
+        if growing:
+            names = [label for key, label, _ in METRICS if key in growing]
+            lines.append(f"  ⚠️ 持续增长: {', '.join(names)}")
+        lines.append(f"  {'时间':<19} {'阶段':<6} {'前/后':<6} {'子进程':>6} {'内存MB':>8} {'句柄':>6} {'线程':>6}")
+        for s in series[-rows:]:
+            lines.append(f"  {s['time']:<19} {s['phase']:<6} {s['when']:<6} {s['children']:>6} "
+                         f"{s['rss_mb']:>8} {s['handles']:>6} {s['threads']:>6}")
+        lines.append("")
+    return "\n".join(lines)
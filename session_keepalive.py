@@ -0,0 +1,188 @@
+"""
+会话保活 - 在门户空闲超时之前发送一个最小的请求，避免被门户注销
+空闲超时可以在 .env 中配置，未配置时从掉线记录中学习：从上一次由本程序产生流量（登录或保活）到发现被注销的时长
+是超时的上界，取多次记录的中位数（不足保活间隔就被注销的记录与空闲无关，不用于学习）。状态和成功率保存在 logs/keepalive.json
+"""
+import json
+import os
+import statistics
+import threading
+import time
+
+import http_pool
+from check_scheduler import suspend_clock
+from connection_state import PORTAL_LOGGED_IN, PORTAL_LOGGED_OUT
+from connectivity_probe import DEFAULT_PROBE_URL
+
+
+MIN_TIMEOUT = 60  # 学习到的超时下限（秒），避免异常注销导致频繁保活
+RETRY_SECONDS = 30  # 保活失败后的重试间隔（秒）
+SAMPLES_KEPT = 20
+
+
+class SessionKeepalive:
+    """门户会话保活
+
+    用法:
+        keepalive.logged_in()          # 登录成功
+        keepalive.observe(portal)      # 每次检查
+        if keepalive.due_in() <= 0:    # 到期时
+            keepalive.refresh()
+    """
+
+    def __init__(self, url, idle_timeout=0, margin=0.6, enabled=True, state_file=None, on_log=None):
+        self.url = url
+        self.configured_timeout = idle_timeout
+        self.margin = min(0.95, max(0.1, margin))
+        self.enabled = enabled
+        self.state_file = state_file
+        self.on_log = on_log or (lambda message: None)
+        self.clock = suspend_clock() or time.monotonic
+        self.lock = threading.Lock()
+        self.data = {'samples': [], 'ok': 0, 'failed': 0, 'logouts': 0, 'kept_logouts': 0}
+        self.refreshed_at = None  # 最近一次由本程序产生流量的时间，None 表示不在会话中
+        self.learnable = False  # 会话起点是否为本程序的登录或保活（否则注销时长不可用于学习）
+        self.retry_at = 0.0
+        self._load()
+
+    @classmethod
+    def from_env(cls, state_file=None, on_log=None):
+        """按 .env 中的保活配置创建"""
+        return cls(
+            url=os.getenv("KEEPALIVE_URL", "") or os.getenv("PROBE_URL", DEFAULT_PROBE_URL),
+            idle_timeout=int(os.getenv("PORTAL_IDLE_TIMEOUT_SECONDS", "0")),
+            margin=float(os.getenv("KEEPALIVE_MARGIN", "0.6")),
+            enabled=os.getenv("KEEPALIVE", "true").lower() in ("1", "true", "yes"),
+            state_file=state_file,
+            on_log=on_log,
+        )
+
+    @property
+    def idle_timeout(self):
+        """门户空闲超时（秒）：配置值优先，其次为学习值，未知时为 None"""
+        if self.configured_timeout > 0:
+            return self.configured_timeout
+        samples = self.data['samples']
+        # 中位数：个别强制下线、门户维护造成的过短记录不影响估计
+        return max(MIN_TIMEOUT, int(statistics.median(samples))) if samples else None
+
+    @property
+    def interval(self):
+        """保活间隔（秒），未知时为 None"""
+        timeout = self.idle_timeout
+        return int(timeout * self.margin) if timeout else None
+
+    def logged_in(self):
+        """登录成功，会话从现在开始"""
+        with self.lock:
+            self.refreshed_at = self.clock()
+            self.learnable = True
+
+    def observe(self, portal):
+        """输入一次门户检查结果"""
+        now = self.clock()
+        with self.lock:
+            if portal == PORTAL_LOGGED_IN:
+                if self.refreshed_at is None:
+                    # 程序启动时已登录，会话起点未知，尽快保活一次作为起点
+                    self.refreshed_at = now - (self.interval or 0)
+                    self.learnable = False
+                return
+            if portal != PORTAL_LOGGED_OUT or self.refreshed_at is None:
+                return
+            age = now - self.refreshed_at
+            self.refreshed_at = None
+            self.data['logouts'] += 1
+            interval = self.interval
+            kept = self.enabled and interval is not None
+            if kept:
+                self.data['kept_logouts'] += 1
+            # 距上次流量不足保活间隔就被注销，说明不是空闲超时（强制下线、门户维护等）
+            if self.learnable and (interval is None or age >= interval):
+                previous = self.idle_timeout
+                self.data['samples'] = (self.data['samples'] + [round(age, 1)])[-SAMPLES_KEPT:]
+                if self.configured_timeout <= 0 and self.idle_timeout != previous:
+                    self.on_log(f"💓 会话在空闲 {age:.0f} 秒内被注销，门户空闲超时估计为 {self.idle_timeout} 秒，"
+                                f"之后每 {self.interval} 秒保活一次")
+            self._save()
+        if kept:
+            self.on_log(f"⚠️ 保活期间会话被注销（距上次保活 {age:.0f} 秒）")
+
+    def due_in(self):
+        """距下一次保活的秒数，不需要保活时返回 None"""
+        with self.lock:
+            interval = self.interval
+            if not self.enabled or interval is None or self.refreshed_at is None:
+                return None
+            return max(self.refreshed_at + interval, self.retry_at) - self.clock()
+
+    def refresh(self, timeout=5):
+        """发送一次保活请求
+
+        Returns:
+            bool: 是否成功（2xx 或条件请求的 304；被重定向到门户说明会话已失效）
+        """
+        started = time.monotonic()
+        try:
+            response = http_pool.shared().request('GET', self.url, timeout=timeout, conditional=True,
+                                                  phase='keepalive')
+            ok = 200 <= response.status < 300
+            detail = f"HTTP {response.status}"
+        except (OSError, ValueError) as e:
+            ok, detail = False, str(e)
+        elapsed = time.monotonic() - started
+        with self.lock:
+            self.data['ok' if ok else 'failed'] += 1
+            if not ok:
+                self.retry_at = self.clock() + RETRY_SECONDS
+            elif self.refreshed_at is not None:
+                self.refreshed_at = self.clock()
+                self.learnable = True
+            self._save()
+        if ok:
+            self.on_log(f"💓 会话保活成功（{elapsed * 1000:.0f} ms）")
+        else:
+            self.on_log(f"⚠️ 会话保活失败: {detail}")
+        return ok
+
+    def summary(self):
+        """保活状态和成功率"""
+        with self.lock:
+            data = dict(self.data)
+        timeout = self.idle_timeout
+        if not self.enabled:
+            text = "保活: 未启用"
+        elif timeout is None:
+            text = "保活: 等待学习门户空闲超时"
+        else:
+            source = "配置" if self.configured_timeout > 0 else "学习"
+            text = f"保活: 空闲超时 {timeout} 秒（{source}），每 {self.interval} 秒一次"
+        total = data['ok'] + data['failed']
+        if total:
+            text += f"，成功 {data['ok']}/{total}"
+        if data['kept_logouts']:
+            text += f"，保活期间被注销 {data['kept_logouts']} 次"
+        return text
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError:
+            pass
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key in self.data:
+            if key in data:
+                self.data[key] = data[key]
@@ -8,6 +8,18 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from browser_install import BrowserInstaller
+from browser_store import BrowserStore
+import browser_store
+
+
+def print_progress(name, done, total, speed):
+    """在同一行显示下载进度和速度"""
+    percent = f"{done / total:.0%}" if total else f"{done / 1024 / 1024:.1f} MB"
+    print(f"\r  {name}: {percent}  {speed / 1024 / 1024:.1f} MB/s   ", end="", flush=True)
+    if total and done >= total:
+        print()
+
 def setup():
     """执行设置步骤"""
     print("=" * 60)
@@ -40,50 +52,31 @@ def setup():
     # 从 .env 读取下载镜像源配置
     download_host = os.getenv("PLAYWRIGHT_DOWNLOAD_HOST", "https://npmmirror.com/mirrors/playwright/")
     
+    # 本地镜像目录、下载缓存和离线压缩包，从下载源下载时分段并行、断点续传
+    installer = BrowserInstaller.from_env(project_dir, browsers_path, download_host,
+                                          on_log=print, on_progress=print_progress)
+    store = BrowserStore.from_env(on_log=print)
+    
     print(f"浏览器将安装到: {browsers_path}")
     print(f"下载镜像源: {download_host}")
+    if installer.mirror_dir:
+        print(f"本地镜像目录: {installer.mirror_dir}")
+    print(f"下载缓存: {installer.cache_dir}")
+    if store.root:
+        print(f"共享浏览器存储: {store.root}")
     print()
     
     try:
-        # 设置环境变量并安装 Playwright 浏览器
-        env = os.environ.copy()
-        env["PLAYWRIGHT_BROWSERS_PATH"] = browsers_path
-        env["PLAYWRIGHT_DOWNLOAD_HOST"] = download_host
-        
-        # 检测是否在打包环境中运行
-        if getattr(sys, 'frozen', False):
-            # 打包后的环境，直接使用 playwright 模块
-            print("检测到打包环境，使用内置 playwright 模块...")
-            try:
-                from playwright._impl._driver import compute_driver_executable, get_driver_env
-                driver_executable = compute_driver_executable()
-                driver_env = get_driver_env()
-                driver_env.update(env)
-                
-                result = subprocess.run(
-                    [str(driver_executable), "install", "chromium"],
-                    check=True,
-                    env=driver_env,
-                    capture_output=False
-                )
-            except ImportError:
-                # 降级方案：尝试查找 playwright 可执行文件
-                print("尝试查找 playwright 命令...")
-                playwright_cmd = "playwright"
-                result = subprocess.run(
-                    [playwright_cmd, "install", "chromium"],
-                    check=True,
-                    env=env,
-                    capture_output=False,
-                    shell=True
-                )
-        else:
-            # 开发环境，使用 python -m playwright
-            result = subprocess.run(
-                [sys.executable, "-m", "playwright", "install", "chromium"],
-                check=True,
-                env=env
-            )
+        # 共享存储中已有当前版本时直接链接；否则配置了 BROWSER_ARCHIVE 时直接解压，
+        # 再否则执行 playwright install（下载请求经本地镜像服务），安装后放入共享存储
+        if not store.link(browsers_path):
+            if not installer.install_archive():
+                env = os.environ.copy()
+                env["PLAYWRIGHT_BROWSERS_PATH"] = browsers_path
+                with installer.serve() as overrides:
+                    env.update(overrides)
+                    install_chromium(env)
+            store.adopt(browsers_path)
         
         print("\n" + "=" * 60)
         print("✓ Playwright 浏览器驱动安装成功!")
@@ -101,5 +94,65 @@ def setup():
         print(f"✗ 发生错误: {e}")
         sys.exit(1)
 
+
+def install_chromium(env):
+    """执行 playwright install chromium"""
+    # 检测是否在打包环境中运行
+    if getattr(sys, 'frozen', False):
+        # 打包后的环境，直接使用 playwright 模块
+        print("检测到打包环境，使用内置 playwright 模块...")
+        try:
+            from playwright._impl._driver import compute_driver_executable, get_driver_env
+            driver_executable = compute_driver_executable()
+            driver_env = get_driver_env()
+            driver_env.update(env)
+            
+            result = subprocess.run(
+                [str(driver_executable), "install", "chromium"],
+                check=True,
+                env=driver_env,
+                capture_output=False
+            )
+        except ImportError:
+            # 降级方案：尝试查找 playwright 可执行文件
+            print("尝试查找 playwright 命令...")
+            playwright_cmd = "playwright"
+            result = subprocess.run(
+                [playwright_cmd, "install", "chromium"],
+                check=True,
+                env=env,
+                capture_output=False,
+                shell=True
+            )
+    else:
+        # 开发环境，使用 python -m playwright
+        result = subprocess.run(
+            [sys.executable, "-m", "playwright", "install", "chromium"],
+            check=True,
+            env=env
+        )
+
+
+def verify():
+    """按安装清单重新计算浏览器文件的哈希，检查安装是否完整"""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    env_file = Path(project_dir) / ".env"
+    if env_file.exists():
+        load_dotenv(env_file, override=True)
+    browsers_path = os.path.join(project_dir, os.getenv("PLAYWRIGHT_BROWSERS_PATH", "browsers"))
+    
+    print(f"校验浏览器安装: {browsers_path}")
+    problems = browser_store.verify(browsers_path, on_log=print)
+    if problems:
+        for problem in problems:
+            print(f"✗ {problem}")
+        print("请重新运行 python setup.py 安装")
+        sys.exit(1)
+    print("✓ 浏览器文件与安装清单一致")
+
+
 if __name__ == "__main__":
-    setup()
+    if "--verify" in sys.argv[1:]:
+        verify()
+    else:
+        setup()
@@ -0,0 +1,272 @@
+"""
+自动化子进程监管器 - 运行在 GUI 进程中
+负责启动 automation_worker 子进程、转发消息，并在子进程崩溃、卡死或内存超标时自动重启
+"""
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import wait
+
+import process_utils
+from automation_worker import worker_main, HEARTBEAT_INTERVAL
+
+
+SUPERVISE_SLACK = 1  # 超时判定的余量（秒）
+HEARTBEAT_TIMEOUT = HEARTBEAT_INTERVAL * 4  # 超过该时间未收到任何消息视为卡死
+RESTART_BACKOFF_MIN = 2  # 重启退避下限（秒）
+RESTART_BACKOFF_MAX = 60  # 重启退避上限（秒）
+
+
+class AutomationSupervisor:
+    """自动化子进程监管器
+
+    GUI 只调用 start_monitor / stop_monitor / login / shutdown，
+    子进程发来的日志、状态和登录结果通过回调交给 GUI。
+    """
+
+    def __init__(self, env, on_log, on_status, on_result, on_timing=None,
+                 memory_budget_mb=600, hang_timeout=120, on_resources=None, on_bandwidth=None,
+                 on_recovery=None, on_interface=None):
+        self.env = env
+        self.on_log = on_log
+        self.on_status = on_status
+        self.on_result = on_result
+        self.on_timing = on_timing
+        self.on_resources = on_resources
+        self.on_bandwidth = on_bandwidth
+        self.on_recovery = on_recovery
+        self.on_interface = on_interface
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.hang_timeout = hang_timeout
+
+        self.ctx = multiprocessing.get_context('spawn')
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        # 期望状态（子进程重启后需要恢复）
+        self.monitor_config = None
+        self.pending_logins = {}  # job -> 开始时间（GUI 线程和监管线程都会访问，需持有 self.lock）
+
+        self.spawned_at = 0.0
+        self.last_heartbeat = 0.0
+        self.last_check_done = 0.0
+        self.restart_count = 0
+        self.restart_backoff = RESTART_BACKOFF_MIN
+        self.last_timings = {}
+
+        self.thread = None
+
+    def start(self):
+        """启动子进程和监管线程"""
+        self._spawn()
+        self.thread = threading.Thread(target=self._supervise_loop, daemon=True)
+        self.thread.start()
+
+    def _spawn(self):
+        """启动一个新的工作子进程"""
+        parent_conn, child_conn = self.ctx.Pipe(duplex=True)
+        process = self.ctx.Process(
+            target=worker_main,
+            args=(child_conn, self.env),
+            name="automation-worker",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        with self.lock:
+            self.process = process
+            self.conn = parent_conn
+            now = time.monotonic()
+            self.spawned_at = now
+            self.last_heartbeat = now
+            self.last_check_done = now
+
+    def _send(self, command, **args):
+        with self.lock:
+            conn = self.conn
+        if conn is None:
+            return False
+        try:
+            conn.send((command, args))
+            return True
+        except (OSError, EOFError):
+            return False
+
+    def start_monitor(self, config):
+        """开始监控"""
+        self.monitor_config = dict(config)
+        self.last_check_done = time.monotonic()
+        self._send('start_monitor', config=self.monitor_config)
+
+    def stop_monitor(self):
+        """停止监控"""
+        self.monitor_config = None
+        self._send('stop_monitor')
+
+    def login(self, config, job='test_login'):
+        """请求子进程执行一次登录，结果通过 on_result 回调返回"""
+        with self.lock:
+            self.pending_logins[job] = time.monotonic()
+        if not self._send('login', config=dict(config), job=job):
+            with self.lock:
+                self.pending_logins.pop(job, None)
+            self.on_result(job, False, "工作进程未运行")
+
+    def shutdown(self):
+        """关闭子进程"""
+        self.stopped.set()
+        self._send('shutdown')
+        with self.lock:
+            process = self.process
+        if process is not None:
+            process.join(timeout=3)
+            if process.is_alive():
+                process_utils.kill_tree(process.pid)
+
+    def _dispatch(self, kind, payload):
+        """把子进程消息转交给 GUI 回调（任何消息都说明子进程仍在响应）"""
+        self.last_heartbeat = time.monotonic()
+        if kind == 'heartbeat':
+            pass
+        elif kind == 'log':
+            self.on_log(payload['message'])
+        elif kind == 'status':
+            self.on_status(payload['status'])
+        elif kind == 'timing':
+            self.last_timings[payload['phase']] = payload['seconds']
+            if payload['phase'] in ('check', 'standby'):
+                self.last_check_done = time.monotonic()
+            if self.on_timing:
+                self.on_timing(payload['phase'], payload['seconds'])
+        elif kind == 'resources':
+            if self.on_resources:
+                self.on_resources(payload['sample'])
+        elif kind == 'bandwidth':
+            if self.on_bandwidth:
+                self.on_bandwidth(payload)
+        elif kind == 'recovery':
+            if self.on_recovery:
+                self.on_recovery(payload)
+        elif kind == 'interface':
+            if self.on_interface:
+                self.on_interface(payload)
+        elif kind == 'login_started':
+            with self.lock:
+                self.pending_logins.setdefault(payload['job'], time.monotonic())
+        elif kind == 'result':
+            job = payload['job']
+            with self.lock:
+                pending = self.pending_logins.pop(job, None)
+            if pending is not None or job == 'auto_login':
+                self.on_result(job, payload['success'], payload.get('detail', ""))
+
+    def _next_deadline(self):
+        """最早的超时时间点（心跳、登录、检查），到达之前无需检查健康状况"""
+        deadlines = [self.last_heartbeat + HEARTBEAT_TIMEOUT]
+        with self.lock:
+            deadlines += [started + self.hang_timeout for started in self.pending_logins.values()]
+        if self.monitor_config:
+            deadlines.append(self.last_check_done + self.monitor_config['check_interval'] + self.hang_timeout)
+        return min(deadlines) + SUPERVISE_SLACK
+
+    def _supervise_loop(self):
+        """接收子进程消息，在超时时间点或每次检查/登录结束时检查其健康状况
+
+        没有消息时一直阻塞到最早的超时时间点，空闲时不定期唤醒
+        """
+        while not self.stopped.is_set():
+            with self.lock:
+                conn, process = self.conn, self.process
+
+            timeout = max(0.0, self._next_deadline() - time.monotonic())
+            ready = wait([conn, process.sentinel], timeout=timeout)
+
+            cycle_done = False
+            if conn in ready:
+                try:
+                    kind, payload = conn.recv()
+                except (EOFError, OSError):
+                    self._restart("工作进程连接已断开")
+                    continue
+                self._dispatch(kind, payload)
+                # 内存在每次检查/登录结束时检查
+                cycle_done = kind == 'timing'
+
+            if self.stopped.is_set():
+                break
+
+            if process.sentinel in ready and not process.is_alive():
+                self._restart(f"工作进程已退出（退出码 {process.exitcode}）")
+                continue
+
+            if cycle_done or time.monotonic() >= self._next_deadline():
+                reason = self._health_problem()
+                if reason:
+                    self._restart(reason)
+                elif time.monotonic() - self.spawned_at > RESTART_BACKOFF_MAX * 5:
+                    # 稳定运行一段时间后重置退避
+                    self.restart_backoff = RESTART_BACKOFF_MIN
+
+    def _health_problem(self):
+        """检查子进程是否卡死或内存超标，返回问题描述，正常返回 None"""
+        now = time.monotonic()
+
+        if now - self.last_heartbeat > HEARTBEAT_TIMEOUT:
+            return f"工作进程 {int(now - self.last_heartbeat)} 秒无心跳"
+
+        with self.lock:
+            pending = list(self.pending_logins.items())
+        for job, started in pending:
+            if now - started > self.hang_timeout:
+                return f"登录任务 {job} 超过 {self.hang_timeout} 秒未完成"
+
+        if self.monitor_config:
+            overdue = now - self.last_check_done - self.monitor_config['check_interval']
+            if overdue > self.hang_timeout:
+                return f"网络检查超过 {int(overdue)} 秒未完成"
+
+        # 登录过程中不因内存重启，避免打断正在进行的登录
+        if self.memory_budget > 0 and not pending:
+            with self.lock:
+                pid = self.process.pid
+            rss = process_utils.get_tree_rss(pid)
+            if rss > self.memory_budget:
+                return f"工作进程内存 {rss // (1024 * 1024)} MB 超过预算 {self.memory_budget // (1024 * 1024)} MB"
+
+        return None
+
+    def _restart(self, reason):
+        """结束当前子进程（含浏览器子进程）并启动新的子进程，恢复监控状态"""
+        if self.stopped.is_set():
+            return
+
+        self.on_log(f"⚠️ {reason}，正在重启工作进程...")
+        with self.lock:
+            process, conn = self.process, self.conn
+        if process.is_alive():
+            process_utils.kill_tree(process.pid)
+            process.join(timeout=3)
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+        # 未完成的登录任务按失败处理
+        with self.lock:
+            pending, self.pending_logins = list(self.pending_logins), {}
+        for job in pending:
+            self.on_result(job, False, "工作进程已重启")
+
+        # 指数退避，避免崩溃循环
+        if self.stopped.wait(self.restart_backoff):
+            return
+        self.restart_backoff = min(self.restart_backoff * 2, RESTART_BACKOFF_MAX)
+        self.restart_count += 1
+
+        self._spawn()
+        self.on_log(f"✓ 工作进程已重启（第 {self.restart_count} 次）")
+        if self.monitor_config:
+            self._send('start_monitor', config=self.monitor_config)
@@ -59,9 +59,23 @@ class MainWindowUI:
         self.btn_install_deps = ttk.Button(panel, text="📦 安装依赖")
         self.btn_install_deps.pack(fill=tk.X, padx=5, pady=5, ipady=10)
         
+        # 资源诊断按钮
+        self.btn_diagnostics = ttk.Button(panel, text="📊 资源诊断")
+        self.btn_diagnostics.pack(fill=tk.X, padx=5, pady=5, ipady=10)
+        
         # 占位符，将状态标签推到底部
         ttk.Frame(panel).pack(fill=tk.BOTH, expand=True)
         
+        # 运行统计标签
+        self.stats_label = ttk.Label(
+            panel,
+            text="可用率: 暂无记录\n恢复耗时: 暂无记录\n资源: 暂无采样\n流量: 暂无记录",
+            justify=tk.LEFT,
+            padding=5,
+            font=("Microsoft YaHei", 8)
+        )
+        self.stats_label.pack(fill=tk.X, padx=5)
+        
         # 状态标签
         self.status_label = ttk.Label(
             panel,
@@ -92,6 +106,10 @@ class MainWindowUI:
             insertbackground="white"
         )
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # 失败诊断目录链接
+        self.log_text.tag_config("link", foreground="#4fc1ff", underline=True)
+        self.log_text.tag_bind("link", "<Enter>", lambda e: self.log_text.config(cursor="hand2"))
+        self.log_text.tag_bind("link", "<Leave>", lambda e: self.log_text.config(cursor=""))
         
         return panel
 
@@ -217,3 +235,42 @@ class ConfigDialog:
         """显示对话框并返回结果"""
         self.dialog.wait_window()
         return self.result
+
+
+class DiagnosticsDialog:
+    """诊断信息窗口（非模态，可点击刷新）"""
+    
+    def __init__(self, parent, title, get_text):
+        self.get_text = get_text
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(title)
+        self.dialog.geometry("760x520")
+        self.dialog.transient(parent)
+        
+        main_frame = ttk.Frame(self.dialog, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.text = scrolledtext.ScrolledText(
+            main_frame,
+            wrap=tk.NONE,
+            font=("Consolas", 9),
+            bg="#1e1e1e",
+            fg="#d4d4d4"
+        )
+        self.text.pack(fill=tk.BOTH, expand=True)
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        ttk.Button(button_frame, text="关闭", command=self.dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.RIGHT)
+        
+        self.refresh()
+    
+    def refresh(self):
+        """重新获取并显示诊断信息"""
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, self.get_text())
+        self.text.config(state=tk.DISABLED)